@@ -22,16 +22,20 @@ CREATE TABLE empleados (
     cargo VARCHAR(100) NOT NULL,
     rol VARCHAR(100) NOT NULL,
     nfc_uid VARCHAR(50) UNIQUE,
+    -- UID normalizado (mayúsculas, sin espacios, ':' ni '-') para búsquedas por índice
+    nfc_uid_norm VARCHAR(50) GENERATED ALWAYS AS (NULLIF(UPPER(REPLACE(REPLACE(REPLACE(nfc_uid, ' ', ''), ':', ''), '-', '')), '')) STORED,
     foto_path VARCHAR(500),
     hora_entrada TIME NOT NULL DEFAULT '09:00:00',
     hora_salida TIME NOT NULL DEFAULT '18:00:00',
     activo BOOLEAN DEFAULT TRUE,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Última modificación (la mantiene un trigger; replicación incremental a los kioscos)
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
 -- Tabla de registros de asistencia
 CREATE TABLE registros_asistencia (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     empleado_id INTEGER REFERENCES empleados(id),
     ubicacion_id INTEGER REFERENCES ubicaciones(id),
     fecha DATE NOT NULL,
@@ -39,8 +43,17 @@ CREATE TABLE registros_asistencia (
     tipo_movimiento VARCHAR(20) NOT NULL CHECK (tipo_movimiento IN ('ENTRADA', 'SALIDA')),
     estado VARCHAR(20) NOT NULL CHECK (estado IN ('A_TIEMPO', 'RETARDO', 'TEMPRANO', 'FALTA')),
     sincronizado BOOLEAN DEFAULT FALSE,
-    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    -- Llave de idempotencia generada en el kiosco (reintentos de envío no duplican)
+    client_uuid VARCHAR(64),
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- En tablas particionadas las llaves únicas incluyen la columna de partición
+    PRIMARY KEY (id, fecha)
+) PARTITION BY RANGE (fecha);
+
+-- Fechas sin partición mensual (p. ej. reloj desfasado); las particiones de cada mes
+-- (registros_asistencia_YYYY_MM) las crea la aplicación con registros_asegurar_particion()
+-- definida en src/particiones.py
+CREATE TABLE registros_asistencia_default PARTITION OF registros_asistencia DEFAULT;
 
 -- Tabla para almacenamiento local cuando no hay internet
 CREATE TABLE registros_locales (
@@ -71,10 +84,25 @@ INSERT INTO configuraciones (clave, valor, descripcion) VALUES
 ('ubicacion_actual', 'Tepanecos', 'Ubicación actual del sistema');
 
 -- Índices para mejorar rendimiento
-CREATE INDEX idx_registros_empleado_fecha ON registros_asistencia(empleado_id, fecha);
+-- Cubriente para lecturas por empleado y rango de fechas (fecha >= inicio AND fecha < fin)
+CREATE INDEX idx_registros_emp_fecha_hora ON registros_asistencia(empleado_id, fecha, hora_registro) INCLUDE (tipo_movimiento, estado);
 CREATE INDEX idx_registros_fecha ON registros_asistencia(fecha);
 CREATE INDEX idx_empleados_nfc ON empleados(nfc_uid);
+CREATE UNIQUE INDEX ux_empleados_nfc_norm ON empleados(nfc_uid_norm) WHERE activo;
+CREATE INDEX idx_empleados_updated_at ON empleados(updated_at);
+
+CREATE OR REPLACE FUNCTION empleados_tocar_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_empleados_updated_at
+BEFORE INSERT OR UPDATE ON empleados
+FOR EACH ROW EXECUTE PROCEDURE empleados_tocar_updated_at();
 CREATE INDEX idx_registros_sincronizado ON registros_asistencia(sincronizado);
+CREATE UNIQUE INDEX ux_registros_client_uuid ON registros_asistencia(client_uuid, fecha);
 
 -- Vista para reportes diarios
 CREATE VIEW vista_asistencia_diaria AS
@@ -91,17 +119,31 @@ JOIN empleados e ON r.empleado_id = e.id
 JOIN ubicaciones u ON r.ubicacion_id = u.id
 ORDER BY r.fecha DESC, r.hora_registro DESC;
 
+-- Resumen diario por empleado (primera entrada / última salida), mantenido por triggers
+-- sobre registros_asistencia. Funciones y triggers: src/resumen_diario.py (instalar_pg).
+CREATE TABLE resumen_diario (
+    empleado_id INTEGER NOT NULL,
+    fecha DATE NOT NULL,
+    primera_entrada TIMESTAMP,
+    estado_entrada VARCHAR(20),
+    ultima_salida TIMESTAMP,
+    estado_salida VARCHAR(20),
+    registros INTEGER NOT NULL DEFAULT 0,
+    ubicaciones INTEGER[] NOT NULL DEFAULT '{}',
+    PRIMARY KEY (empleado_id, fecha)
+);
+CREATE INDEX idx_resumen_diario_fecha ON resumen_diario(fecha);
+
 -- Vista para el primer y último registro del día
 CREATE VIEW vista_resumen_diario AS
 SELECT 
     e.id as empleado_id,
     e.nombre_completo,
-    r.fecha,
-    MIN(CASE WHEN r.tipo_movimiento = 'ENTRADA' THEN r.hora_registro END) as primera_entrada,
-    MAX(CASE WHEN r.tipo_movimiento = 'SALIDA' THEN r.hora_registro END) as ultima_salida,
-    MIN(CASE WHEN r.tipo_movimiento = 'ENTRADA' THEN r.estado END) as estado_entrada,
-    MAX(CASE WHEN r.tipo_movimiento = 'SALIDA' THEN r.estado END) as estado_salida
+    s.fecha,
+    s.primera_entrada,
+    s.ultima_salida,
+    s.estado_entrada,
+    s.estado_salida
 FROM empleados e
-LEFT JOIN registros_asistencia r ON e.id = r.empleado_id
-GROUP BY e.id, e.nombre_completo, r.fecha
-ORDER BY r.fecha DESC, e.nombre_completo;
\ No newline at end of file
+LEFT JOIN resumen_diario s ON e.id = s.empleado_id
+ORDER BY s.fecha DESC, e.nombre_completo;
\ No newline at end of file
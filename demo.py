@@ -63,25 +63,25 @@ class SistemaDemo:
             
             if db_manager.connect_postgresql():
                 print("✓ Conectado a PostgreSQL")
-                cursor = db_manager.pg_connection.cursor()
+                with db_manager.pg_pool.transaction() as conn:
+                    cursor = conn.cursor()
+                    
+                    # Limpiar datos existentes
+                    cursor.execute("DELETE FROM registros_asistencia")
+                    cursor.execute("DELETE FROM empleados")
+                    
+                    # Reiniciar secuencias
+                    cursor.execute("ALTER SEQUENCE empleados_id_seq RESTART WITH 1")
+                    cursor.execute("ALTER SEQUENCE registros_asistencia_id_seq RESTART WITH 1")
+                    
+                    # Insertar empleados de demostración
+                    for emp in self.empleados_demo:
+                        cursor.execute("""
+                            INSERT INTO empleados (nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida, activo)
+                            VALUES (%s, %s, %s, %s, %s, %s, TRUE)
+                        """, (emp['nombre'], emp['cargo'], emp['rol'], emp['nfc_uid'], 
+                             emp['hora_entrada'], emp['hora_salida']))
                 
-                # Limpiar datos existentes
-                cursor.execute("DELETE FROM registros_asistencia")
-                cursor.execute("DELETE FROM empleados")
-                
-                # Reiniciar secuencias
-                cursor.execute("ALTER SEQUENCE empleados_id_seq RESTART WITH 1")
-                cursor.execute("ALTER SEQUENCE registros_asistencia_id_seq RESTART WITH 1")
-                
-                # Insertar empleados de demostración
-                for emp in self.empleados_demo:
-                    cursor.execute("""
-                        INSERT INTO empleados (nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida, activo)
-                        VALUES (%s, %s, %s, %s, %s, %s, TRUE)
-                    """, (emp['nombre'], emp['cargo'], emp['rol'], emp['nfc_uid'], 
-                         emp['hora_entrada'], emp['hora_salida']))
-                
-                db_manager.pg_connection.commit()
                 print(f"✓ {len(self.empleados_demo)} empleados de demostración creados")
                 
                 # Sincronizar a base local
@@ -94,6 +94,7 @@ class SistemaDemo:
                 # Limpiar datos existentes
                 cursor.execute("DELETE FROM empleados_local")
                 cursor.execute("DELETE FROM registros_local")
+                cursor.execute("DELETE FROM resumen_diario_local")
                 
                 # Insertar empleados de demostración
                 for i, emp in enumerate(self.empleados_demo, 1):
@@ -176,27 +177,28 @@ class SistemaDemo:
             hora = fecha_hora.isoformat()
             ubicacion = 'Tepanecos'
             
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("SELECT id FROM ubicaciones WHERE nombre = %s", (ubicacion,))
-                ubicacion_result = cursor.fetchone()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT id FROM ubicaciones WHERE nombre = %s", (ubicacion,))
+                    ubicacion_result = cursor.fetchone()
                 
-                if ubicacion_result:
-                    ubicacion_id = ubicacion_result[0]
+                    if ubicacion_result:
+                        ubicacion_id = ubicacion_result[0]
+                        cursor.execute("""
+                            INSERT INTO registros_asistencia 
+                            (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, sincronizado)
+                            VALUES (%s, %s, %s, %s, %s, %s, TRUE)
+                        """, (empleado_id, ubicacion_id, fecha, hora, tipo_movimiento, estado))
+                        conn.commit()
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
                     cursor.execute("""
-                        INSERT INTO registros_asistencia 
-                        (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, sincronizado)
-                        VALUES (%s, %s, %s, %s, %s, %s, TRUE)
-                    """, (empleado_id, ubicacion_id, fecha, hora, tipo_movimiento, estado))
-                    db_manager.pg_connection.commit()
-            else:
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("""
-                    INSERT INTO registros_local 
-                    (empleado_id, ubicacion_nombre, fecha, hora_registro, tipo_movimiento, estado)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (empleado_id, ubicacion, fecha, hora, tipo_movimiento, estado))
-                db_manager.sqlite_connection.commit()
+                        INSERT INTO registros_local 
+                        (empleado_id, ubicacion_nombre, fecha, hora_registro, tipo_movimiento, estado)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (empleado_id, ubicacion, fecha, hora, tipo_movimiento, estado))
+                    db_manager.sqlite_connection.commit()
                 
         except Exception as e:
             print(f"Error registrando asistencia: {e}")
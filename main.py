@@ -6,21 +6,29 @@ Desarrollado para control de asistencia con tecnología NFC
 Soporte para múltiples ubicaciones: Tepanecos, Lerdo, Destino
 """
 
+import multiprocessing
 import os
 import sys
-import threading
-import time
-from datetime import datetime
 import socket
 
 # Agregar el directorio src al path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from database_manager import db_manager
-from main_screen import MainPublicScreen
-from nfc_handler import nfc_reader, AttendanceValidator
-from report_generator import report_generator
-from cloud_sync import cloud_sync
+
+def _importar_servicios():
+    """Importar los módulos con instancias globales (base de datos, lector NFC, sincronización).
+    No se hace al importar main.py: en Windows los procesos de reportes (spawn) re-ejecutan este
+    archivo como __mp_main__ y no deben abrir la base local, el pool de PostgreSQL ni los lectores.
+    """
+    global db_manager, MainPublicScreen, nfc_reader, AttendanceValidator
+    global report_generator, cloud_sync, photo_cache, scheduler
+    from database_manager import db_manager
+    from main_screen import MainPublicScreen
+    from nfc_handler import nfc_reader, AttendanceValidator
+    from report_generator import report_generator
+    from cloud_sync import cloud_sync
+    from photo_cache import photo_cache
+    from scheduler import scheduler
 
 class SistemaAsistenciaNFC:
     def __init__(self):
@@ -32,6 +40,7 @@ class SistemaAsistenciaNFC:
         
         # Verificar dependencias
         self.check_dependencies()
+        _importar_servicios()
         
         # Inicializar base de datos
         self.init_database()
@@ -70,6 +79,12 @@ class SistemaAsistenciaNFC:
             db_manager.sync_empleados_to_local()
         else:
             print("⚠ PostgreSQL no disponible, usando base de datos local")
+
+        # Mantener el estado de conexión en segundo plano (con reintentos espaciados)
+        db_manager.iniciar_monitor_conectividad()
+
+        # Sembrar la bitácora del día antes de aceptar lecturas
+        db_manager.ledger.sembrar()
         
         print("✓ Base de datos inicializada")
     
@@ -81,8 +96,17 @@ class SistemaAsistenciaNFC:
         self.main_screen = MainPublicScreen()
         nfc_reader.main_screen = self.main_screen
         
-        # Iniciar servicio de sincronización en la nube
-        cloud_sync.start_sync_service()
+        # Enviar en segundo plano las lecturas guardadas en la bitácora local
+        db_manager.iniciar_envio_registros()
+
+        # Precalentar la caché de fotos para mostrarlas al instante en cada lectura
+        # (y borrar las versiones de fotos que ya no usa ningún empleado activo)
+        try:
+            fotos = [e.foto_path for e in db_manager.empleados_index.empleados()]
+            photo_cache.podar(fotos)
+            photo_cache.precalentar(fotos)
+        except Exception as e:
+            print(f"Aviso: no se pudo precalentar la caché de fotos: {e}")
         
         # Iniciar lector NFC
         nfc_reader.start_reading()
@@ -93,33 +117,38 @@ class SistemaAsistenciaNFC:
         print("✓ Servicios configurados")
     
     def schedule_automatic_tasks(self):
-        """Programar tareas automáticas"""
-        def automatic_tasks():
-            while self.services_running:
-                try:
-                    now = datetime.now()
-                    
-                    # Verificar asistencias diarias cada hora
-                    if now.minute == 0:
-                        AttendanceValidator.check_daily_attendance()
-                    
-                    # Generar reportes automáticos el primer día del mes a las 8 AM
-                    if now.day == 1 and now.hour == 8 and now.minute == 0:
-                        report_generator.auto_generate_monthly_reports()
-                    
-                    # Crear backup en la nube cada domingo a las 23:00
-                    if now.weekday() == 6 and now.hour == 23 and now.minute == 0:
-                        cloud_sync.backup_to_s3()
-                    
-                    time.sleep(60)  # Verificar cada minuto
-                    
-                except Exception as e:
-                    print(f"Error en tareas automáticas: {e}")
-                    time.sleep(300)  # Esperar 5 minutos si hay error
-        
+        """Programar tareas automáticas (un solo programador para sincronizaciones y tareas periódicas)"""
+        try:
+            sync_interval = int(os.getenv('SYNC_INTERVAL_SECONDS', '10'))
+        except Exception:
+            sync_interval = 10
+        en_linea = db_manager.is_online
+
+        # Recordar la última ejecución de tareas cron para recuperar las perdidas
+        scheduler.persistencia = (db_manager.leer_configuracion, db_manager.guardar_configuracion)
+
+        # Sincronizaciones con la nube: el intervalo crece mientras no haya cambios o no haya red
+        scheduler.cada('empleados', db_manager.sync_empleados_to_local, sync_interval,
+                       jitter_s=sync_interval / 2, max_s=max(120, sync_interval), condicion=en_linea)
+        scheduler.cada('bitacora_otros_sitios', db_manager.reconciliar_ledger, sync_interval,
+                       jitter_s=sync_interval / 2, max_s=max(60, sync_interval), condicion=en_linea)
+        scheduler.cada('s3', cloud_sync.sincronizar_s3, cloud_sync.sync_interval,
+                       jitter_s=15, max_s=900, condicion=en_linea)
+        scheduler.cada('particiones', db_manager.asegurar_particiones, 6 * 3600, condicion=en_linea)
+
+        # Verificar asistencias diarias cada hora
+        scheduler.cron('faltas', AttendanceValidator.check_daily_attendance, minuto=0)
+        # Generar reportes automáticos el primer día del mes a las 8 AM
+        scheduler.cron('reportes_mensuales', report_generator.auto_generate_monthly_reports,
+                       minuto=0, hora=8, dia=1)
+        # Crear backup en la nube cada domingo a las 23:00
+        scheduler.cron('backup_s3', cloud_sync.backup_to_s3, minuto=0, hora=23, dia_semana=6)
+
+        # Al recuperar la conexión, adelantar las sincronizaciones
+        db_manager.conectividad.on_cambio(lambda online: online and scheduler.despertar())
+
         self.services_running = True
-        tasks_thread = threading.Thread(target=automatic_tasks, daemon=True)
-        tasks_thread.start()
+        scheduler.start()
     
     def run(self):
         """Ejecutar el sistema"""
@@ -148,7 +177,8 @@ class SistemaAsistenciaNFC:
         
         # Detener servicios
         nfc_reader.stop_reading()
-        cloud_sync.stop_sync_service()
+        scheduler.stop()
+        db_manager.detener_envio_registros()
         
         # Sincronización final
         if db_manager.is_online():
@@ -215,4 +245,6 @@ def main():
             pass
 
 if __name__ == "__main__":
+    # Necesario para los procesos de reportes en el ejecutable congelado de Windows
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -5,6 +5,9 @@ import os
 import shutil
 import json
 from database_manager import db_manager
+from employee_index import normalizar_uid
+from photo_cache import photo_cache
+from periodos import rango_mes
 from pathlib import Path
 from report_generator import ReportGenerator
 import re
@@ -216,6 +219,8 @@ class AdminInterface:
         reports_menu = tk.Menu(menubar, tearoff=0)
         reports_menu.add_command(label="Reporte Diario General (PDF+Excel)", command=self.generate_general_daily)
         reports_menu.add_command(label="Reporte Mensual General (PDF+Excel)", command=self.generate_general_monthly)
+        reports_menu.add_command(label="Matriz Mensual de Asistencia (PDF+Excel)", command=self.generate_monthly_matrix)
+        reports_menu.add_command(label="Exportar Registros del Año/Mes (Excel)", command=self.export_records_excel)
         menubar.add_cascade(label="Reportes", menu=reports_menu)
         self.window.config(menu=menubar)
 
@@ -990,23 +995,23 @@ class AdminInterface:
             self.employee_tree.delete(item)
         self._all_employees_cache = []
         try:
-            if db_manager.is_online():
-                db_manager.connect_postgresql()
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT id, nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida
-                    FROM empleados WHERE activo = TRUE
-                    ORDER BY nombre_completo
-                """)
-                employees = cursor.fetchall()
-            else:
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("""
-                    SELECT id, nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida
-                    FROM empleados_local WHERE activo = 1
-                    ORDER BY nombre_completo
-                """)
-                employees = cursor.fetchall()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT id, nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida
+                        FROM empleados WHERE activo = TRUE
+                        ORDER BY nombre_completo
+                    """)
+                    employees = cursor.fetchall()
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("""
+                        SELECT id, nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida
+                        FROM empleados_local WHERE activo = 1
+                        ORDER BY nombre_completo
+                    """)
+                    employees = cursor.fetchall()
             for emp in employees:
                 rol_val = emp[3] if emp[3] else emp[2]
                 row = (emp[0], emp[1], rol_val, emp[4], emp[5], emp[6])
@@ -1141,9 +1146,8 @@ class AdminInterface:
             # Buscar primero en la ruta global
             foto_path = str(self.images_base_dir / f"empleado_{employee_id}.jpg")
             
-            if os.path.exists(foto_path):
-                img = Image.open(foto_path)
-                img = ImageOps.fit(img, (320, 320), Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+            img = photo_cache.obtener(foto_path, 'admin')
+            if img is not None:
                 photo = ImageTk.PhotoImage(img)
                 self.foto_label.configure(image=photo, text="")
                 self.foto_label.image = photo
@@ -1238,61 +1242,56 @@ class AdminInterface:
             salida_ju = (self.salida_jueves_var.get().strip() + ":00") if self.salida_jueves_var.get().strip() else None
             salida_vi = (self.salida_viernes_var.get().strip() + ":00") if self.salida_viernes_var.get().strip() else None
 
-            def _normalize_uid(uid_text: str) -> str:
-                try:
-                    import re as _re
-                    return _re.sub(r"[^0-9A-Fa-f]", "", uid_text or "").upper()
-                except Exception:
-                    return (uid_text or "").replace(" ", "").upper()
-
             uid_raw = self.nfc_uid_var.get().strip()
-            uid_norm = _normalize_uid(uid_raw) if uid_raw else None
+            # Misma regla que la columna nfc_uid_norm (índice único)
+            uid_norm = normalizar_uid(uid_raw) if uid_raw else None
 
             # Validación de duplicados de UID (si viene alguno)
             if uid_norm:
                 try:
-                    if db_manager.is_online():
-                        c = db_manager.pg_connection.cursor()
-                        if self.employee_id.get():
-                            c.execute(
-                                """
-                                SELECT COUNT(*) FROM empleados 
-                                WHERE activo = TRUE AND REPLACE(UPPER(nfc_uid),' ','') = %s AND id <> %s
-                                """,
-                                (uid_norm, int(self.employee_id.get()))
-                            )
-                        else:
-                            c.execute(
-                                """
-                                SELECT COUNT(*) FROM empleados 
-                                WHERE activo = TRUE AND REPLACE(UPPER(nfc_uid),' ','') = %s
-                                """,
-                                (uid_norm,)
-                            )
-                        if (c.fetchone() or [0])[0] > 0:
-                            messagebox.showerror("Tarjeta en uso", "Esta tarjeta NFC ya está asignada a otro empleado.")
-                            return
-                    else:
-                        c = db_manager.sqlite_connection.cursor()
-                        if self.employee_id.get():
-                            c.execute(
-                                """
-                                SELECT COUNT(*) FROM empleados_local 
-                                WHERE activo = 1 AND REPLACE(UPPER(nfc_uid),' ','') = ? AND id <> ?
-                                """,
-                                (uid_norm, int(self.employee_id.get()))
-                            )
+                    with db_manager.pg_session() as conn:
+                        if conn:
+                            c = conn.cursor()
+                            if self.employee_id.get():
+                                c.execute(
+                                    """
+                                    SELECT COUNT(*) FROM empleados 
+                                    WHERE activo = TRUE AND nfc_uid_norm = %s AND id <> %s
+                                    """,
+                                    (uid_norm, int(self.employee_id.get()))
+                                )
+                            else:
+                                c.execute(
+                                    """
+                                    SELECT COUNT(*) FROM empleados 
+                                    WHERE activo = TRUE AND nfc_uid_norm = %s
+                                    """,
+                                    (uid_norm,)
+                                )
+                            if (c.fetchone() or [0])[0] > 0:
+                                messagebox.showerror("Tarjeta en uso", "Esta tarjeta NFC ya está asignada a otro empleado.")
+                                return
                         else:
-                            c.execute(
-                                """
-                                SELECT COUNT(*) FROM empleados_local 
-                                WHERE activo = 1 AND REPLACE(UPPER(nfc_uid),' ','') = ?
-                                """,
-                                (uid_norm,)
-                            )
-                        if (c.fetchone() or [0])[0] > 0:
-                            messagebox.showerror("Tarjeta en uso", "Esta tarjeta NFC ya está asignada a otro empleado.")
-                            return
+                            c = db_manager.sqlite_connection.cursor()
+                            if self.employee_id.get():
+                                c.execute(
+                                    """
+                                    SELECT COUNT(*) FROM empleados_local 
+                                    WHERE activo = 1 AND nfc_uid_norm = ? AND id <> ?
+                                    """,
+                                    (uid_norm, int(self.employee_id.get()))
+                                )
+                            else:
+                                c.execute(
+                                    """
+                                    SELECT COUNT(*) FROM empleados_local 
+                                    WHERE activo = 1 AND nfc_uid_norm = ?
+                                    """,
+                                    (uid_norm,)
+                                )
+                            if (c.fetchone() or [0])[0] > 0:
+                                messagebox.showerror("Tarjeta en uso", "Esta tarjeta NFC ya está asignada a otro empleado.")
+                                return
                 except Exception:
                     # En caso de error de validación, seguimos y dejamos que UNIQUE de la BD actúe
                     pass
@@ -1325,44 +1324,77 @@ class AdminInterface:
             }
             
             # Guardar en base de datos
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
                 
-                if self.employee_id.get():
-                    # Actualizar
-                    cursor.execute("""
-                        UPDATE empleados SET 
-                        nombre_completo = %s, cargo = %s, rol = %s, nfc_uid = %s,
-                        hora_entrada = %s, hora_salida = %s
-                        WHERE id = %s
-                    """, (
-                        empleado_data['nombre_completo'], empleado_data['cargo'], empleado_data['rol'], empleado_data['nfc_uid'],
-                        empleado_data['hora_entrada'], empleado_data['hora_salida'],
-                        self.employee_id.get()
-                    ))
-                    employee_id = self.employee_id.get()
-                else:
-                    # Insertar
-                    cursor.execute(
-                        """
-                        INSERT INTO empleados (nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida)
-                        VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
-                        """,
-                        (
+                    if self.employee_id.get():
+                        # Actualizar
+                        cursor.execute("""
+                            UPDATE empleados SET 
+                            nombre_completo = %s, cargo = %s, rol = %s, nfc_uid = %s,
+                            hora_entrada = %s, hora_salida = %s
+                            WHERE id = %s
+                        """, (
                             empleado_data['nombre_completo'], empleado_data['cargo'], empleado_data['rol'], empleado_data['nfc_uid'],
-                            empleado_data['hora_entrada'], empleado_data['hora_salida']
+                            empleado_data['hora_entrada'], empleado_data['hora_salida'],
+                            self.employee_id.get()
+                        ))
+                        employee_id = self.employee_id.get()
+                    else:
+                        # Insertar
+                        cursor.execute(
+                            """
+                            INSERT INTO empleados (nombre_completo, cargo, rol, nfc_uid, hora_entrada, hora_salida)
+                            VALUES (%s, %s, %s, %s, %s, %s) RETURNING id
+                            """,
+                            (
+                                empleado_data['nombre_completo'], empleado_data['cargo'], empleado_data['rol'], empleado_data['nfc_uid'],
+                                empleado_data['hora_entrada'], empleado_data['hora_salida']
+                            )
                         )
-                    )
-                    employee_id = cursor.fetchone()[0]
+                        employee_id = cursor.fetchone()[0]
                 
-                db_manager.pg_connection.commit()
-                # Espejo local para aplicar personalizados en lector y reportes incluso en modo online
-                try:
+                    conn.commit()
+                    # Espejo local para aplicar personalizados en lector y reportes incluso en modo online
+                    try:
+                        conn_l = db_manager.sqlite_connection
+                        cur_l = conn_l.cursor()
+                        cur_l.execute("PRAGMA table_info(empleados_local)")
+                        cols = {row[1] for row in cur_l.fetchall()}
+                        # Asegurar últimas migraciones si faltan columnas
+                        try:
+                            missing = {"hora_entrada_alt", "hora_salida_alt", "rotacion_semanal", "rotacion_semana_base",
+                                       "salida_por_dia_enabled","salida_lunes","salida_martes","salida_miercoles","salida_jueves","salida_viernes",
+                                       "personalizado_por_dia_enabled","entrada_lunes","entrada_martes","entrada_miercoles","entrada_jueves","entrada_viernes"} - cols
+                            if missing:
+                                from migrations import apply_pending_migrations
+                                apply_pending_migrations(conn_l)
+                                cur_l.execute("PRAGMA table_info(empleados_local)")
+                                cols = {row[1] for row in cur_l.fetchall()}
+                        except Exception:
+                            pass
+                        # Preparar datos filtrados y forzar id consistente con nube
+                        filtered = {k: v for k, v in empleado_data.items() if k in cols or k in {'nombre_completo','cargo','rol','nfc_uid','hora_entrada','hora_salida'}}
+                        filtered['id'] = int(employee_id)
+                        # Upsert: INSERT OR REPLACE por id
+                        columns = ", ".join(filtered.keys())
+                        placeholders = ", ".join(["?"] * len(filtered))
+                        values = list(filtered.values())
+                        cur_l.execute(f"INSERT OR REPLACE INTO empleados_local ({columns}) VALUES ({placeholders})", values)
+                        conn_l.commit()
+                    except Exception:
+                        pass
+                else:
+                    # Verificar columnas disponibles y aplicar migraciones si faltan
                     conn = db_manager.sqlite_connection
-                    cur_l = conn.cursor()
-                    cur_l.execute("PRAGMA table_info(empleados_local)")
-                    cols = {row[1] for row in cur_l.fetchall()}
-                    # Asegurar últimas migraciones si faltan columnas
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute("PRAGMA table_info(empleados_local)")
+                        cols = {row[1] for row in cursor.fetchall()}
+                    except Exception:
+                        cols = set()
+                    # Intentar actualizar esquema si faltan columnas relevantes
                     try:
                         missing = {"hora_entrada_alt", "hora_salida_alt", "rotacion_semanal", "rotacion_semana_base",
                                    "salida_por_dia_enabled","salida_lunes","salida_martes","salida_miercoles","salida_jueves","salida_viernes",
@@ -1370,63 +1402,33 @@ class AdminInterface:
                         if missing:
                             from migrations import apply_pending_migrations
                             apply_pending_migrations(conn)
-                            cur_l.execute("PRAGMA table_info(empleados_local)")
-                            cols = {row[1] for row in cur_l.fetchall()}
+                            cursor.execute("PRAGMA table_info(empleados_local)")
+                            cols = {row[1] for row in cursor.fetchall()}
                     except Exception:
                         pass
-                    # Preparar datos filtrados y forzar id consistente con nube
-                    filtered = {k: v for k, v in empleado_data.items() if k in cols or k in {'nombre_completo','cargo','rol','nfc_uid','hora_entrada','hora_salida'}}
-                    filtered['id'] = int(employee_id)
-                    # Upsert: INSERT OR REPLACE por id
-                    columns = ", ".join(filtered.keys())
-                    placeholders = ", ".join(["?"] * len(filtered))
-                    values = list(filtered.values())
-                    cur_l.execute(f"INSERT OR REPLACE INTO empleados_local ({columns}) VALUES ({placeholders})", values)
-                    conn.commit()
-                except Exception:
-                    pass
-            else:
-                # Verificar columnas disponibles y aplicar migraciones si faltan
-                conn = db_manager.sqlite_connection
-                cursor = conn.cursor()
-                try:
-                    cursor.execute("PRAGMA table_info(empleados_local)")
-                    cols = {row[1] for row in cursor.fetchall()}
-                except Exception:
-                    cols = set()
-                # Intentar actualizar esquema si faltan columnas relevantes
-                try:
-                    missing = {"hora_entrada_alt", "hora_salida_alt", "rotacion_semanal", "rotacion_semana_base",
-                               "salida_por_dia_enabled","salida_lunes","salida_martes","salida_miercoles","salida_jueves","salida_viernes",
-                               "personalizado_por_dia_enabled","entrada_lunes","entrada_martes","entrada_miercoles","entrada_jueves","entrada_viernes"} - cols
-                    if missing:
-                        from migrations import apply_pending_migrations
-                        apply_pending_migrations(conn)
-                        cursor.execute("PRAGMA table_info(empleados_local)")
-                        cols = {row[1] for row in cursor.fetchall()}
-                except Exception:
-                    pass
 
-                # Filtrar solo columnas existentes
-                filtered = {k: v for k, v in empleado_data.items() if k in cols or k in {'nombre_completo','cargo','rol','nfc_uid','hora_entrada','hora_salida'}}
+                    # Filtrar solo columnas existentes
+                    filtered = {k: v for k, v in empleado_data.items() if k in cols or k in {'nombre_completo','cargo','rol','nfc_uid','hora_entrada','hora_salida'}}
 
-                if self.employee_id.get():
-                    assignments = ", ".join([f"{k} = ?" for k in filtered.keys()])
-                    values = list(filtered.values()) + [self.employee_id.get()]
-                    cursor.execute(f"UPDATE empleados_local SET {assignments} WHERE id = ?", values)
-                    employee_id = self.employee_id.get()
-                else:
-                    columns = ", ".join(filtered.keys())
-                    placeholders = ", ".join(["?"] * len(filtered))
-                    values = list(filtered.values())
-                    cursor.execute(f"INSERT INTO empleados_local ({columns}) VALUES ({placeholders})", values)
-                    employee_id = cursor.lastrowid
+                    if self.employee_id.get():
+                        assignments = ", ".join([f"{k} = ?" for k in filtered.keys()])
+                        values = list(filtered.values()) + [self.employee_id.get()]
+                        cursor.execute(f"UPDATE empleados_local SET {assignments} WHERE id = ?", values)
+                        employee_id = self.employee_id.get()
+                    else:
+                        columns = ", ".join(filtered.keys())
+                        placeholders = ", ".join(["?"] * len(filtered))
+                        values = list(filtered.values())
+                        cursor.execute(f"INSERT INTO empleados_local ({columns}) VALUES ({placeholders})", values)
+                        employee_id = cursor.lastrowid
 
-                conn.commit()
+                    conn.commit()
             
             # Guardar foto si existe
             if self.foto_path.get():
                 self.save_employee_photo(employee_id)
+            # El lector debe ver de inmediato el UID/horario nuevos
+            db_manager.invalidar_cache_empleados()
             
             messagebox.showinfo("Éxito", "Empleado guardado correctamente")
             self.load_employees()
@@ -1461,27 +1463,22 @@ class AdminInterface:
 
             # 2) Validar duplicado
             exists = False
-            def _norm(u: str) -> str:
-                try:
-                    import re as _re
-                    return _re.sub(r"[^0-9A-Fa-f]", "", u or "").upper()
-                except Exception:
-                    return (u or "").replace(" ", "").upper()
-            uid_norm = _norm(uid)
-            if db_manager.is_online():
-                c = db_manager.pg_connection.cursor()
-                c.execute(
-                    "SELECT COUNT(*) FROM empleados WHERE REPLACE(UPPER(nfc_uid),' ','') = %s AND activo = TRUE",
-                    (uid_norm,)
-                )
-                exists = c.fetchone()[0] > 0
-            else:
-                c = db_manager.sqlite_connection.cursor()
-                c.execute(
-                    "SELECT COUNT(*) FROM empleados_local WHERE REPLACE(UPPER(nfc_uid),' ','') = ? AND activo = 1",
-                    (uid_norm,)
-                )
-                exists = c.fetchone()[0] > 0
+            uid_norm = normalizar_uid(uid)
+            with db_manager.pg_session() as conn:
+                if conn:
+                    c = conn.cursor()
+                    c.execute(
+                        "SELECT COUNT(*) FROM empleados WHERE nfc_uid_norm = %s AND activo = TRUE",
+                        (uid_norm,)
+                    )
+                    exists = c.fetchone()[0] > 0
+                else:
+                    c = db_manager.sqlite_connection.cursor()
+                    c.execute(
+                        "SELECT COUNT(*) FROM empleados_local WHERE nfc_uid_norm = ? AND activo = 1",
+                        (uid_norm,)
+                    )
+                    exists = c.fetchone()[0] > 0
             if exists:
                 messagebox.showerror("Tarjeta en uso", "Esta tarjeta NFC ya está asignada a otro empleado.")
                 return
@@ -1519,18 +1516,22 @@ class AdminInterface:
                 img = Image.open(self.foto_path.get())
                 img = ImageOps.fit(img, (480, 480), Image.Resampling.LANCZOS, centering=(0.5, 0.5))
                 img.save(dest_path, "JPEG", quality=90)
+                # Regenerar versiones en caché (pantalla principal y administración)
+                photo_cache.refrescar(dest_path)
                 
                 # Actualizar path en base de datos
-                if db_manager.is_online():
-                    cursor = db_manager.pg_connection.cursor()
-                    cursor.execute("UPDATE empleados SET foto_path = %s WHERE id = %s", 
-                                 (dest_path, employee_id))
-                    db_manager.pg_connection.commit()
-                else:
-                    cursor = db_manager.sqlite_connection.cursor()
-                    cursor.execute("UPDATE empleados_local SET foto_path = ? WHERE id = ?", 
-                                 (dest_path, employee_id))
-                    db_manager.sqlite_connection.commit()
+                with db_manager.pg_session() as conn:
+                    if conn:
+                        cursor = conn.cursor()
+                        cursor.execute("UPDATE empleados SET foto_path = %s WHERE id = %s", 
+                                     (dest_path, employee_id))
+                        conn.commit()
+                    else:
+                        cursor = db_manager.sqlite_connection.cursor()
+                        cursor.execute("UPDATE empleados_local SET foto_path = ? WHERE id = ?", 
+                                     (dest_path, employee_id))
+                        db_manager.sqlite_connection.commit()
+                db_manager.invalidar_cache_empleados()
                     
         except Exception as e:
             print(f"Error guardando foto: {e}")
@@ -1543,16 +1544,18 @@ class AdminInterface:
         
         if messagebox.askyesno("Confirmar", "¿Está seguro de eliminar este empleado?"):
             try:
-                if db_manager.is_online():
-                    cursor = db_manager.pg_connection.cursor()
-                    cursor.execute("UPDATE empleados SET activo = FALSE WHERE id = %s", 
-                                 (self.employee_id.get(),))
-                    db_manager.pg_connection.commit()
-                else:
-                    cursor = db_manager.sqlite_connection.cursor()
-                    cursor.execute("UPDATE empleados_local SET activo = 0 WHERE id = ?", 
-                                 (self.employee_id.get(),))
-                    db_manager.sqlite_connection.commit()
+                with db_manager.pg_session() as conn:
+                    if conn:
+                        cursor = conn.cursor()
+                        cursor.execute("UPDATE empleados SET activo = FALSE WHERE id = %s", 
+                                     (self.employee_id.get(),))
+                        conn.commit()
+                    else:
+                        cursor = db_manager.sqlite_connection.cursor()
+                        cursor.execute("UPDATE empleados_local SET activo = 0 WHERE id = ?", 
+                                     (self.employee_id.get(),))
+                        db_manager.sqlite_connection.commit()
+                db_manager.invalidar_cache_empleados()
                 
                 messagebox.showinfo("Éxito", "Empleado eliminado correctamente")
                 self.load_employees()
@@ -1666,27 +1669,22 @@ class AdminInterface:
             if uid:
                 # Validar si ese UID ya está asignado
                 exists = False
-                def _norm(u: str) -> str:
-                    try:
-                        import re as _re
-                        return _re.sub(r"[^0-9A-Fa-f]", "", u or "").upper()
-                    except Exception:
-                        return (u or "").replace(" ", "").upper()
-                uid_norm = _norm(uid)
-                if db_manager.is_online():
-                    c = db_manager.pg_connection.cursor()
-                    c.execute(
-                        "SELECT COUNT(*) FROM empleados WHERE REPLACE(UPPER(nfc_uid),' ','') = %s AND activo = TRUE",
-                        (uid_norm,)
-                    )
-                    exists = c.fetchone()[0] > 0
-                else:
-                    c = db_manager.sqlite_connection.cursor()
-                    c.execute(
-                        "SELECT COUNT(*) FROM empleados_local WHERE REPLACE(UPPER(nfc_uid),' ','') = ? AND activo = 1",
-                        (uid_norm,)
-                    )
-                    exists = c.fetchone()[0] > 0
+                uid_norm = normalizar_uid(uid)
+                with db_manager.pg_session() as conn:
+                    if conn:
+                        c = conn.cursor()
+                        c.execute(
+                            "SELECT COUNT(*) FROM empleados WHERE nfc_uid_norm = %s AND activo = TRUE",
+                            (uid_norm,)
+                        )
+                        exists = c.fetchone()[0] > 0
+                    else:
+                        c = db_manager.sqlite_connection.cursor()
+                        c.execute(
+                            "SELECT COUNT(*) FROM empleados_local WHERE nfc_uid_norm = ? AND activo = 1",
+                            (uid_norm,)
+                        )
+                        exists = c.fetchone()[0] > 0
 
                 if exists:
                     messagebox.showerror("Tarjeta en uso", "Esta tarjeta NFC ya está asignada a otro empleado.")
@@ -1828,25 +1826,26 @@ class AdminInterface:
             # Obtener datos
             rows = []
             if fecha:
-                if db_manager.is_online():
-                    c = db_manager.pg_connection.cursor()
-                    c.execute("""
-                        SELECT fecha, hora_registro, tipo_movimiento, estado, u.nombre
-                        FROM registros_asistencia r
-                        JOIN ubicaciones u ON r.ubicacion_id = u.id
-                        WHERE r.empleado_id = %s AND r.fecha = %s
-                        ORDER BY hora_registro
-                    """, (emp_id, fecha))
-                    rows = c.fetchall()
-                else:
-                    c = db_manager.sqlite_connection.cursor()
-                    c.execute("""
-                        SELECT fecha, hora_registro, tipo_movimiento, estado, ubicacion_nombre
-                        FROM registros_local
-                        WHERE empleado_id = ? AND fecha = ?
-                        ORDER BY hora_registro
-                    """, (emp_id, fecha))
-                    rows = c.fetchall()
+                with db_manager.pg_session() as conn:
+                    if conn:
+                        c = conn.cursor()
+                        c.execute("""
+                            SELECT fecha, hora_registro, tipo_movimiento, estado, u.nombre
+                            FROM registros_asistencia r
+                            JOIN ubicaciones u ON r.ubicacion_id = u.id
+                            WHERE r.empleado_id = %s AND r.fecha = %s
+                            ORDER BY hora_registro
+                        """, (emp_id, fecha))
+                        rows = c.fetchall()
+                    else:
+                        c = db_manager.sqlite_connection.cursor()
+                        c.execute("""
+                            SELECT fecha, hora_registro, tipo_movimiento, estado, ubicacion_nombre
+                            FROM registros_local
+                            WHERE empleado_id = ? AND fecha = ?
+                            ORDER BY hora_registro
+                        """, (emp_id, fecha))
+                        rows = c.fetchall()
             else:
                 # Mes
                 from datetime import datetime
@@ -1855,25 +1854,27 @@ class AdminInterface:
                     year, month = now.year, now.month
                 else:
                     year, month = map(int, mes.split('-'))
-                if db_manager.is_online():
-                    c = db_manager.pg_connection.cursor()
-                    c.execute("""
-                        SELECT fecha, hora_registro, tipo_movimiento, estado, u.nombre
-                        FROM registros_asistencia r
-                        JOIN ubicaciones u ON r.ubicacion_id = u.id
-                        WHERE r.empleado_id = %s AND EXTRACT(YEAR FROM fecha) = %s AND EXTRACT(MONTH FROM fecha) = %s
-                        ORDER BY fecha, hora_registro
-                    """, (emp_id, year, month))
-                    rows = c.fetchall()
-                else:
-                    c = db_manager.sqlite_connection.cursor()
-                    c.execute("""
-                        SELECT fecha, hora_registro, tipo_movimiento, estado, ubicacion_nombre
-                        FROM registros_local
-                        WHERE empleado_id = ? AND substr(fecha,1,4) = ? AND substr(fecha,6,2) = ?
-                        ORDER BY fecha, hora_registro
-                    """, (emp_id, str(year), f"{month:02d}"))
-                    rows = c.fetchall()
+                desde, hasta = rango_mes(year, month)
+                with db_manager.pg_session() as conn:
+                    if conn:
+                        c = conn.cursor()
+                        c.execute("""
+                            SELECT fecha, hora_registro, tipo_movimiento, estado, u.nombre
+                            FROM registros_asistencia r
+                            JOIN ubicaciones u ON r.ubicacion_id = u.id
+                            WHERE r.empleado_id = %s AND r.fecha >= %s AND r.fecha < %s
+                            ORDER BY fecha, hora_registro
+                        """, (emp_id, desde, hasta))
+                        rows = c.fetchall()
+                    else:
+                        c = db_manager.sqlite_connection.cursor()
+                        c.execute("""
+                            SELECT fecha, hora_registro, tipo_movimiento, estado, ubicacion_nombre
+                            FROM registros_local
+                            WHERE empleado_id = ? AND fecha >= ? AND fecha < ?
+                            ORDER BY fecha, hora_registro
+                        """, (emp_id, desde, hasta))
+                        rows = c.fetchall()
 
             # Ventana modal
             win = tk.Toplevel(self.window)
@@ -2000,6 +2001,58 @@ class AdminInterface:
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo generar el reporte mensual: {e}")
 
+    def generate_monthly_matrix(self):
+        """Genera la matriz mensual de asistencia (empleados × días) solicitando año y mes."""
+        try:
+            from datetime import datetime
+            default_mes = datetime.now().strftime('%Y-%m')
+            mes_str = simpledialog.askstring("Mes de la matriz", "Ingresa el mes (YYYY-MM):", initialvalue=default_mes, parent=self.window)
+            if not mes_str:
+                return
+            try:
+                year, month = map(int, mes_str.split('-'))
+                if month < 1 or month > 12:
+                    raise ValueError
+            except Exception:
+                messagebox.showerror("Formato inválido", "El mes debe tener el formato YYYY-MM.")
+                return
+
+            rg = ReportGenerator()
+            files = rg.generate_monthly_matrix_report(year=year, month=month, formato='both')
+            if not files:
+                messagebox.showwarning("Sin datos", f"No se pudo generar la matriz de {year}-{month:02d}.")
+                return
+            msg = "\n".join(files)
+            messagebox.showinfo("Matriz mensual generada", f"Se generaron los siguientes archivos:\n\n{msg}")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo generar la matriz mensual: {e}")
+
+    def export_records_excel(self):
+        """Exporta a Excel todos los registros (todas las ubicaciones) de un año (YYYY) o de un mes (YYYY-MM)."""
+        try:
+            from datetime import datetime
+            default_anio = str(datetime.now().year)
+            periodo = simpledialog.askstring("Periodo a exportar", "Ingresa el año (YYYY) o el mes (YYYY-MM):", initialvalue=default_anio, parent=self.window)
+            if not periodo:
+                return
+            try:
+                partes = [int(p) for p in periodo.strip().split('-')]
+                year, month = partes[0], (partes[1] if len(partes) > 1 else None)
+                if len(partes) > 2 or year < 1 or (month is not None and (month < 1 or month > 12)):
+                    raise ValueError
+            except Exception:
+                messagebox.showerror("Formato inválido", "El periodo debe tener el formato YYYY o YYYY-MM.")
+                return
+
+            rg = ReportGenerator()
+            archivo = rg.export_records_excel(year=year, month=month)
+            if not archivo:
+                messagebox.showwarning("Sin archivo", f"No se pudo exportar el periodo {periodo}.")
+                return
+            messagebox.showinfo("Exportación generada", f"Se generó el archivo:\n\n{archivo}")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo exportar los registros: {e}")
+
     def delete_employee_all(self):
         try:
             if not self.employee_id.get():
@@ -0,0 +1,154 @@
+"""
+Matriz mensual de asistencia (empleados × días).
+- Parte del resumen diario (primera entrada / última salida con sus estados), el horario efectivo
+  de cada día (schedule_compiler) y las justificaciones locales.
+- Cada celda se clasifica con operaciones vectorizadas de NumPy (sin ciclos por fila):
+  A_TIEMPO, RETARDO, TEMPRANO (salida antes de hora), FALTA, JUSTIFICADO, DESCANSO,
+  SIN_HORARIO (jefes sin registro) o '' (día futuro, o de hoy antes del límite de falta).
+- Una falta es un registro FALTA o la ausencia de entrada en un día laborable ya vencido
+  (mismo criterio que faltas.py: entrada + FALTA_MINUTOS_TRAS_ENTRADA).
+- Totales por empleado y por día.
+"""
+from __future__ import annotations
+from datetime import date, datetime
+from typing import Callable, Iterable, Mapping, NamedTuple
+import calendar
+
+import numpy as np
+import pandas as pd
+
+from faltas import dias_descanso, minutos_tras_entrada
+from schedule_compiler import HorarioEfectivo
+
+# Clase -> abreviatura mostrada en la celda
+CODIGOS = {
+    'A_TIEMPO': 'A', 'RETARDO': 'R', 'TEMPRANO': 'T', 'FALTA': 'F',
+    'JUSTIFICADO': 'J', 'DESCANSO': 'D', 'SIN_HORARIO': '-', '': '',
+}
+LEYENDA = {
+    'A_TIEMPO': 'A tiempo', 'RETARDO': 'Retardo', 'TEMPRANO': 'Salida temprana', 'FALTA': 'Falta',
+    'JUSTIFICADO': 'Justificado', 'DESCANSO': 'Descanso', 'SIN_HORARIO': 'Sin horario',
+}
+# Columnas de totales por empleado
+TOTALES_EMPLEADO = (('A_TIEMPO', 'A tiempo'), ('RETARDO', 'Retardos'), ('TEMPRANO', 'Salidas tempranas'),
+                    ('FALTA', 'Faltas'), ('JUSTIFICADO', 'Justificadas'))
+
+
+class MatrizAsistencia(NamedTuple):
+    year: int
+    month: int
+    empleados: pd.DataFrame     # índice empleado_id, columna 'nombre' (orden del reporte)
+    estados: pd.DataFrame       # empleados × días (1..N) con la clase de cada celda
+    por_empleado: pd.DataFrame  # empleados × TOTALES_EMPLEADO
+    por_dia: pd.DataFrame       # ['Asistencias', 'Retardos', 'Faltas'] × días
+
+
+def _minutos(hhmm: str) -> int:
+    try:
+        h, m = str(hhmm).split(':')[:2]
+        return int(h) * 60 + int(m)
+    except ValueError:
+        return -1
+
+
+def construir(year: int, month: int,
+              empleados: Iterable[tuple],
+              resumen: Iterable[tuple],
+              horarios: Callable[[date], Mapping[int, HorarioEfectivo]],
+              justificaciones: Iterable[tuple] = (),
+              ahora: datetime | None = None,
+              minutos_falta: int | None = None,
+              descanso: Iterable[int] | None = None) -> MatrizAsistencia:
+    """Construir la matriz del mes.
+    empleados: (id, nombre); resumen: (empleado_id, nombre, fecha, primera_entrada, ultima_salida,
+    estado_entrada, estado_salida) como _get_monthly_data; justificaciones: (empleado_id, fecha, tipo).
+    """
+    ahora = ahora or datetime.now()
+    minutos_falta = minutos_tras_entrada() if minutos_falta is None else minutos_falta
+    descanso = dias_descanso() if descanso is None else frozenset(descanso)
+    n_dias = calendar.monthrange(year, month)[1]
+    dias = np.arange(1, n_dias + 1)
+    fechas = [date(year, month, int(d)) for d in dias]
+
+    # Orden alfabético por apellidos (última palabra del nombre), como el reporte mensual
+    emp = pd.DataFrame(list(empleados), columns=['empleado_id', 'nombre']).drop_duplicates('empleado_id')
+    emp['nombre'] = emp['nombre'].fillna('').astype(str)
+    emp['_orden'] = emp['nombre'].str.split().str[-1].fillna('').str.upper() + ' ' + emp['nombre'].str.upper()
+    emp = emp.sort_values('_orden').drop(columns='_orden').set_index('empleado_id')
+    ids = emp.index.to_numpy()
+    indice = pd.Index(ids)
+    forma = (len(ids), n_dias)
+
+    def _posiciones(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Fila y columna de la matriz de cada fila de df, y la máscara de filas válidas
+        (descarta empleados o días fuera del mes).
+        """
+        if df.empty:
+            vacio = np.array([], dtype=int)
+            return vacio, vacio, np.array([], dtype=bool)
+        filas = indice.get_indexer(df['empleado_id'])
+        f = pd.to_datetime(df['fecha'].astype(str).str[:10], errors='coerce')
+        ok = (filas >= 0) & (f.dt.year == year).to_numpy() & (f.dt.month == month).to_numpy()
+        return filas[ok], (f.dt.day.to_numpy()[ok] - 1).astype(int), ok
+
+    # Estados de entrada y salida del resumen
+    res = pd.DataFrame(list(resumen), columns=['empleado_id', 'nombre', 'fecha', 'primera_entrada',
+                                               'ultima_salida', 'estado_entrada', 'estado_salida'])
+    entrada = np.full(forma, '', dtype=object)
+    salida = np.full(forma, '', dtype=object)
+    r, c, ok = _posiciones(res)
+    if len(r):
+        entrada[r, c] = res['estado_entrada'].fillna('').astype(str).str.upper().to_numpy()[ok]
+        salida[r, c] = res['estado_salida'].fillna('').astype(str).str.upper().to_numpy()[ok]
+    entrada = entrada.astype(str)
+    salida = salida.astype(str)
+
+    # Horario efectivo de cada día (las tablas por fecha ya vienen compiladas y cacheadas)
+    entrada_min = np.full(forma, -1, dtype=int)
+    sin_horario = np.zeros(forma, dtype=bool)
+    for j, fecha in enumerate(fechas):
+        tabla = horarios(fecha)
+        hs = [tabla.get(int(i)) for i in ids]
+        entrada_min[:, j] = [_minutos(h.entrada) if h else -1 for h in hs]
+        sin_horario[:, j] = [bool(h.sin_horario) if h else True for h in hs]
+
+    # Justificaciones por tipo
+    just = pd.DataFrame(list(justificaciones), columns=['empleado_id', 'fecha', 'tipo'])
+    just_tipo = {t: np.zeros(forma, dtype=bool) for t in ('FALTA', 'RETARDO', 'TEMPRANO')}
+    if not just.empty:
+        just['tipo'] = just['tipo'].astype(str).str.upper()
+        for tipo, matriz in just_tipo.items():
+            jr, jc, _ = _posiciones(just[just['tipo'] == tipo])
+            matriz[jr, jc] = True
+
+    # Días de descanso y días ya vencidos (hoy: sólo pasado el límite de falta)
+    es_descanso = np.array([f.weekday() in descanso for f in fechas])[None, :]
+    hoy = ahora.date()
+    pasado = np.array([f < hoy for f in fechas])[None, :]
+    es_hoy = np.array([f == hoy for f in fechas])[None, :]
+    minuto_actual = ahora.hour * 60 + ahora.minute
+    vencido = pasado | (es_hoy & (entrada_min >= 0) & (minuto_actual >= entrada_min + minutos_falta))
+
+    tiene_entrada = entrada != ''
+    es_falta = (entrada == 'FALTA') | (~tiene_entrada & ~es_descanso & ~sin_horario & vencido)
+    condiciones = [
+        es_falta & just_tipo['FALTA'],
+        es_falta,
+        ~tiene_entrada & es_descanso,
+        ~tiene_entrada & sin_horario,
+        ~tiene_entrada,
+        (entrada == 'RETARDO') & just_tipo['RETARDO'],
+        entrada == 'RETARDO',
+        (salida == 'TEMPRANO') & ~just_tipo['TEMPRANO'],
+    ]
+    clases = ['JUSTIFICADO', 'FALTA', 'DESCANSO', 'SIN_HORARIO', '', 'JUSTIFICADO', 'RETARDO', 'TEMPRANO']
+    estados_np = np.select(condiciones, clases, default='A_TIEMPO')
+
+    estados = pd.DataFrame(estados_np, index=emp.index, columns=dias)
+    por_empleado = pd.DataFrame({etiqueta: (estados_np == clase).sum(axis=1) for clase, etiqueta in TOTALES_EMPLEADO},
+                                index=emp.index)
+    asistio = np.isin(estados_np, ('A_TIEMPO', 'RETARDO', 'TEMPRANO'))
+    por_dia = pd.DataFrame([asistio.sum(axis=0), (estados_np == 'RETARDO').sum(axis=0),
+                            (estados_np == 'FALTA').sum(axis=0)],
+                           index=['Asistencias', 'Retardos', 'Faltas'], columns=dias)
+    return MatrizAsistencia(year, month, emp, estados, por_empleado, por_dia)
@@ -0,0 +1,347 @@
+"""
+Respaldo por flujo de las tablas de PostgreSQL.
+- Cada tabla se lee con un cursor de servidor (con nombre) en lotes de `fetchmany`, se codifica
+  como NDJSON (una fila JSON por línea, columnas en el manifiesto), se comprime con gzip al vuelo
+  y se sube por partes: la memoria usada no depende del tamaño del historial.
+- backups/<nombre>/<tabla>.ndjson.gz y al final backups/<nombre>/manifest.json con filas,
+  bytes y sha256 (del archivo comprimido) por tabla; un respaldo sin manifiesto está incompleto.
+- Destinos intercambiables: S3 (carga multiparte) o un directorio local con la misma estructura
+  de claves, para respaldar sin AWS.
+- restaurar() lee el respaldo también por flujo, verifica conteos y sumas y lo inserta en una
+  transacción (ON CONFLICT DO NOTHING: restaurar dos veces no duplica).
+"""
+from __future__ import annotations
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterator
+import gzip
+import hashlib
+import json
+import os
+
+# Orden de respaldo y restauración (respeta las llaves foráneas)
+TABLAS = ('ubicaciones', 'empleados', 'configuraciones', 'registros_asistencia')
+LOTE = 2000
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date, dt_time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (bytes, memoryview)):
+        return bytes(valor).hex()
+    return str(valor)
+
+
+# ---- destinos ----
+
+class _EscritorS3:
+    """Objeto de S3 escrito por partes (carga multiparte)."""
+    TAM_PARTE = 8 * 1024 * 1024  # S3 exige al menos 5 MiB por parte, salvo la última
+
+    def __init__(self, client, bucket: str, clave: str, content_type: str):
+        self._client = client
+        self._bucket = bucket
+        self._clave = clave
+        self._upload_id = client.create_multipart_upload(
+            Bucket=bucket, Key=clave, ContentType=content_type)['UploadId']
+        self._partes: list[dict] = []
+        self._buffer = bytearray()
+
+    def write(self, datos: bytes) -> int:
+        self._buffer += datos
+        while len(self._buffer) >= self.TAM_PARTE:
+            self._subir_parte(bytes(self._buffer[:self.TAM_PARTE]))
+            del self._buffer[:self.TAM_PARTE]
+        return len(datos)
+
+    def _subir_parte(self, datos: bytes) -> None:
+        numero = len(self._partes) + 1
+        r = self._client.upload_part(Bucket=self._bucket, Key=self._clave, PartNumber=numero,
+                                     UploadId=self._upload_id, Body=datos)
+        self._partes.append({'ETag': r['ETag'], 'PartNumber': numero})
+
+    def close(self) -> None:
+        if self._buffer or not self._partes:
+            self._subir_parte(bytes(self._buffer))
+            self._buffer.clear()
+        self._client.complete_multipart_upload(
+            Bucket=self._bucket, Key=self._clave, UploadId=self._upload_id,
+            MultipartUpload={'Parts': self._partes})
+
+    def abort(self) -> None:
+        try:
+            self._client.abort_multipart_upload(Bucket=self._bucket, Key=self._clave, UploadId=self._upload_id)
+        except Exception as e:
+            print(f"Aviso: no se pudo cancelar la carga de {self._clave}: {e}")
+
+
+class DestinoS3:
+    def __init__(self, client, bucket: str):
+        self.client = client
+        self.bucket = bucket
+
+    def abrir_escritura(self, clave: str, content_type: str = 'application/gzip') -> _EscritorS3:
+        return _EscritorS3(self.client, self.bucket, clave, content_type)
+
+    def abrir_lectura(self, clave: str):
+        return self.client.get_object(Bucket=self.bucket, Key=clave)['Body']
+
+    def escribir_bytes(self, clave: str, datos: bytes, content_type: str = 'application/json') -> None:
+        self.client.put_object(Bucket=self.bucket, Key=clave, Body=datos, ContentType=content_type)
+
+    def leer_bytes(self, clave: str) -> bytes:
+        return self.abrir_lectura(clave).read()
+
+    def __str__(self):
+        return f"s3://{self.bucket}"
+
+
+class _EscritorArchivo:
+    """Archivo escrito en <ruta>.parcial y renombrado al cerrar (nunca queda a medias)."""
+
+    def __init__(self, ruta: Path):
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._ruta = ruta
+        self._temporal = ruta.with_name(ruta.name + '.parcial')
+        self._archivo = open(self._temporal, 'wb')
+
+    def write(self, datos: bytes) -> int:
+        return self._archivo.write(datos)
+
+    def close(self) -> None:
+        self._archivo.close()
+        os.replace(self._temporal, self._ruta)
+
+    def abort(self) -> None:
+        self._archivo.close()
+        try:
+            os.remove(self._temporal)
+        except OSError:
+            pass
+
+
+class DestinoDirectorio:
+    """Directorio local con las mismas claves que S3 (sustituto sin conexión)."""
+
+    def __init__(self, raiz: str | Path):
+        self.raiz = Path(raiz)
+
+    def _ruta(self, clave: str) -> Path:
+        return self.raiz.joinpath(*clave.split('/'))
+
+    def abrir_escritura(self, clave: str, content_type: str = 'application/gzip') -> _EscritorArchivo:
+        return _EscritorArchivo(self._ruta(clave))
+
+    def abrir_lectura(self, clave: str):
+        return open(self._ruta(clave), 'rb')
+
+    def escribir_bytes(self, clave: str, datos: bytes, content_type: str = 'application/json') -> None:
+        escritor = self.abrir_escritura(clave)
+        escritor.write(datos)
+        escritor.close()
+
+    def leer_bytes(self, clave: str) -> bytes:
+        with self.abrir_lectura(clave) as f:
+            return f.read()
+
+    def __str__(self):
+        return str(self.raiz)
+
+
+# ---- flujo comprimido con suma de verificación ----
+
+class _Contador:
+    """Pasa los bytes comprimidos al destino calculando sha256 y tamaño."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.sha = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, datos: bytes) -> int:
+        self.sha.update(datos)
+        self.bytes += len(datos)
+        self.destino.write(datos)
+        return len(datos)
+
+    def flush(self) -> None:
+        pass
+
+
+class _LectorVerificado:
+    """Lee el objeto comprimido calculando sha256 y tamaño de lo leído."""
+
+    def __init__(self, origen):
+        self.origen = origen
+        self.sha = hashlib.sha256()
+        self.bytes = 0
+
+    def read(self, n: int = -1) -> bytes:
+        datos = self.origen.read(n) if n is not None and n >= 0 else self.origen.read()
+        self.sha.update(datos)
+        self.bytes += len(datos)
+        return datos
+
+    def agotar(self) -> None:
+        while self.read(64 * 1024):
+            pass
+
+
+def _columnas(cursor, tabla: str) -> list[str]:
+    """Columnas almacenadas de la tabla (sin las generadas, que no se pueden insertar)."""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, (tabla,))
+    return [r[0] for r in cursor.fetchall()]
+
+
+def _clave(nombre: str, archivo: str) -> str:
+    return f"backups/{nombre}/{archivo}"
+
+
+def respaldar_tabla(conn, destino, nombre: str, tabla: str, lote: int = LOTE) -> dict:
+    """Escribir una tabla como NDJSON comprimido. Retorna su entrada del manifiesto."""
+    columnas = _columnas(conn.cursor(), tabla)
+    if not columnas:
+        raise ValueError(f"Tabla inexistente: {tabla}")
+    clave = _clave(nombre, f"{tabla}.ndjson.gz")
+    escritor = destino.abrir_escritura(clave)
+    contador = _Contador(escritor)
+    filas = 0
+    try:
+        cursor = conn.cursor(name=f"respaldo_{tabla}")
+        cursor.itersize = lote
+        lista = ', '.join(f'"{c}"' for c in columnas)
+        cursor.execute(f'SELECT {lista} FROM "{tabla}"')
+        with gzip.GzipFile(fileobj=contador, mode='wb', mtime=0) as gz:
+            while True:
+                bloque = cursor.fetchmany(lote)
+                if not bloque:
+                    break
+                gz.write(''.join(
+                    json.dumps(list(row), ensure_ascii=False, separators=(',', ':'), default=_valor_json) + '\n'
+                    for row in bloque).encode('utf-8'))
+                filas += len(bloque)
+        cursor.close()
+        escritor.close()
+    except BaseException:
+        escritor.abort()
+        raise
+    return {'tabla': tabla, 'clave': clave, 'columnas': columnas, 'filas': filas,
+            'bytes': contador.bytes, 'sha256': contador.sha.hexdigest()}
+
+
+def respaldar(conn, destino, nombre: str, tablas=TABLAS, lote: int = LOTE) -> dict:
+    """Respaldar las tablas y escribir el manifiesto al final. Retorna el manifiesto."""
+    # Una sola instantánea para todas las tablas (lectura consistente)
+    conn.rollback()
+    cursor = conn.cursor()
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+    entradas = [respaldar_tabla(conn, destino, nombre, tabla, lote) for tabla in tablas]
+    conn.rollback()
+    manifiesto = {
+        'nombre': nombre,
+        'creado': datetime.now().isoformat(),
+        'formato': 'ndjson+gzip',
+        'tablas': entradas,
+    }
+    destino.escribir_bytes(_clave(nombre, 'manifest.json'),
+                           json.dumps(manifiesto, ensure_ascii=False, indent=2).encode('utf-8'))
+    return manifiesto
+
+
+def leer_manifiesto(origen, nombre: str) -> dict:
+    return json.loads(origen.leer_bytes(_clave(nombre, 'manifest.json')).decode('utf-8'))
+
+
+def leer_tabla(origen, entrada: dict) -> Iterator[list]:
+    """Filas de una tabla del respaldo, por flujo. Al terminar verifica conteo y sha256
+    contra el manifiesto y lanza ValueError si no coinciden.
+    """
+    crudo = origen.abrir_lectura(entrada['clave'])
+    lector = _LectorVerificado(crudo)
+    filas = 0
+    try:
+        with gzip.GzipFile(fileobj=lector, mode='rb') as gz:
+            for linea in gz:
+                if linea.strip():
+                    filas += 1
+                    yield json.loads(linea)
+        lector.agotar()
+    finally:
+        try:
+            crudo.close()
+        except Exception:
+            pass
+    if filas != entrada['filas']:
+        raise ValueError(f"{entrada['tabla']}: {filas} filas, el manifiesto indica {entrada['filas']}")
+    if lector.sha.hexdigest() != entrada['sha256']:
+        raise ValueError(f"{entrada['tabla']}: la suma sha256 no coincide con el manifiesto")
+
+
+def verificar(origen, nombre: str) -> dict:
+    """Leer todo el respaldo verificando conteos y sumas. Retorna {tabla: filas}."""
+    resultado = {}
+    for entrada in leer_manifiesto(origen, nombre)['tablas']:
+        resultado[entrada['tabla']] = sum(1 for _ in leer_tabla(origen, entrada))
+    return resultado
+
+
+def restaurar(conn, origen, nombre: str, tablas=None, lote: int = LOTE) -> dict:
+    """Insertar el respaldo en PostgreSQL en una transacción. Retorna {tabla: filas leídas}.
+    Si alguna verificación falla no se confirma nada.
+    """
+    from psycopg2.extras import execute_values
+
+    manifiesto = leer_manifiesto(origen, nombre)
+    cursor = conn.cursor()
+    resultado = {}
+    try:
+        for entrada in manifiesto['tablas']:
+            tabla = entrada['tabla']
+            if tablas and tabla not in tablas:
+                continue
+            # Sólo columnas que existen en el esquema actual
+            actuales = set(_columnas(cursor, tabla))
+            indices = [i for i, c in enumerate(entrada['columnas']) if c in actuales]
+            lista = ', '.join(f'"{entrada["columnas"][i]}"' for i in indices)
+            sql = f'INSERT INTO "{tabla}" ({lista}) VALUES %s ON CONFLICT DO NOTHING'
+            meses = set()
+            bloque = []
+            filas = 0
+            for row in leer_tabla(origen, entrada):
+                bloque.append([row[i] for i in indices])
+                if tabla == 'registros_asistencia' and 'fecha' in entrada['columnas']:
+                    f = row[entrada['columnas'].index('fecha')]
+                    if f:
+                        meses.add(str(f)[:7] + '-01')
+                if len(bloque) >= lote:
+                    execute_values(cursor, sql, bloque, page_size=lote)
+                    filas += len(bloque)
+                    bloque = []
+            if bloque:
+                execute_values(cursor, sql, bloque, page_size=lote)
+                filas += len(bloque)
+            resultado[tabla] = filas
+            # Las filas de meses sin partición quedaron en la partición por defecto
+            if meses:
+                cursor.execute("SELECT to_regproc('registros_asegurar_particion') IS NOT NULL")
+                if cursor.fetchone()[0]:
+                    for mes in sorted(meses):
+                        cursor.execute("SELECT registros_asegurar_particion(%s)", (mes,))
+            # Secuencias después de insertar ids explícitos
+            if 'id' in entrada['columnas']:
+                cursor.execute(f"""
+                    SELECT setval(pg_get_serial_sequence(%s, 'id'), MAX(id))
+                    FROM "{tabla}" HAVING MAX(id) IS NOT NULL AND pg_get_serial_sequence(%s, 'id') IS NOT NULL
+                """, (tabla, tabla))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return resultado
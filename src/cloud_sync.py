@@ -1,10 +1,11 @@
 import boto3
-import threading
-import time
+import hashlib
 import json
 import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from botocore.exceptions import ClientError
 from database_manager import db_manager
+import backup_stream
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,7 +19,7 @@ class CloudSyncManager:
         
         self.s3_client = None
         self.sync_interval = 60  # Sincronizar cada 60 segundos
-        self.is_syncing = False
+        self.dias_registros = 30  # Días de registros exportados como objetos por día
         
         self.init_aws_connection()
     
@@ -47,215 +48,274 @@ class CloudSyncManager:
         except Exception as e:
             print(f"Error conectando con AWS: {e}")
     
-    def start_sync_service(self):
-        """Iniciar servicio de sincronización automática"""
-        if not self.is_syncing:
-            self.is_syncing = True
-            sync_thread = threading.Thread(target=self._sync_loop, daemon=True)
-            sync_thread.start()
-            print("Servicio de sincronización iniciado")
-    
-    def stop_sync_service(self):
-        """Detener servicio de sincronización"""
-        self.is_syncing = False
-        print("Servicio de sincronización detenido")
-    
-    def _sync_loop(self):
-        """Bucle principal de sincronización"""
-        while self.is_syncing:
-            try:
-                # Verificar conexión a internet
-                if db_manager.is_online():
-                    # Sincronizar datos locales a PostgreSQL
-                    db_manager.sync_registros_to_cloud()
-                    
-                    # Sincronizar empleados desde PostgreSQL a local
-                    db_manager.sync_empleados_to_local()
-                    
-                    # Sincronizar datos con AWS S3
-                    if self.s3_client:
-                        self.sync_data_to_s3()
-                        self.sync_data_from_s3()
-                
-                time.sleep(self.sync_interval)
-                
-            except Exception as e:
-                print(f"Error en bucle de sincronización: {e}")
-                time.sleep(30)  # Esperar más tiempo si hay error
+    def sincronizar_s3(self):
+        """Sincronizar con AWS S3 (tarea programada).
+        Retorna True si se subió o aplicó algo (si no, el programador espacia la tarea).
+        """
+        if not self.s3_client:
+            return False
+        subidos = self.sync_data_to_s3()
+        aplicados = self.sync_data_from_s3()
+        return bool(subidos or aplicados)
     
     def sync_data_to_s3(self):
-        """Sincronizar datos a AWS S3"""
+        """Sincronizar datos a AWS S3 (sólo los objetos cuyo contenido cambió).
+        Retorna el número de objetos subidos.
+        """
+        subidos = 0
         try:
             if not self.s3_client:
-                return
+                return 0
             
             # Obtener datos de empleados
             employees_data = self._get_employees_data()
-            if employees_data:
-                self._upload_json_to_s3(employees_data, 'employees.json')
+            if employees_data and self._upload_json_to_s3(employees_data, 'employees.json', solo_si_cambio=True):
+                subidos += 1
             
-            # Obtener datos de registros recientes (último mes)
-            records_data = self._get_recent_records_data()
-            if records_data:
-                self._upload_json_to_s3(records_data, 'recent_records.json')
+            # Registros recientes: un objeto por día, sólo los días que cambiaron
+            subidos += self._sync_registros_por_dia()
             
             # Subir configuraciones
             config_data = self._get_config_data()
-            if config_data:
-                self._upload_json_to_s3(config_data, 'config.json')
+            if config_data and self._upload_json_to_s3(config_data, 'config.json', solo_si_cambio=True):
+                subidos += 1
             
         except Exception as e:
             print(f"Error sincronizando a S3: {e}")
+        return subidos
     
     def sync_data_from_s3(self):
-        """Sincronizar datos desde AWS S3"""
+        """Sincronizar datos desde AWS S3.
+        Retorna True si se aplicó algo.
+        """
         try:
             if not self.s3_client:
-                return
+                return False
+            aplicado = False
             
-            # Descargar y aplicar configuraciones
-            config_data = self._download_json_from_s3('config.json')
+            # Descargar y aplicar configuraciones (GET condicional: 304 si no cambió)
+            config_data = self._download_json_from_s3('config.json', condicional=True)
             if config_data:
                 self._apply_config_data(config_data)
+                aplicado = True
             
             # Sincronizar empleados si la base de datos local está vacía
             if self._is_local_employees_empty():
                 employees_data = self._download_json_from_s3('employees.json')
                 if employees_data:
                     self._apply_employees_data(employees_data)
+                    aplicado = True
+            return aplicado
             
         except Exception as e:
             print(f"Error sincronizando desde S3: {e}")
+            return False
     
     def _get_employees_data(self):
         """Obtener datos de empleados para sincronización"""
         try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT id, nombre_completo, cargo, rol, nfc_uid, foto_path,
-                           hora_entrada, hora_salida, activo, fecha_registro
-                    FROM empleados
-                """)
-                rows = cursor.fetchall()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT id, nombre_completo, cargo, rol, nfc_uid, foto_path,
+                               hora_entrada, hora_salida, activo, fecha_registro
+                        FROM empleados
+                    """)
+                    rows = cursor.fetchall()
                 
-                employees = []
-                for row in rows:
-                    employee = {
-                        'id': row[0],
-                        'nombre_completo': row[1],
-                        'cargo': row[2],
-                        'rol': row[3],
-                        'nfc_uid': row[4],
-                        'foto_path': row[5],
-                        'hora_entrada': str(row[6]) if row[6] else None,
-                        'hora_salida': str(row[7]) if row[7] else None,
-                        'activo': row[8],
-                        'fecha_registro': row[9].isoformat() if row[9] else None
-                    }
-                    employees.append(employee)
+                    employees = []
+                    for row in rows:
+                        employee = {
+                            'id': row[0],
+                            'nombre_completo': row[1],
+                            'cargo': row[2],
+                            'rol': row[3],
+                            'nfc_uid': row[4],
+                            'foto_path': row[5],
+                            'hora_entrada': str(row[6]) if row[6] else None,
+                            'hora_salida': str(row[7]) if row[7] else None,
+                            'activo': row[8],
+                            'fecha_registro': row[9].isoformat() if row[9] else None
+                        }
+                        employees.append(employee)
                 
-                return {
-                    'employees': employees,
-                    'last_sync': datetime.now().isoformat(),
-                    'source': 'postgresql'
-                }
+                    return {
+                        'employees': employees,
+                        'last_sync': datetime.now().isoformat(),
+                        'source': 'postgresql'
+                    }
             
         except Exception as e:
             print(f"Error obteniendo datos de empleados: {e}")
             return None
     
-    def _get_recent_records_data(self):
-        """Obtener datos de registros recientes"""
+    # Firma de un día sin registros (mismo formato que la calculada en PostgreSQL)
+    FIRMA_DIA_VACIO = '0:'
+
+    def _sync_registros_por_dia(self):
+        """Subir records/YYYY-MM-DD.json de los días recientes cuyo contenido cambió.
+        Una firma por día calculada en PostgreSQL (conteo + md5 de id/tipo/estado) se compara con la
+        guardada; sólo se leen y suben los días distintos (normalmente sólo el día actual). Un día
+        con firma guardada que ya no tiene registros (todos borrados) se sube vacío.
+        Retorna el número de objetos subidos.
+        """
         try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
+            desde = (date.today() - timedelta(days=self.dias_registros)).isoformat()
+            with db_manager.pg_session() as conn:
+                if not conn:
+                    return 0
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT fecha, COUNT(*) || ':' || md5(string_agg(
+                               id || '|' || tipo_movimiento || '|' || COALESCE(estado, ''), ',' ORDER BY id))
+                    FROM registros_asistencia
+                    WHERE fecha >= %s
+                    GROUP BY fecha
+                """, (desde,))
+                firmas = {row[0].isoformat(): row[1] for row in cursor.fetchall()}
+                anteriores = self._leer_json_config('S3_FIRMAS_REGISTROS')
+                for d in anteriores:
+                    if d >= desde and d not in firmas:
+                        firmas[d] = self.FIRMA_DIA_VACIO
+                cambiados = sorted(d for d, f in firmas.items() if anteriores.get(d) != f)
+                if not cambiados:
+                    return 0
+                
                 cursor.execute("""
                     SELECT r.id, r.empleado_id, r.ubicacion_id, r.fecha,
                            r.hora_registro, r.tipo_movimiento, r.estado,
                            e.nombre_completo, u.nombre as ubicacion
                     FROM registros_asistencia r
-                    JOIN empleados e ON r.empleado_id = e.id
-                    JOIN ubicaciones u ON r.ubicacion_id = u.id
-                    WHERE r.fecha >= CURRENT_DATE - INTERVAL '30 days'
-                    ORDER BY r.fecha DESC, r.hora_registro DESC
-                """)
-                rows = cursor.fetchall()
-                
-                records = []
-                for row in rows:
-                    record = {
+                    LEFT JOIN empleados e ON r.empleado_id = e.id
+                    LEFT JOIN ubicaciones u ON r.ubicacion_id = u.id
+                    WHERE r.fecha = ANY(%s::date[])
+                    ORDER BY r.fecha, r.hora_registro
+                """, (cambiados,))
+                por_dia = {d: [] for d in cambiados}
+                for row in cursor.fetchall():
+                    por_dia[row[3].isoformat()].append({
                         'id': row[0],
                         'empleado_id': row[1],
                         'ubicacion_id': row[2],
-                        'fecha': row[3].isoformat() if row[3] else None,
+                        'fecha': row[3].isoformat(),
                         'hora_registro': row[4].isoformat() if row[4] else None,
                         'tipo_movimiento': row[5],
                         'estado': row[6],
                         'empleado_nombre': row[7],
                         'ubicacion_nombre': row[8]
-                    }
-                    records.append(record)
-                
-                return {
-                    'records': records,
-                    'last_sync': datetime.now().isoformat(),
-                    'source': 'postgresql'
-                }
+                    })
+            
+            subidos = 0
+            for dia in cambiados:
+                data = {'fecha': dia, 'records': por_dia[dia], 'last_sync': datetime.now().isoformat(),
+                        'source': 'postgresql'}
+                if self._upload_json_to_s3(data, f"records/{dia}.json"):
+                    anteriores[dia] = firmas[dia]
+                    subidos += 1
+            # Conservar sólo las firmas de la ventana
+            db_manager.guardar_configuracion(
+                'S3_FIRMAS_REGISTROS', json.dumps({d: f for d, f in anteriores.items() if d >= desde}))
+            return subidos
             
         except Exception as e:
             print(f"Error obteniendo registros recientes: {e}")
-            return None
+            return 0
     
     def _get_config_data(self):
         """Obtener datos de configuración"""
         try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("SELECT clave, valor, descripcion FROM configuraciones")
-                rows = cursor.fetchall()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT clave, valor, descripcion FROM configuraciones")
+                    rows = cursor.fetchall()
                 
-                config = {}
-                for row in rows:
-                    config[row[0]] = {
-                        'valor': row[1],
-                        'descripcion': row[2]
-                    }
+                    config = {}
+                    for row in rows:
+                        config[row[0]] = {
+                            'valor': row[1],
+                            'descripcion': row[2]
+                        }
                 
-                return {
-                    'config': config,
-                    'last_sync': datetime.now().isoformat(),
-                    'source': 'postgresql'
-                }
+                    return {
+                        'config': config,
+                        'last_sync': datetime.now().isoformat(),
+                        'source': 'postgresql'
+                    }
             
         except Exception as e:
             print(f"Error obteniendo configuración: {e}")
             return None
     
-    def _upload_json_to_s3(self, data, filename):
-        """Subir datos JSON a S3"""
+    @staticmethod
+    def _hash_contenido(data):
+        """Hash del contenido sin campos de marca de tiempo (last_sync/backup_date)."""
+        contenido = {k: v for k, v in data.items() if k not in ('last_sync', 'backup_date')}
+        canonico = json.dumps(contenido, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonico.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _leer_json_config(clave):
+        try:
+            return json.loads(db_manager.leer_configuracion(clave) or '{}')
+        except ValueError:
+            return {}
+    
+    def _upload_json_to_s3(self, data, filename, solo_si_cambio=False):
+        """Subir datos JSON a S3. Con solo_si_cambio se omite el PUT si el contenido no cambió
+        desde la última subida. Retorna True si se subió.
+        """
         try:
-            json_string = json.dumps(data, ensure_ascii=False, indent=2)
+            hash_actual = self._hash_contenido(data)
+            clave_hash = f"S3_HASH_{filename}"
+            if solo_si_cambio and db_manager.leer_configuracion(clave_hash) == hash_actual:
+                return False
             
-            self.s3_client.put_object(
+            json_string = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+            
+            response = self.s3_client.put_object(
                 Bucket=self.bucket_name,
                 Key=filename,
                 Body=json_string.encode('utf-8'),
-                ContentType='application/json'
+                ContentType='application/json',
+                Metadata={'sha256': hash_actual}
             )
             
+            if solo_si_cambio:
+                db_manager.guardar_configuracion(clave_hash, hash_actual)
+            # El objeto que acabamos de subir no necesita volver a descargarse
+            if response.get('ETag'):
+                db_manager.guardar_configuracion(f"S3_ETAG_{filename}", response['ETag'])
             print(f"Archivo {filename} subido a S3")
+            return True
             
         except Exception as e:
             print(f"Error subiendo {filename} a S3: {e}")
+            return False
     
-    def _download_json_from_s3(self, filename):
-        """Descargar datos JSON desde S3"""
+    def _download_json_from_s3(self, filename, condicional=False):
+        """Descargar datos JSON desde S3.
+        Con condicional se envía If-None-Match con el último ETag conocido y se retorna None si
+        el objeto no cambió (304, sin transferir el cuerpo).
+        """
+        clave_etag = f"S3_ETAG_{filename}"
         try:
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=filename)
+            params = {'Bucket': self.bucket_name, 'Key': filename}
+            etag = db_manager.leer_configuracion(clave_etag) if condicional else None
+            if etag:
+                params['IfNoneMatch'] = etag
+            response = self.s3_client.get_object(**params)
             data = json.loads(response['Body'].read().decode('utf-8'))
+            if condicional and response.get('ETag'):
+                db_manager.guardar_configuracion(clave_etag, response['ETag'])
             return data
             
+        except ClientError as e:
+            if e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304:
+                return None
+            print(f"Error descargando {filename} desde S3: {e}")
+            return None
         except Exception as e:
             print(f"Error descargando {filename} desde S3: {e}")
             return None
@@ -308,6 +368,7 @@ class CloudSyncManager:
                 ))
             
             db_manager.sqlite_connection.commit()
+            db_manager.invalidar_cache_empleados()
             print(f"Sincronizados {len(employees_data['employees'])} empleados desde S3")
             
         except Exception as e:
@@ -352,76 +413,39 @@ class CloudSyncManager:
             return False
     
     def backup_to_s3(self, backup_name=None):
-        """Crear backup completo en S3"""
+        """Crear backup completo en S3 (o en BACKUP_DIR si S3 no está configurado).
+        Las tablas se leen y suben por flujo (NDJSON comprimido) con un manifiesto al final.
+        """
         try:
-            if not self.s3_client:
+            destino = self._destino_backup()
+            if destino is None:
                 return False
             
             if backup_name is None:
                 backup_name = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             
-            # Backup de empleados
-            employees_data = self._get_employees_data()
-            if employees_data:
-                self._upload_json_to_s3(employees_data, f"backups/{backup_name}/employees.json")
-            
-            # Backup de todos los registros
-            all_records = self._get_all_records_data()
-            if all_records:
-                self._upload_json_to_s3(all_records, f"backups/{backup_name}/all_records.json")
+            with db_manager.pg_session() as conn:
+                if not conn:
+                    print("Sin conexión a PostgreSQL: backup omitido")
+                    return False
+                manifiesto = backup_stream.respaldar(conn, destino, backup_name)
             
-            # Backup de configuración
-            config_data = self._get_config_data()
-            if config_data:
-                self._upload_json_to_s3(config_data, f"backups/{backup_name}/config.json")
-            
-            print(f"Backup {backup_name} creado en S3")
+            filas = sum(t['filas'] for t in manifiesto['tablas'])
+            print(f"Backup {backup_name} creado en {destino} ({filas} filas)")
             return True
             
         except Exception as e:
             print(f"Error creando backup: {e}")
             return False
     
-    def _get_all_records_data(self):
-        """Obtener todos los registros para backup"""
-        try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT r.*, e.nombre_completo, u.nombre as ubicacion
-                    FROM registros_asistencia r
-                    JOIN empleados e ON r.empleado_id = e.id
-                    JOIN ubicaciones u ON r.ubicacion_id = u.id
-                    ORDER BY r.fecha DESC, r.hora_registro DESC
-                """)
-                rows = cursor.fetchall()
-                
-                records = []
-                for row in rows:
-                    record = {
-                        'id': row[0],
-                        'empleado_id': row[1],
-                        'ubicacion_id': row[2],
-                        'fecha': row[3].isoformat() if row[3] else None,
-                        'hora_registro': row[4].isoformat() if row[4] else None,
-                        'tipo_movimiento': row[5],
-                        'estado': row[6],
-                        'sincronizado': row[7],
-                        'fecha_creacion': row[8].isoformat() if row[8] else None,
-                        'empleado_nombre': row[9],
-                        'ubicacion_nombre': row[10]
-                    }
-                    records.append(record)
-                
-                return {
-                    'records': records,
-                    'backup_date': datetime.now().isoformat(),
-                    'source': 'postgresql'
-                }
-            
-        except Exception as e:
-            print(f"Error obteniendo todos los registros: {e}")
-            return None
+    def _destino_backup(self):
+        """S3 si está configurado; si no, el directorio BACKUP_DIR; None si no hay ninguno."""
+        if self.s3_client:
+            return backup_stream.DestinoS3(self.s3_client, self.bucket_name)
+        directorio = os.getenv('BACKUP_DIR')
+        if directorio:
+            return backup_stream.DestinoDirectorio(directorio)
+        return None
 
 # Instancia global del gestor de sincronización
 cloud_sync = CloudSyncManager()
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Monitor de conectividad con PostgreSQL.
+- Un hilo prueba la conexión en segundo plano; con el enlace caído los reintentos se espacian
+  con retroceso exponencial (sin bloquear lecturas ni la interfaz).
+- is_online() responde del estado en caché (sin viajes a la red) junto con la hora de verificación.
+- Cortacircuito: tras `umbral_fallos` errores de conexión seguidos reportados por las operaciones,
+  el estado pasa a desconectado de inmediato y las rutas calientes usan SQLite hasta que una
+  prueba en segundo plano vuelva a tener éxito.
+"""
+from __future__ import annotations
+from typing import Callable
+import threading
+import time
+
+
+class ConnectivityMonitor:
+    def __init__(self, probe: Callable[[], bool], intervalo_s: float = 15.0,
+                 backoff_max_s: float = 300.0, umbral_fallos: int = 2):
+        # probe() retorna True si PostgreSQL responde (puede lanzar excepción)
+        self._probe = probe
+        self.intervalo_s = intervalo_s
+        self.backoff_max_s = backoff_max_s
+        self.umbral_fallos = max(1, int(umbral_fallos))
+        self._online = False
+        self._verificado_en: float | None = None   # time.time() de la última verificación
+        self._verificado_mono = 0.0
+        self._fallos = 0
+        self._espera_s = intervalo_s
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._activo = False
+        self._listeners: list[Callable[[bool], None]] = []
+
+    # ---- consulta ----
+    def is_online(self) -> bool:
+        """Estado en caché. Sin hilo de monitoreo, prueba de forma síncrona si el dato es viejo."""
+        if not self._activo and (self._verificado_en is None
+                                 or time.monotonic() - self._verificado_mono >= self._espera_s):
+            self.probar()
+        return self._online
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                'online': self._online,
+                'verificado_en': self._verificado_en,
+                'fallos_consecutivos': self._fallos,
+                'siguiente_prueba_s': self._espera_s,
+            }
+
+    def on_cambio(self, callback: Callable[[bool], None]) -> None:
+        """Registrar un callback(online) para cuando cambia el estado."""
+        self._listeners.append(callback)
+
+    # ---- reportes desde las operaciones ----
+    def reportar_exito(self) -> None:
+        with self._lock:
+            self._fallos = 0
+        if not self._online:
+            self._fijar(True)
+
+    def reportar_fallo(self) -> None:
+        """Error de conexión en una operación; abre el circuito al alcanzar el umbral."""
+        with self._lock:
+            self._fallos += 1
+            abrir = self._fallos >= self.umbral_fallos
+        if abrir and self._online:
+            print("⚠️  Conexión a PostgreSQL inestable: usando base local hasta recuperar el enlace")
+            self._fijar(False)
+            self._despertar.set()
+
+    # ---- pruebas ----
+    def probar(self) -> bool:
+        """Probar la conexión ahora (una prueba a la vez)."""
+        with self._probe_lock:
+            try:
+                ok = bool(self._probe())
+            except Exception:
+                ok = False
+            with self._lock:
+                self._verificado_en = time.time()
+                self._verificado_mono = time.monotonic()
+                if ok:
+                    self._fallos = 0
+                    self._espera_s = self.intervalo_s
+                else:
+                    self._fallos += 1
+                    self._espera_s = min(self.backoff_max_s, max(self.intervalo_s, self._espera_s * 2))
+            if ok != self._online:
+                self._fijar(ok)
+            return ok
+
+    def start(self) -> None:
+        if self._activo:
+            return
+        self._activo = True
+        threading.Thread(target=self._loop, daemon=True, name='conectividad').start()
+
+    def stop(self) -> None:
+        self._activo = False
+        self._despertar.set()
+
+    def despertar(self) -> None:
+        """Adelantar la siguiente prueba."""
+        self._despertar.set()
+
+    def _loop(self) -> None:
+        while self._activo:
+            self.probar()
+            self._despertar.wait(self._espera_s)
+            self._despertar.clear()
+
+    def _fijar(self, online: bool) -> None:
+        self._online = online
+        print("🌐 PostgreSQL en línea" if online else "📴 PostgreSQL fuera de línea")
+        for cb in list(self._listeners):
+            try:
+                cb(online)
+            except Exception as e:
+                print(f"Error notificando cambio de conectividad: {e}")
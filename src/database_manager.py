@@ -4,10 +4,20 @@ import json
 from datetime import datetime, date
 from dotenv import load_dotenv
 import threading
+import time
 import importlib
 import hashlib
 import binascii
 import secrets
+import uuid
+from contextlib import contextmanager
+from employee_index import EmployeeIndex, normalizar_uid
+from schedule_compiler import ScheduleCompiler
+from day_ledger import DayLedger
+from pg_pool import PGPool
+from connectivity import ConnectivityMonitor
+from periodos import rango_mes
+from resumen_diario import borrar_sqlite
 
 # Detectar psycopg2 dinámicamente para evitar errores en entornos sin PostgreSQL
 try:
@@ -27,10 +37,26 @@ load_dotenv()
 
 class DatabaseManager:
     def __init__(self):
-        self.pg_connection = None
         self.sqlite_connection = None
         self.lock = threading.Lock()
+        # Bitácora local de lecturas (conexión propia, no comparte el lock global)
+        self.journal_connection = None
+        self._journal_lock = threading.Lock()
+        # Envío en segundo plano de registros locales a la nube
+        self._envio_lock = threading.Lock()
+        self._envio_evento = threading.Event()
+        self._envio_activo = False
+        # Migraciones del esquema en la nube (una vez por proceso; tras un fallo, reintento espaciado)
+        self._pg_esquema_ok = False
+        self._pg_esquema_reintento = 0.0
         self.setup_local_db()
+        # Índice residente UID -> empleado (se carga en la primera búsqueda)
+        self.empleados_index = EmployeeIndex(self._leer_empleados_para_indice)
+        # Horarios efectivos compilados por día (lector y reportes)
+        self.horarios = ScheduleCompiler(self._leer_empleados_para_horarios)
+        # Último movimiento del día por empleado (decide ENTRADA/SALIDA sin leer la BD)
+        self.ledger = DayLedger(self._leer_registros_para_ledger)
+        self._ledger_pg_ultimo_id = 0
         # Parámetros de keepalive para conexiones estables en redes poco confiables
         self._pg_keepalive = dict(
             keepalives=1,
@@ -38,65 +64,125 @@ class DatabaseManager:
             keepalives_interval=10,  # intervalo entre keepalives
             keepalives_count=3       # reintentos antes de considerar caída
         )
+        # Pool de conexiones a PostgreSQL (ningún módulo comparte una conexión única)
+        self.pg_pool = PGPool(
+            self._nueva_conexion_pg,
+            minconn=int(os.getenv('PG_POOL_MIN', '1')),
+            maxconn=int(os.getenv('PG_POOL_MAX', '4')),
+        )
+        # Estado de conexión en caché con cortacircuito (sin SELECT 1 por llamada)
+        self.conectividad = ConnectivityMonitor(
+            self._probar_pg,
+            intervalo_s=float(os.getenv('DB_PROBE_INTERVAL_SECONDS', '15')),
+        )
+        # Al recuperar el enlace, enviar de inmediato lo pendiente
+        self.conectividad.on_cambio(lambda online: online and self._envio_evento.set())
         
+    def _nueva_conexion_pg(self):
+        """Abrir una conexión nueva a PostgreSQL (la usa el pool)."""
+        # Soporte opcional de SSL y keepalive
+        conn_kwargs = dict(
+            host=os.getenv('DB_HOST', 'localhost'),
+            port=os.getenv('DB_PORT', '5432'),
+            database=os.getenv('DB_NAME', 'asistencia_nfc'),
+            user=os.getenv('DB_USER', 'postgres'),
+            password=os.getenv('DB_PASSWORD', ''),
+            # Un enlace caído no debe congelar a quien conecta
+            connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+            **self._pg_keepalive,
+        )
+        sslmode = os.getenv('DB_SSLMODE')
+        if sslmode:
+            conn_kwargs['sslmode'] = sslmode
+        conn = psycopg2.connect(**conn_kwargs)
+        try:
+            conn.autocommit = False
+        except Exception:
+            pass
+        return conn
+
     def connect_postgresql(self):
-        """Establece conexión a PostgreSQL si no existe y retorna True si queda conectada."""
+        """Abrir las conexiones mínimas del pool y retornar True si PostgreSQL responde."""
         if not POSTGRESQL_AVAILABLE:
             return False
         try:
-            if self.pg_connection and getattr(self.pg_connection, 'closed', 1) == 0:
-                return True
-            # Soporte opcional de SSL y keepalive
-            conn_kwargs = dict(
-                host=os.getenv('DB_HOST', 'localhost'),
-                port=os.getenv('DB_PORT', '5432'),
-                database=os.getenv('DB_NAME', 'asistencia_nfc'),
-                user=os.getenv('DB_USER', 'postgres'),
-                password=os.getenv('DB_PASSWORD', ''),
-                **self._pg_keepalive,
-            )
-            sslmode = os.getenv('DB_SSLMODE')
-            if sslmode:
-                conn_kwargs['sslmode'] = sslmode
-            self.pg_connection = psycopg2.connect(**conn_kwargs)
-            # autocommit para operaciones simples y menor latencia
-            try:
-                self.pg_connection.autocommit = False
-            except Exception:
-                pass
-            return True
+            self.pg_pool.precalentar()
         except Exception as e:
             print(f"Error conectando a PostgreSQL: {e}")
-            self.pg_connection = None
+        if not self.conectividad.probar():
             return False
+        try:
+            with self.pg_session() as conn:
+                if conn:
+                    self._asegurar_esquema_pg(conn)
+        except Exception as e:
+            print(f"Aviso migraciones en la nube: {e}")
+        return True
 
-    def _get_pg_conn(self):
-        """Obtiene una conexión activa a PostgreSQL, intentando reconectar si es necesario. Retorna None si no hay."""
+    def _probar_pg(self) -> bool:
+        """Prueba de conectividad (la ejecuta el monitor, normalmente en segundo plano)."""
         if not POSTGRESQL_AVAILABLE:
-            return None
-        try:
-            if self.pg_connection is None or getattr(self.pg_connection, 'closed', 1) != 0:
-                if not self.connect_postgresql():
-                    return None
-            # Ping ligero
+            return False
+        with self.pg_pool.connection() as conn:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            return True
+
+    def iniciar_monitor_conectividad(self):
+        """Iniciar las pruebas de conectividad en segundo plano."""
+        if POSTGRESQL_AVAILABLE:
+            self.conectividad.start()
+
+    @staticmethod
+    def _es_error_conexion(exc) -> bool:
+        if not POSTGRESQL_AVAILABLE:
+            return False
+        return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+    @contextmanager
+    def pg_session(self):
+        """Conexión del pool para el bloque, o None si PostgreSQL no está disponible.
+        Uso: with db_manager.pg_session() as conn: if conn: ...
+        Al salir, la conexión vuelve al pool (se deshace lo que no se haya confirmado).
+        """
+        conn = None
+        # Cortacircuito: con el enlace marcado como caído se usa SQLite sin intentar conectar
+        if POSTGRESQL_AVAILABLE and self.conectividad.is_online():
             try:
-                cur = self.pg_connection.cursor()
-                cur.execute('SELECT 1')
-                cur.fetchone()
-            except Exception:
-                # Intentar reconectar una vez
-                if not self.connect_postgresql():
-                    return None
-            return self.pg_connection
-        except Exception:
-            return None
-    
+                conn = self.pg_pool.checkout()
+            except Exception as e:
+                print(f"Error conectando a PostgreSQL: {e}")
+                if self._es_error_conexion(e):
+                    self.conectividad.reportar_fallo()
+                conn = None
+        error = False
+        try:
+            yield conn
+        except Exception as e:
+            error = True
+            if conn is not None and self._es_error_conexion(e):
+                self.conectividad.reportar_fallo()
+            raise
+        else:
+            if conn is not None:
+                # Los fallos del cortacircuito deben ser consecutivos
+                self.conectividad.reportar_exito()
+        finally:
+            if conn is not None:
+                self.pg_pool.checkin(conn, error)
+
     def setup_local_db(self):
         """Configurar base de datos local SQLite para cuando no hay internet"""
         local_db_path = os.path.join(os.path.dirname(__file__), '..', 'database', 'local.db')
         os.makedirs(os.path.dirname(local_db_path), exist_ok=True)
         
         self.sqlite_connection = sqlite3.connect(local_db_path, check_same_thread=False)
+        # WAL: lectores y la bitácora de lecturas no se bloquean entre sí
+        try:
+            self.sqlite_connection.execute("PRAGMA journal_mode=WAL")
+        except Exception as e:
+            print(f"Aviso: no se pudo activar WAL en SQLite: {e}")
         
         # Crear tablas locales
         cursor = self.sqlite_connection.cursor()
@@ -169,6 +255,14 @@ class DatabaseManager:
                 print(f"Migraciones aplicadas: {', '.join(applied)}")
         except Exception as e:
             print(f"Aviso migraciones: {e}")
+        # Conexión dedicada para registrar lecturas: commit con fsync (synchronous=FULL)
+        try:
+            self.journal_connection = sqlite3.connect(local_db_path, check_same_thread=False, timeout=10)
+            self.journal_connection.execute("PRAGMA journal_mode=WAL")
+            self.journal_connection.execute("PRAGMA synchronous=FULL")
+        except Exception as e:
+            print(f"Aviso: bitácora local sin conexión dedicada: {e}")
+            self.journal_connection = None
         # Bootstrap de usuario admin si no existe
         try:
             c = self.sqlite_connection.cursor()
@@ -214,165 +308,441 @@ class DatabaseManager:
             print(f"Error creando admin por defecto: {e}")
     
     def is_online(self):
-        """Verificar si hay conexión válida a PostgreSQL con ping ligero."""
-        return self._get_pg_conn() is not None
+        """Estado de conexión a PostgreSQL en caché (lo mantiene el monitor de conectividad)."""
+        return POSTGRESQL_AVAILABLE and self.conectividad.is_online()
     
+    # Columnas de empleados que vienen de la nube (las demás de empleados_local son sólo locales)
+    EMPLEADOS_COLS_NUBE = ('id', 'nombre_completo', 'cargo', 'rol', 'nfc_uid', 'foto_path',
+                           'hora_entrada', 'hora_salida', 'activo')
+    # Solapamiento al leer cambios por updated_at (transacciones que confirman tarde)
+    EMPLEADOS_SOLAPE_S = 120
+
     def sync_empleados_to_local(self):
-        """Sincronizar empleados de PostgreSQL a SQLite"""
-        conn = self._get_pg_conn()
-        if not conn:
-            return False
-            
+        """Replicar a SQLite los empleados que cambiaron en PostgreSQL desde la última vez.
+        Una sonda barata (máximo updated_at y conteo) evita todo trabajo si nada cambió;
+        si cambió, sólo se leen las filas modificadas y se aplican con upsert en una transacción,
+        conservando las columnas locales (rotación, horarios por día); los ids locales que ya no
+        existen en la nube se borran.
+        Retorna True si hubo cambios (el programador espacia la tarea mientras no los haya).
+        """
         try:
-            with self.lock:
-                # Obtener empleados de PostgreSQL
+            with self.pg_session() as conn:
+                if not conn:
+                    return False
+                self._asegurar_esquema_pg(conn)
                 pg_cursor = conn.cursor()
-                pg_cursor.execute("""
-                    SELECT id, nombre_completo, cargo, rol, nfc_uid, foto_path, 
-                           hora_entrada, hora_salida, activo
-                    FROM empleados WHERE activo = TRUE
-                """)
-                empleados = pg_cursor.fetchall()
-                
-                # Limpiar y cargar en SQLite
+                pg_cursor.execute("SELECT MAX(updated_at), COUNT(*) FROM empleados")
+                max_updated, total = pg_cursor.fetchone()
+                firma = f"{max_updated.isoformat() if max_updated else ''}|{total}"
+                firma_anterior = self.leer_configuracion('EMPLEADOS_SYNC_FIRMA')
+                if firma == firma_anterior:
+                    return False
+
+                cols = ', '.join(self.EMPLEADOS_COLS_NUBE)
+                desde = self.leer_configuracion('EMPLEADOS_SYNC_DESDE')
+                if desde:
+                    pg_cursor.execute(
+                        f"SELECT {cols} FROM empleados WHERE updated_at > %s::timestamptz - %s * INTERVAL '1 second'",
+                        (desde, self.EMPLEADOS_SOLAPE_S),
+                    )
+                else:
+                    pg_cursor.execute(f"SELECT {cols} FROM empleados")
+                cambios = pg_cursor.fetchall()
+                # Bajas físicas: con la firma cambiada se comparan siempre los ids vigentes
+                # (un borrado más un alta en el mismo intervalo no cambia el conteo)
+                pg_cursor.execute("SELECT id FROM empleados")
+                ids_nube = {row[0] for row in pg_cursor.fetchall()}
+
+            with self.lock:
                 sqlite_cursor = self.sqlite_connection.cursor()
-                sqlite_cursor.execute("DELETE FROM empleados_local")
-                
-                for emp in empleados:
-                    sqlite_cursor.execute("""
-                        INSERT INTO empleados_local 
-                        (id, nombre_completo, cargo, rol, nfc_uid, foto_path, hora_entrada, hora_salida, activo)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, emp)
-                
-                self.sqlite_connection.commit()
-                return True
+                try:
+                    self._upsert_empleados_local(sqlite_cursor, cambios)
+                    sqlite_cursor.execute("SELECT id FROM empleados_local")
+                    sobrantes = [(row[0],) for row in sqlite_cursor.fetchall() if row[0] not in ids_nube]
+                    sqlite_cursor.executemany("DELETE FROM empleados_local WHERE id = ?", sobrantes)
+                    borrados = len(sobrantes)
+                    self._guardar_config(sqlite_cursor, 'EMPLEADOS_SYNC_FIRMA', firma)
+                    if max_updated:
+                        self._guardar_config(sqlite_cursor, 'EMPLEADOS_SYNC_DESDE', max_updated.isoformat())
+                    self.sqlite_connection.commit()
+                except Exception:
+                    self.sqlite_connection.rollback()
+                    raise
+            if cambios or borrados:
+                self.invalidar_cache_empleados()
+                print(f"Empleados sincronizados: {len(cambios)} actualizados, {borrados} eliminados")
+            return True
                 
         except Exception as e:
             print(f"Error sincronizando empleados: {e}")
             return False
+
+    def _upsert_empleados_local(self, cursor, filas):
+        """Insertar o actualizar empleados en SQLite sólo con las columnas de la nube."""
+        if not filas:
+            return
+        filas = [tuple(self._valor_sqlite(v) for v in fila) for fila in filas]
+        # Una tarjeta reasignada en la nube no debe chocar con el UNIQUE local (sobre nfc_uid_norm)
+        # del dueño anterior, aunque allá esté escrita con otros separadores
+        cursor.executemany(
+            "UPDATE empleados_local SET nfc_uid = NULL WHERE nfc_uid_norm = ? AND id <> ?",
+            [(normalizar_uid(f[4]), f[0]) for f in filas if f[4] and normalizar_uid(f[4])],
+        )
+        cols = self.EMPLEADOS_COLS_NUBE
+        asignaciones = ', '.join(f"{c} = excluded.{c}" for c in cols[1:])
+        cursor.executemany(f"""
+            INSERT INTO empleados_local ({', '.join(cols)})
+            VALUES ({', '.join('?' for _ in cols)})
+            ON CONFLICT(id) DO UPDATE SET {asignaciones}
+        """, filas)
+
+    @staticmethod
+    def _valor_sqlite(valor):
+        # TIME de PostgreSQL -> 'HH:MM:SS'; booleanos -> 0/1
+        if isinstance(valor, bool):
+            return int(valor)
+        if hasattr(valor, 'isoformat') and not isinstance(valor, (datetime, date)):
+            return valor.isoformat()
+        return valor
+
+    def leer_configuracion(self, clave):
+        """Valor de configuraciones_local o None."""
+        with self.lock:
+            c = self.sqlite_connection.cursor()
+            c.execute("SELECT valor FROM configuraciones_local WHERE clave = ?", (clave,))
+            row = c.fetchone()
+        return row[0] if row else None
+
+    def guardar_configuracion(self, clave, valor):
+        """Guardar un valor en configuraciones_local."""
+        with self.lock:
+            self._guardar_config(self.sqlite_connection.cursor(), clave, valor)
+            self.sqlite_connection.commit()
+
+    @staticmethod
+    def _guardar_config(cursor, clave, valor):
+        cursor.execute("INSERT OR REPLACE INTO configuraciones_local (clave, valor) VALUES (?, ?)",
+                       (clave, str(valor)))
+
+    def _leer_empleados_para_indice(self):
+        """Filas de empleados_local para construir el índice UID -> empleado.
+        Corre en hilos de trabajo y del programador: la conexión compartida se usa con self.lock.
+        """
+        with self.lock:
+            c = self.sqlite_connection.cursor()
+            c.execute("""
+                SELECT id, nombre_completo, cargo, rol, nfc_uid, foto_path,
+                       hora_entrada, hora_salida, activo
+                FROM empleados_local WHERE activo = 1
+            """)
+            return c.fetchall()
+
+    def _leer_empleados_para_horarios(self):
+        """Filas completas de empleados_local (como dicts) para compilar horarios (con self.lock)."""
+        with self.lock:
+            c = self.sqlite_connection.cursor()
+            c.execute("SELECT * FROM empleados_local")
+            cols = [d[0] for d in c.description]
+            filas = c.fetchall()
+        return [dict(zip(cols, row)) for row in filas]
+
+    def invalidar_cache_empleados(self):
+        """Invalidar el índice de empleados y los horarios compilados tras altas, cambios o bajas."""
+        self.empleados_index.invalidar()
+        self.horarios.invalidar()
     
+    # Registros por lote al enviar la bitácora local a la nube
+    ENVIO_LOTE = 500
+
     def sync_registros_to_cloud(self):
-        """Sincronizar registros locales a PostgreSQL"""
-        conn = self._get_pg_conn()
-        if not conn:
-            return False
-            
+        """Enviar a PostgreSQL los registros locales pendientes (sincronizado = 0), por lotes.
+        Usa su propia conexión del pool; las lecturas siguen registrándose mientras tanto.
+        """
+        # Un solo envío a la vez (servicio de envío, bucles de sincronización y cierre)
+        if not self._envio_lock.acquire(blocking=False):
+            return True
         try:
-            with self.lock:
-                sqlite_cursor = self.sqlite_connection.cursor()
-                sqlite_cursor.execute("""
-                    SELECT empleado_id, ubicacion_nombre, fecha, hora_registro, 
-                           tipo_movimiento, estado
-                    FROM registros_local WHERE sincronizado = 0
-                """)
-                registros_pendientes = sqlite_cursor.fetchall()
-                
-                if not registros_pendientes:
-                    return True
-                
-                pg_cursor = conn.cursor()
-                
-                for registro in registros_pendientes:
-                    empleado_id, ubicacion_nombre, fecha, hora_registro, tipo_movimiento, estado = registro
-                    
-                    # Obtener ID de ubicación
-                    pg_cursor.execute("SELECT id FROM ubicaciones WHERE nombre = %s", (ubicacion_nombre,))
-                    ubicacion_result = pg_cursor.fetchone()
-                    if not ubicacion_result:
-                        continue
-                    
-                    ubicacion_id = ubicacion_result[0]
-                    
-                    # Insertar en PostgreSQL
-                    pg_cursor.execute("""
-                        INSERT INTO registros_asistencia 
-                        (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, sincronizado)
-                        VALUES (%s, %s, %s, %s, %s, %s, TRUE)
-                    """, (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado))
-                
-                conn.commit()
-                
-                # Marcar como sincronizados en SQLite
-                sqlite_cursor.execute("UPDATE registros_local SET sincronizado = 1 WHERE sincronizado = 0")
-                self.sqlite_connection.commit()
-                
-                return True
-                
+            with self.pg_session() as conn:
+                if not conn:
+                    return False
+                return self._enviar_pendientes(conn)
         except Exception as e:
             print(f"Error sincronizando a la nube: {e}")
             return False
-    
+        finally:
+            self._envio_lock.release()
+
+    def _enviar_pendientes(self, conn):
+        """Enviar por lotes los registros pendientes usando la conexión dada.
+        Cada lote viaja en un solo INSERT de varias filas; la llave client_uuid hace que
+        reenviar un lote (p. ej. tras perder la respuesta del commit) no duplique registros.
+        Las faltas marcadas sin conexión se vuelven a validar contra el resumen de la nube: si el
+        empleado registró entrada en otro sitio no se insertan y se borran de la bitácora local.
+        """
+        from psycopg2.extras import execute_values
+        from faltas import PREFIJO_CLIENT_UUID
+        self._asegurar_esquema_pg(conn)
+        # Filas antiguas o escritas por otras rutas sin llave de idempotencia
+        with self._journal_lock:
+            jc = self._journal_conn()
+            jc.execute("""
+                UPDATE registros_local SET client_uuid = lower(hex(randomblob(16)))
+                WHERE client_uuid IS NULL AND sincronizado = 0
+            """)
+            jc.commit()
+
+        pg_cursor = conn.cursor()
+        pg_cursor.execute("SELECT id, nombre FROM ubicaciones")
+        ubicaciones = {(nombre or '').strip().upper(): uid for uid, nombre in pg_cursor.fetchall()}
+        conn.commit()
+
+        ultimo_id = 0
+        while True:
+            with self._journal_lock:
+                c = self._journal_conn().cursor()
+                c.execute("""
+                    SELECT id, empleado_id, ubicacion_nombre, fecha, hora_registro,
+                           tipo_movimiento, estado, client_uuid
+                    FROM registros_local
+                    WHERE sincronizado = 0 AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                """, (ultimo_id, self.ENVIO_LOTE))
+                lote = c.fetchall()
+            if not lote:
+                return True
+            ultimo_id = lote[-1][0]
+
+            enviados = []
+            filas = []
+            faltas = {}
+            for reg_id, empleado_id, ubicacion_nombre, fecha, hora_registro, tipo_movimiento, estado, client_uuid in lote:
+                ubicacion_id = ubicaciones.get((ubicacion_nombre or '').strip().upper())
+                if ubicacion_id is None:
+                    print(f"Aviso: ubicación desconocida '{ubicacion_nombre}' en registro local {reg_id}; se reintentará")
+                    continue
+                fila = (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, client_uuid)
+                if estado == 'FALTA' and str(client_uuid).startswith(PREFIJO_CLIENT_UUID):
+                    faltas[client_uuid] = (reg_id, fila)
+                    continue
+                filas.append(fila)
+                enviados.append(reg_id)
+            if filas:
+                execute_values(pg_cursor, """
+                    INSERT INTO registros_asistencia 
+                    (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, client_uuid, sincronizado)
+                    VALUES %s
+                    ON CONFLICT DO NOTHING
+                """, filas, template="(%s, %s, %s, %s, %s, %s, %s, TRUE)", page_size=self.ENVIO_LOTE)
+            rechazadas = []
+            if faltas:
+                # Después de las lecturas del lote, para que sus entradas ya cuenten en el resumen
+                execute_values(pg_cursor, """
+                    INSERT INTO registros_asistencia
+                    (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, client_uuid, sincronizado)
+                    SELECT v.empleado_id, v.ubicacion_id, v.fecha::date, v.hora_registro::timestamp,
+                           v.tipo_movimiento, v.estado, v.client_uuid, TRUE
+                    FROM (VALUES %s) AS v(empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, client_uuid)
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM resumen_diario s
+                        WHERE s.empleado_id = v.empleado_id AND s.fecha = v.fecha::date
+                          AND s.primera_entrada IS NOT NULL)
+                    ON CONFLICT DO NOTHING
+                """, [fila for _, fila in faltas.values()], page_size=self.ENVIO_LOTE)
+                # Las que no quedaron en la nube (ni de este envío ni de uno anterior) se descartan
+                pg_cursor.execute("SELECT client_uuid FROM registros_asistencia WHERE client_uuid = ANY(%s)",
+                                  (list(faltas),))
+                en_nube = {row[0] for row in pg_cursor.fetchall()}
+                for client_uuid, (reg_id, _) in faltas.items():
+                    (enviados if client_uuid in en_nube else rechazadas).append(reg_id)
+            conn.commit()
+
+            if rechazadas:
+                with self._journal_lock:
+                    jc = self._journal_conn()
+                    borrar_sqlite(jc.cursor(), "id IN (SELECT value FROM json_each(?))", (json.dumps(rechazadas),))
+                    jc.commit()
+                print(f"Faltas sin conexión descartadas (hubo entrada en otro sitio): {len(rechazadas)}")
+
+            # Marcar exactamente los registros enviados
+            if enviados:
+                with self._journal_lock:
+                    jc = self._journal_conn()
+                    jc.executemany("UPDATE registros_local SET sincronizado = 1 WHERE id = ?",
+                                   [(reg_id,) for reg_id in enviados])
+                    jc.commit()
+            if len(lote) < self.ENVIO_LOTE:
+                return True
+
+    # Espera antes de reintentar migraciones en la nube que fallaron
+    PG_ESQUEMA_REINTENTO_S = 900
+
+    def _asegurar_esquema_pg(self, conn):
+        """Aplicar una vez por proceso las migraciones pendientes del esquema en la nube.
+        Una migración fallida se registra y no bloquea al llamador (envío de lecturas, sincronización);
+        se reintenta pasados PG_ESQUEMA_REINTENTO_S segundos.
+        """
+        if self._pg_esquema_ok or time.monotonic() < self._pg_esquema_reintento:
+            return
+        from pg_migrations import apply_pending_pg_migrations
+        try:
+            applied = apply_pending_pg_migrations(conn)
+        except Exception as e:
+            print(f"Error aplicando migraciones en la nube (se reintentará): {e}")
+            self._pg_esquema_reintento = time.monotonic() + self.PG_ESQUEMA_REINTENTO_S
+            return
+        if applied:
+            print(f"Migraciones en la nube aplicadas: {', '.join(applied)}")
+        self._pg_esquema_ok = True
+
+    def _journal_conn(self):
+        """Conexión para la bitácora de lecturas (la principal si no hay dedicada)."""
+        return self.journal_connection or self.sqlite_connection
+
     def insertar_registro(self, empleado_id, ubicacion_nombre, tipo_movimiento, estado):
-        """Insertar registro de asistencia"""
+        """Registrar una lectura: se guarda primero en la bitácora local (commit durable)
+        y se confirma de inmediato; el envío a la nube ocurre en segundo plano.
+        """
         fecha_actual = date.today().isoformat()
         hora_actual = datetime.now().isoformat()
         
         try:
-            with self.lock:
-                conn = self._get_pg_conn()
-                if conn:
-                    # Insertar directamente en PostgreSQL
-                    pg_cursor = conn.cursor()
-                    pg_cursor.execute("SELECT id FROM ubicaciones WHERE nombre = %s", (ubicacion_nombre,))
-                    ubicacion_result = pg_cursor.fetchone()
-                    
-                    if ubicacion_result:
-                        ubicacion_id = ubicacion_result[0]
-                        pg_cursor.execute("""
-                            INSERT INTO registros_asistencia 
-                            (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, sincronizado)
-                            VALUES (%s, %s, %s, %s, %s, %s, TRUE)
-                        """, (empleado_id, ubicacion_id, fecha_actual, hora_actual, tipo_movimiento, estado))
-                        conn.commit()
-                else:
-                    # Guardar localmente
-                    sqlite_cursor = self.sqlite_connection.cursor()
-                    sqlite_cursor.execute("""
-                        INSERT INTO registros_local 
-                        (empleado_id, ubicacion_nombre, fecha, hora_registro, tipo_movimiento, estado)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (empleado_id, ubicacion_nombre, fecha_actual, hora_actual, tipo_movimiento, estado))
-                    self.sqlite_connection.commit()
-                
-                return True
-                
+            with self._journal_lock:
+                jc = self._journal_conn()
+                jc.execute("""
+                    INSERT INTO registros_local 
+                    (empleado_id, ubicacion_nombre, fecha, hora_registro, tipo_movimiento, estado, client_uuid)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (empleado_id, ubicacion_nombre, fecha_actual, hora_actual, tipo_movimiento, estado,
+                      uuid.uuid4().hex))
+                jc.commit()
         except Exception as e:
             print(f"Error insertando registro: {e}")
             return False
+
+        self.ledger.registrar(empleado_id, tipo_movimiento, hora_actual, estado)
+        # Despertar al servicio de envío
+        self._envio_evento.set()
+        return True
+
+    def iniciar_envio_registros(self, intervalo_max: float = 30.0):
+        """Iniciar el hilo que envía la bitácora local a la nube.
+        Se despierta con cada lectura o, como máximo, cada `intervalo_max` segundos.
+        """
+        if self._envio_activo:
+            return
+        self._envio_activo = True
+
+        def _loop():
+            while self._envio_activo:
+                self._envio_evento.wait(intervalo_max)
+                self._envio_evento.clear()
+                if not self._envio_activo:
+                    break
+                try:
+                    self.sync_registros_to_cloud()
+                except Exception as e:
+                    print(f"Error en envío de registros: {e}")
+
+        threading.Thread(target=_loop, daemon=True, name='envio-registros').start()
+
+    def detener_envio_registros(self):
+        """Detener el hilo de envío (el cierre hace una sincronización final)."""
+        self._envio_activo = False
+        self._envio_evento.set()
+
+    def _leer_registros_para_ledger(self, fecha):
+        """Registros del día (local + nube) para sembrar la bitácora:
+        filas (empleado_id, hora_registro, tipo_movimiento, estado).
+        """
+        fecha_iso = fecha.isoformat()
+        rows = []
+        with self.lock:
+            c = self.sqlite_connection.cursor()
+            c.execute(
+                "SELECT empleado_id, hora_registro, tipo_movimiento, estado FROM registros_local WHERE fecha = ?",
+                (fecha_iso,),
+            )
+            rows.extend(c.fetchall())
+        with self.pg_session() as conn:
+            if conn:
+                try:
+                    cur = conn.cursor()
+                    cur.execute(
+                        "SELECT id, empleado_id, hora_registro, tipo_movimiento, estado FROM registros_asistencia WHERE fecha = %s",
+                        (fecha_iso,),
+                    )
+                    pg_rows = cur.fetchall()
+                    self._ledger_pg_ultimo_id = max((r[0] for r in pg_rows), default=self._ledger_pg_ultimo_id)
+                    rows.extend(r[1:] for r in pg_rows)
+                except Exception as e:
+                    print(f"Error leyendo registros del día para bitácora: {e}")
+        return rows
+
+    def reconciliar_ledger(self):
+        """Incorporar a la bitácora los registros de hoy hechos en otros sitios.
+        Usa el id de la nube como marca de agua (tolera relojes desfasados y envíos tardíos).
+        """
+        try:
+            with self.pg_session() as conn:
+                if not conn:
+                    return 0
+                cur = conn.cursor()
+                cur.execute(
+                    """
+                    SELECT id, empleado_id, hora_registro, tipo_movimiento, estado
+                    FROM registros_asistencia
+                    WHERE fecha = %s AND id > %s
+                    ORDER BY id
+                    """,
+                    (date.today().isoformat(), self._ledger_pg_ultimo_id),
+                )
+                nuevos = cur.fetchall()
+                if nuevos:
+                    self._ledger_pg_ultimo_id = nuevos[-1][0]
+            return self.ledger.reconciliar(r[1:] for r in nuevos) if nuevos else 0
+        except Exception as e:
+            print(f"Error reconciliando bitácora del día: {e}")
+            return 0
     
     def obtener_empleado_por_nfc(self, nfc_uid):
         """Obtener empleado por UID de NFC"""
         try:
-            # Normalizar UID: quitar no-hex y espacios, a mayúsculas
-            try:
-                uid_norm = ''.join(ch for ch in str(nfc_uid) if ch.upper() in '0123456789ABCDEF').upper()
-            except Exception:
-                uid_norm = str(nfc_uid).replace(' ', '').upper()
-            with self.lock:
-                if self.is_online():
-                    pg_cursor = self.pg_connection.cursor()
-                    # Comparar por UID normalizado (UPPER y sin espacios)
+            # Ruta rápida: índice residente, sin lock ni red
+            rec = self.empleados_index.buscar(nfc_uid)
+            if rec is not None:
+                return rec.as_row()
+            # Ruta lenta: tarjeta no indexada (p. ej. asignada desde otra PC)
+            uid_norm = normalizar_uid(nfc_uid)
+            row = None
+            with self.pg_session() as conn:
+                if conn:
+                    pg_cursor = conn.cursor()
+                    # Búsqueda por la columna normalizada (índice único parcial)
                     pg_cursor.execute(
                         """
                         SELECT id, nombre_completo, cargo, rol, foto_path, hora_entrada, hora_salida
                         FROM empleados 
-                        WHERE activo = TRUE AND REPLACE(UPPER(nfc_uid), ' ', '') = %s
+                        WHERE activo = TRUE AND nfc_uid_norm = %s
                         """,
                         (uid_norm,)
                     )
-                    return pg_cursor.fetchone()
-                else:
+                    row = pg_cursor.fetchone()
+            if conn is None:
+                with self.lock:
                     sqlite_cursor = self.sqlite_connection.cursor()
                     sqlite_cursor.execute(
                         """
                         SELECT id, nombre_completo, cargo, rol, foto_path, hora_entrada, hora_salida
                         FROM empleados_local 
-                        WHERE activo = 1 AND REPLACE(UPPER(nfc_uid), ' ', '') = ?
+                        WHERE activo = 1 AND nfc_uid_norm = ?
                         """,
                         (uid_norm,)
                     )
-                    return sqlite_cursor.fetchone()
+                    row = sqlite_cursor.fetchone()
+            if row:
+                self.empleados_index.agregar(row, uid_norm)
+            return row
                     
         except Exception as e:
             print(f"Error obteniendo empleado: {e}")
@@ -382,18 +752,19 @@ class DatabaseManager:
         """Retorna un mapa {empleado_id: (hora_entrada, hora_salida)}"""
         result = {}
         try:
-            if self.is_online():
-                c = self.pg_connection.cursor()
-                c.execute("SELECT id, hora_entrada, hora_salida FROM empleados WHERE activo = TRUE")
-                for row in c.fetchall():
-                    result[row[0]] = (str(row[1])[:5], str(row[2])[:5])
-            else:
-                c = self.sqlite_connection.cursor()
-                c.execute("SELECT id, hora_entrada, hora_salida FROM empleados_local WHERE activo = 1")
-                for row in c.fetchall():
-                    he = str(row[1])
-                    hs = str(row[2])
-                    result[row[0]] = (he[:5], hs[:5])
+            with self.pg_session() as conn:
+                if conn:
+                    c = conn.cursor()
+                    c.execute("SELECT id, hora_entrada, hora_salida FROM empleados WHERE activo = TRUE")
+                    for row in c.fetchall():
+                        result[row[0]] = (str(row[1])[:5], str(row[2])[:5])
+                else:
+                    c = self.sqlite_connection.cursor()
+                    c.execute("SELECT id, hora_entrada, hora_salida FROM empleados_local WHERE activo = 1")
+                    for row in c.fetchall():
+                        he = str(row[1])
+                        hs = str(row[2])
+                        result[row[0]] = (he[:5], hs[:5])
         except Exception as e:
             print(f"Error obteniendo horarios: {e}")
         return result
@@ -403,7 +774,7 @@ class DatabaseManager:
         - Aplica rotación semanal de doble horario si está habilitada
         - Aplica personalizados por día (L-V) con flag unificado si existen columnas, y si no, legacy de salidas
         - Aplica regla de sábado 08:00–14:00 para todos excepto jefes (00:00–00:00)
-        En PostgreSQL (nube), si no existen columnas personalizadas, retorna horario base.
+        Lee la tabla compilada del día (ver schedule_compiler), la misma que usa el lector.
         """
         try:
             if isinstance(fecha, str):
@@ -411,94 +782,14 @@ class DatabaseManager:
                     f = datetime.fromisoformat(fecha).date()
                 except Exception:
                     f = date.today()
+            elif isinstance(fecha, datetime):
+                f = fecha.date()
             else:
                 f = fecha
-
-            # Obtener base y columnas auxiliares
-            if self.is_online():
-                c = self.pg_connection.cursor()
-                c.execute("SELECT hora_entrada, hora_salida FROM empleados WHERE id = %s", (empleado_id,))
-                row = c.fetchone()
-                if not row:
-                    return ("09:00", "18:00")
-                he = str(row[0])[:5]
-                hs = str(row[1])[:5]
-                # Sin campos avanzados en nube por ahora
-                he_t, hs_t = he, hs
-            else:
-                c = self.sqlite_connection.cursor()
-                c.execute("PRAGMA table_info(empleados_local)")
-                cols = {r[1] for r in c.fetchall()}
-                c.execute("SELECT hora_entrada, hora_salida FROM empleados_local WHERE id = ?", (empleado_id,))
-                row = c.fetchone()
-                if not row:
-                    return ("09:00", "18:00")
-                he_t = str(row[0])[:5]
-                hs_t = str(row[1])[:5]
-                # Doble horario
-                if {'hora_entrada_alt','hora_salida_alt','rotacion_semanal','rotacion_semana_base'}.issubset(cols):
-                    c.execute("SELECT hora_entrada_alt, hora_salida_alt, rotacion_semanal, rotacion_semana_base FROM empleados_local WHERE id = ?", (empleado_id,))
-                    alt = c.fetchone()
-                    if alt and (alt[2] or 0):
-                        _, iso_week, _ = f.isocalendar()
-                        base = int(alt[3] or 0)
-                        use_alt = ((iso_week + base) % 2 == 1)
-                        if use_alt and alt[0] and alt[1]:
-                            try:
-                                he_t = str(alt[0])[:5]
-                                hs_t = str(alt[1])[:5]
-                            except Exception:
-                                pass
-                # Personalizados unificados entrada/salida (L-V)
-                has_unified = 'personalizado_por_dia_enabled' in cols
-                has_entries = all(n in cols for n in ['entrada_lunes','entrada_martes','entrada_miercoles','entrada_jueves','entrada_viernes'])
-                has_exits = all(n in cols for n in ['salida_lunes','salida_martes','salida_miercoles','salida_jueves','salida_viernes'])
-                if has_unified and (has_entries or has_exits):
-                    parts = ['personalizado_por_dia_enabled']
-                    if has_entries:
-                        parts += ['entrada_lunes','entrada_martes','entrada_miercoles','entrada_jueves','entrada_viernes']
-                    if has_exits:
-                        parts += ['salida_lunes','salida_martes','salida_miercoles','salida_jueves','salida_viernes']
-                    c.execute(f"SELECT {', '.join(parts)} FROM empleados_local WHERE id = ?", (empleado_id,))
-                    prow = c.fetchone()
-                    if prow and (prow[0] or 0):
-                        wd = f.weekday()
-                        idx = 1
-                        entradas = [None]*5
-                        salidas = [None]*5
-                        if has_entries:
-                            for i in range(5):
-                                entradas[i] = prow[idx]; idx += 1
-                        if has_exits:
-                            for i in range(5):
-                                salidas[i] = prow[idx]; idx += 1
-                        if wd in (0,1,2,3,4):
-                            if has_entries and entradas[wd]:
-                                he_t = str(entradas[wd])[:5]
-                            if has_exits and salidas[wd]:
-                                hs_t = str(salidas[wd])[:5]
-                else:
-                    # Legacy: solo salidas por día
-                    if {'salida_por_dia_enabled','salida_lunes','salida_martes','salida_miercoles','salida_jueves','salida_viernes'}.issubset(cols):
-                        c.execute("SELECT salida_por_dia_enabled, salida_lunes, salida_martes, salida_miercoles, salida_jueves, salida_viernes FROM empleados_local WHERE id = ?", (empleado_id,))
-                        drow = c.fetchone()
-                        if drow and (drow[0] or 0):
-                            wd = f.weekday()
-                            if wd in (0,1,2,3,4):
-                                s_map = {0:drow[1],1:drow[2],2:drow[3],3:drow[4],4:drow[5]}
-                                val = s_map.get(wd)
-                                if val:
-                                    hs_t = str(val)[:5]
-
-            # Sábado especial 08:00–14:00 (excepto jefes)
-            try:
-                es_jefe = (he_t == '00:00' and hs_t == '00:00')
-            except Exception:
-                es_jefe = False
-            if f.weekday() == 5 and not es_jefe:
-                he_t, hs_t = '08:00', '14:00'
-
-            return (he_t, hs_t)
+            horario = self.horarios.obtener(empleado_id, f)
+            if horario is None:
+                return ("09:00", "18:00")
+            return (horario.entrada, horario.salida)
         except Exception as e:
             print(f"Error calculando horario efectivo: {e}")
             return ("09:00", "18:00")
@@ -506,14 +797,15 @@ class DatabaseManager:
     def obtener_empleados_activos(self):
         """Retorna lista de empleados activos [(id, nombre_completo)]"""
         try:
-            if self.is_online():
-                c = self.pg_connection.cursor()
-                c.execute("SELECT id, nombre_completo FROM empleados WHERE activo = TRUE")
-                return c.fetchall()
-            else:
-                c = self.sqlite_connection.cursor()
-                c.execute("SELECT id, nombre_completo FROM empleados_local WHERE activo = 1")
-                return c.fetchall()
+            with self.pg_session() as conn:
+                if conn:
+                    c = conn.cursor()
+                    c.execute("SELECT id, nombre_completo FROM empleados WHERE activo = TRUE")
+                    return c.fetchall()
+                else:
+                    c = self.sqlite_connection.cursor()
+                    c.execute("SELECT id, nombre_completo FROM empleados_local WHERE activo = 1")
+                    return c.fetchall()
         except Exception as e:
             print(f"Error obteniendo empleados activos: {e}")
             return []
@@ -549,6 +841,71 @@ class DatabaseManager:
         except Exception as e:
             print(f"Error leyendo justificaciones: {e}")
         return out
+
+    def marcar_faltas(self, ubicacion_nombre: str, ahora: datetime | None = None) -> int:
+        """Registrar FALTA a los empleados activos cuyo límite de entrada ya venció y no tienen
+        ENTRADA hoy. Una sola sentencia en la nube, o en la base local si no hay conexión.
+        Retorna cuántas faltas se insertaron.
+        """
+        from faltas import candidatos, client_uuid_falta
+        ahora = ahora or datetime.now()
+        fecha = ahora.date()
+        fecha_iso = fecha.isoformat()
+        justificados = {emp for emp, tipo in self.obtener_justificaciones_por_fecha(fecha_iso) if tipo == 'FALTA'}
+        ids = candidatos(self.horarios.tabla(fecha), fecha, ahora, justificados)
+        if not ids:
+            return 0
+        # Llave determinista por empleado y día (la misma en todos los kioscos)
+        llaves = {int(emp_id): client_uuid_falta(emp_id, fecha) for emp_id in ids}
+        try:
+            with self.pg_session() as conn:
+                if conn:
+                    cur = conn.cursor()
+                    # Sin ubicación las faltas desaparecerían de las lecturas con JOIN ubicaciones
+                    cur.execute("SELECT id FROM ubicaciones WHERE UPPER(nombre) = UPPER(%s) LIMIT 1",
+                                (ubicacion_nombre,))
+                    ubicacion = cur.fetchone()
+                    if not ubicacion:
+                        print(f"Aviso: ubicación desconocida '{ubicacion_nombre}'; no se marcan faltas")
+                        return 0
+                    cur.execute("""
+                        INSERT INTO registros_asistencia
+                        (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado, client_uuid, sincronizado)
+                        SELECT e.id, %s, %s, %s, 'ENTRADA', 'FALTA', c.client_uuid, TRUE
+                        FROM unnest(%s::int[], %s::text[]) AS c(empleado_id, client_uuid)
+                        JOIN empleados e ON e.id = c.empleado_id
+                        WHERE e.activo
+                          AND NOT EXISTS (
+                              SELECT 1 FROM resumen_diario s
+                              WHERE s.empleado_id = e.id AND s.fecha = %s AND s.primera_entrada IS NOT NULL)
+                        ON CONFLICT DO NOTHING
+                    """, (ubicacion[0], fecha_iso, ahora, list(llaves), list(llaves.values()), fecha_iso))
+                    insertadas = cur.rowcount
+                    conn.commit()
+                    return insertadas
+            # Sin conexión: en la bitácora local; se envían con el resto (la llave evita duplicados)
+            # y al enviarlas se validan contra el resumen de la nube (entradas en otros sitios)
+            with self._journal_lock:
+                jc = self._journal_conn()
+                cur = jc.execute("""
+                    INSERT OR IGNORE INTO registros_local
+                    (empleado_id, ubicacion_nombre, fecha, hora_registro, tipo_movimiento, estado, client_uuid)
+                    SELECT e.id, ?, ?, ?, 'ENTRADA', 'FALTA', c.value
+                    FROM json_each(?) c
+                    JOIN empleados_local e ON e.id = CAST(c.key AS INTEGER)
+                    WHERE e.activo = 1
+                      AND NOT EXISTS (
+                          SELECT 1 FROM resumen_diario_local s
+                          WHERE s.empleado_id = e.id AND s.fecha = ? AND s.primera_entrada IS NOT NULL)
+                """, (ubicacion_nombre, fecha_iso, ahora.isoformat(), json.dumps(llaves), fecha_iso))
+                jc.commit()
+                insertadas = cur.rowcount
+            if insertadas:
+                self._envio_evento.set()
+            return insertadas
+        except Exception as e:
+            print(f"Error marcando faltas: {e}")
+            return 0
     
     def obtener_registros_dia(self, fecha=None):
         """Obtener registros del día"""
@@ -556,8 +913,7 @@ class DatabaseManager:
             fecha = date.today().isoformat()
             
         try:
-            with self.lock:
-                conn = self._get_pg_conn()
+            with self.pg_session() as conn:
                 if conn:
                     pg_cursor = conn.cursor()
                     pg_cursor.execute("""
@@ -571,26 +927,78 @@ class DatabaseManager:
                     """, (fecha,))
                     return pg_cursor.fetchall()
                 else:
-                    sqlite_cursor = self.sqlite_connection.cursor()
-                    sqlite_cursor.execute("""
-                        SELECT e.id, e.nombre_completo, e.foto_path, r.hora_registro,
-                               r.tipo_movimiento, r.estado, r.ubicacion_nombre
-                        FROM registros_local r
-                        JOIN empleados_local e ON r.empleado_id = e.id
-                        WHERE r.fecha = ?
-                        ORDER BY r.hora_registro DESC
-                    """, (fecha,))
-                    return sqlite_cursor.fetchall()
+                    with self.lock:
+                        sqlite_cursor = self.sqlite_connection.cursor()
+                        sqlite_cursor.execute("""
+                            SELECT e.id, e.nombre_completo, e.foto_path, r.hora_registro,
+                                   r.tipo_movimiento, r.estado, r.ubicacion_nombre
+                            FROM registros_local r
+                            JOIN empleados_local e ON r.empleado_id = e.id
+                            WHERE r.fecha = ?
+                            ORDER BY r.hora_registro DESC
+                        """, (fecha,))
+                        return sqlite_cursor.fetchall()
                     
         except Exception as e:
             print(f"Error obteniendo registros del día: {e}")
             return []
 
+    def obtener_registros_dia_desde(self, fecha=None, despues_de_id: int = 0):
+        """Registros del día con id mayor a `despues_de_id` (vista incremental).
+        Retorna (fuente, filas): fuente 'nube' o 'local' (los ids sólo son comparables dentro
+        de la misma fuente) y filas (id, empleado_id, nombre_completo, foto_path,
+        hora_registro, tipo_movimiento, estado, ubicacion) ordenadas por id.
+        """
+        if fecha is None:
+            fecha = date.today().isoformat()
+
+        try:
+            with self.pg_session() as conn:
+                if conn:
+                    pg_cursor = conn.cursor()
+                    pg_cursor.execute("""
+                        SELECT r.id, e.id, e.nombre_completo, e.foto_path, r.hora_registro,
+                               r.tipo_movimiento, r.estado, u.nombre
+                        FROM registros_asistencia r
+                        JOIN empleados e ON r.empleado_id = e.id
+                        JOIN ubicaciones u ON r.ubicacion_id = u.id
+                        WHERE r.fecha = %s AND r.id > %s
+                        ORDER BY r.id
+                    """, (fecha, despues_de_id))
+                    filas = pg_cursor.fetchall()
+                    conn.commit()
+                    return 'nube', filas
+                else:
+                    with self.lock:
+                        sqlite_cursor = self.sqlite_connection.cursor()
+                        sqlite_cursor.execute("""
+                            SELECT r.id, e.id, e.nombre_completo, e.foto_path, r.hora_registro,
+                                   r.tipo_movimiento, r.estado, r.ubicacion_nombre
+                            FROM registros_local r
+                            JOIN empleados_local e ON r.empleado_id = e.id
+                            WHERE r.fecha = ? AND r.id > ?
+                            ORDER BY r.id
+                        """, (fecha, despues_de_id))
+                        return 'local', sqlite_cursor.fetchall()
+
+        except Exception as e:
+            print(f"Error obteniendo registros nuevos del día: {e}")
+            return None, []
+
+    def _borrar_en_bitacora(self, where: str, params: tuple) -> None:
+        """Borrar también las copias locales para que no se reenvíen ni aparezcan sin conexión."""
+        try:
+            with self._journal_lock:
+                jc = self._journal_conn()
+                borrar_sqlite(jc.cursor(), where, params)
+                jc.commit()
+        except Exception as e:
+            print(f"Aviso: no se pudieron borrar registros locales: {e}")
+
     def borrar_registros_empleado_dia(self, empleado_id: int, fecha_iso: str) -> int:
         """Borrar registros de un empleado en una fecha específica. Retorna cantidad borrada."""
         try:
-            with self.lock:
-                conn = self._get_pg_conn()
+            with self.pg_session() as conn:
                 if conn:
                     cur = conn.cursor()
                     cur.execute(
@@ -599,43 +1007,49 @@ class DatabaseManager:
                     )
                     borrados = cur.rowcount
                     conn.commit()
+                    self._borrar_en_bitacora("empleado_id = ? AND fecha = ?", (empleado_id, fecha_iso))
+                    self.ledger.invalidar()
                     return borrados
                 else:
-                    cur = self.sqlite_connection.cursor()
-                    cur.execute(
-                        "DELETE FROM registros_local WHERE empleado_id = ? AND fecha = ?",
-                        (empleado_id, fecha_iso),
-                    )
-                    borrados = cur.rowcount
-                    self.sqlite_connection.commit()
-                    return borrados
+                    with self.lock:
+                        borrados = borrar_sqlite(
+                            self.sqlite_connection.cursor(),
+                            "empleado_id = ? AND fecha = ?",
+                            (empleado_id, fecha_iso),
+                        )
+                        self.sqlite_connection.commit()
+                        self.ledger.invalidar()
+                        return borrados
         except Exception as e:
             print(f"Error borrando registros diarios: {e}")
             return 0
 
     def borrar_registros_empleado_mes(self, empleado_id: int, year: int, month: int) -> int:
         """Borrar registros de un empleado por mes (YYYY, MM). Retorna cantidad borrada."""
+        desde, hasta = rango_mes(year, month)
         try:
-            with self.lock:
-                conn = self._get_pg_conn()
+            with self.pg_session() as conn:
                 if conn:
                     cur = conn.cursor()
                     cur.execute(
-                        "DELETE FROM registros_asistencia WHERE empleado_id = %s AND EXTRACT(YEAR FROM fecha) = %s AND EXTRACT(MONTH FROM fecha) = %s RETURNING 1",
-                        (empleado_id, year, month),
+                        "DELETE FROM registros_asistencia WHERE empleado_id = %s AND fecha >= %s AND fecha < %s RETURNING 1",
+                        (empleado_id, desde, hasta),
                     )
                     borrados = cur.rowcount
                     conn.commit()
+                    self._borrar_en_bitacora("empleado_id = ? AND fecha >= ? AND fecha < ?", (empleado_id, desde, hasta))
+                    self.ledger.invalidar()
                     return borrados
                 else:
-                    cur = self.sqlite_connection.cursor()
-                    cur.execute(
-                        "DELETE FROM registros_local WHERE empleado_id = ? AND substr(fecha,1,4) = ? AND substr(fecha,6,2) = ?",
-                        (empleado_id, str(year), f"{month:02d}"),
-                    )
-                    borrados = cur.rowcount
-                    self.sqlite_connection.commit()
-                    return borrados
+                    with self.lock:
+                        borrados = borrar_sqlite(
+                            self.sqlite_connection.cursor(),
+                            "empleado_id = ? AND fecha >= ? AND fecha < ?",
+                            (empleado_id, desde, hasta),
+                        )
+                        self.sqlite_connection.commit()
+                        self.ledger.invalidar()
+                        return borrados
         except Exception as e:
             print(f"Error borrando registros mensuales: {e}")
             return 0
@@ -643,8 +1057,7 @@ class DatabaseManager:
     def borrar_registros_empleado_todos(self, empleado_id: int) -> int:
         """Borrar TODOS los registros de un empleado. Retorna cantidad borrada."""
         try:
-            with self.lock:
-                conn = self._get_pg_conn()
+            with self.pg_session() as conn:
                 if conn:
                     cur = conn.cursor()
                     cur.execute(
@@ -653,24 +1066,80 @@ class DatabaseManager:
                     )
                     borrados = cur.rowcount
                     conn.commit()
+                    self._borrar_en_bitacora("empleado_id = ?", (empleado_id,))
+                    self.ledger.invalidar()
                     return borrados
                 else:
-                    cur = self.sqlite_connection.cursor()
-                    cur.execute(
-                        "DELETE FROM registros_local WHERE empleado_id = ?",
-                        (empleado_id,),
-                    )
-                    borrados = cur.rowcount
-                    self.sqlite_connection.commit()
-                    return borrados
+                    with self.lock:
+                        borrados = borrar_sqlite(
+                            self.sqlite_connection.cursor(),
+                            "empleado_id = ?",
+                            (empleado_id,),
+                        )
+                        self.sqlite_connection.commit()
+                        self.ledger.invalidar()
+                        return borrados
         except Exception as e:
             print(f"Error borrando todos los registros del empleado: {e}")
             return 0
+
+    # Meses por delante con partición ya creada en la nube
+    PARTICIONES_ADELANTE = 2
+
+    def asegurar_particiones(self) -> list[str]:
+        """Crear en la nube las particiones mensuales que falten (mes actual y siguientes)."""
+        from particiones import asegurar_particiones
+        try:
+            with self.pg_session() as conn:
+                if not conn:
+                    return []
+                self._asegurar_esquema_pg(conn)
+                nombres = asegurar_particiones(conn.cursor(), self.PARTICIONES_ADELANTE)
+                conn.commit()
+                return nombres
+        except Exception as e:
+            print(f"Error creando particiones mensuales: {e}")
+            return []
+
+    def desprender_mes(self, year: int, month: int) -> str | None:
+        """Desprender la partición de un mes antiguo para archivarla. Retorna el nombre de la tabla."""
+        from particiones import desprender_mes
+        try:
+            with self.pg_session() as conn:
+                if not conn:
+                    return None
+                nombre = desprender_mes(conn.cursor(), year, month)
+                conn.commit()
+                return nombre
+        except Exception as e:
+            print(f"Error desprendiendo partición {year}-{month:02d}: {e}")
+            return None
+
+    def reconstruir_resumen_diario(self, empleado_id=None, desde=None, hasta=None) -> bool:
+        """Recalcular el resumen diario (nube y local) para un empleado y/o rango [desde, hasta).
+        Los triggers lo mantienen al insertar y borrar; esto es para reparaciones a demanda.
+        """
+        from resumen_diario import reconstruir_pg, reconstruir_sqlite
+        try:
+            with self.pg_session() as conn:
+                if conn:
+                    reconstruir_pg(conn.cursor(), empleado_id, desde, hasta)
+                    conn.commit()
+            with self._journal_lock:
+                jc = self._journal_conn()
+                reconstruir_sqlite(jc.cursor(), empleado_id, desde, hasta)
+                jc.commit()
+            return True
+        except Exception as e:
+            print(f"Error reconstruyendo resumen diario: {e}")
+            return False
     
     def close_connections(self):
         """Cerrar conexiones"""
-        if self.pg_connection:
-            self.pg_connection.close()
+        self.conectividad.stop()
+        self.pg_pool.cerrar()
+        if self.journal_connection:
+            self.journal_connection.close()
         if self.sqlite_connection:
             self.sqlite_connection.close()
 
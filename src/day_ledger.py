@@ -0,0 +1,108 @@
+"""
+Bitácora en memoria del día: último movimiento por empleado.
+- Decide ENTRADA/SALIDA sin leer la base de datos en cada lectura de tarjeta.
+- Se siembra al arrancar y al cambiar de día con los registros de hoy (local + nube).
+- Se actualiza con cada insertar_registro exitoso y se reconcilia desde la nube
+  con los registros hechos en otros sitios.
+"""
+from __future__ import annotations
+from datetime import date, datetime
+from typing import Callable, Iterable
+import threading
+
+
+def _as_datetime(value) -> datetime | None:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+    except Exception:
+        return None
+
+
+class EstadoDia:
+    """Estado del día de un empleado."""
+    __slots__ = ('ultimo_tipo', 'ultima_hora', 'estado_primera_entrada')
+
+    def __init__(self, ultimo_tipo: str, ultima_hora: datetime, estado_primera_entrada: str | None):
+        self.ultimo_tipo = ultimo_tipo
+        self.ultima_hora = ultima_hora
+        self.estado_primera_entrada = estado_primera_entrada
+
+
+class DayLedger:
+    """Mapa {empleado_id: EstadoDia} del día en curso."""
+
+    def __init__(self, loader: Callable[[date], Iterable[tuple]]):
+        # loader(fecha) retorna filas (empleado_id, hora_registro, tipo_movimiento, estado) del día
+        self._loader = loader
+        self._fecha: date | None = None
+        self._estados: dict[int, EstadoDia] = {}
+        self._lock = threading.RLock()
+
+    def ultimo(self, empleado_id: int, fecha: date | None = None) -> EstadoDia | None:
+        fecha = fecha or date.today()
+        with self._lock:
+            self._asegurar_dia(fecha)
+            return self._estados.get(int(empleado_id))
+
+    def registrar(self, empleado_id: int, tipo_movimiento: str, hora_registro, estado: str) -> None:
+        """Aplicar un movimiento recién guardado."""
+        hora = _as_datetime(hora_registro) or datetime.now()
+        with self._lock:
+            self._asegurar_dia(hora.date())
+            self._aplicar(int(empleado_id), tipo_movimiento, hora, estado)
+
+    def reconciliar(self, rows: Iterable[tuple]) -> int:
+        """Mezclar registros de otros sitios. Sólo avanza estados con horas más recientes."""
+        cambios = 0
+        with self._lock:
+            for empleado_id, hora_registro, tipo_movimiento, estado in rows:
+                hora = _as_datetime(hora_registro)
+                if hora is None or hora.date() != self._fecha:
+                    continue
+                if self._aplicar(int(empleado_id), tipo_movimiento, hora, estado):
+                    cambios += 1
+        return cambios
+
+    def sembrar(self, fecha: date | None = None) -> None:
+        """Recargar el estado del día desde la base de datos."""
+        fecha = fecha or date.today()
+        try:
+            rows = list(self._loader(fecha))
+        except Exception as e:
+            print(f"Error sembrando bitácora del día: {e}")
+            rows = []
+        with self._lock:
+            self._fecha = fecha
+            self._estados = {}
+            for empleado_id, hora_registro, tipo_movimiento, estado in rows:
+                hora = _as_datetime(hora_registro)
+                if hora is not None:
+                    self._aplicar(int(empleado_id), tipo_movimiento, hora, estado)
+
+    def invalidar(self) -> None:
+        """Forzar nueva siembra en el siguiente acceso (p. ej. tras borrar registros).
+        No toma el lock: se puede llamar mientras se sostiene el lock global de la BD.
+        """
+        self._fecha = None
+
+    def _asegurar_dia(self, fecha: date) -> None:
+        if self._fecha != fecha:
+            self.sembrar(fecha)
+
+    def _aplicar(self, empleado_id: int, tipo_movimiento: str, hora: datetime, estado: str) -> bool:
+        actual = self._estados.get(empleado_id)
+        if actual is None:
+            primera = estado if tipo_movimiento == 'ENTRADA' else None
+            self._estados[empleado_id] = EstadoDia(tipo_movimiento, hora, primera)
+            return True
+        if actual.estado_primera_entrada is None and tipo_movimiento == 'ENTRADA':
+            actual.estado_primera_entrada = estado
+        if hora > actual.ultima_hora:
+            actual.ultimo_tipo = tipo_movimiento
+            actual.ultima_hora = hora
+            return True
+        return False
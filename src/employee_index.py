@@ -0,0 +1,102 @@
+"""
+Índice residente UID NFC → empleado.
+- Se carga una vez desde empleados_local (espejo de la nube) y se consulta en O(1).
+- Se recarga tras sync_empleados_to_local y se invalida al guardar/eliminar empleados.
+- Las búsquedas no toman el lock global ni hacen viajes a la red.
+"""
+from __future__ import annotations
+from typing import Callable, Iterable
+import threading
+
+# Separadores que se quitan; debe coincidir con la columna nfc_uid_norm
+# (migrations.NFC_UID_NORM_EXPR y pg_migrations) para que índice, búsquedas y UNIQUE concuerden
+_SEPARADORES = str.maketrans('', '', ' :-')
+
+
+def normalizar_uid(nfc_uid) -> str:
+    """Normaliza un UID NFC: mayúsculas y sin espacios, ':' ni '-' ('' si no hay UID)."""
+    if nfc_uid is None:
+        return ''
+    return str(nfc_uid).translate(_SEPARADORES).upper()
+
+
+class EmpleadoNFC:
+    """Registro compacto de empleado para el índice (sin __dict__)."""
+    __slots__ = ('id', 'nombre_completo', 'cargo', 'rol', 'foto_path', 'hora_entrada', 'hora_salida', 'nfc_uid')
+
+    def __init__(self, id, nombre_completo, cargo, rol, foto_path, hora_entrada, hora_salida, nfc_uid):
+        self.id = id
+        self.nombre_completo = nombre_completo
+        self.cargo = cargo
+        self.rol = rol
+        self.foto_path = foto_path
+        self.hora_entrada = hora_entrada
+        self.hora_salida = hora_salida
+        self.nfc_uid = nfc_uid
+
+    def as_row(self) -> tuple:
+        """Tupla con la misma forma que devolvía obtener_empleado_por_nfc:
+        (id, nombre_completo, cargo, rol, foto_path, hora_entrada, hora_salida)
+        """
+        return (self.id, self.nombre_completo, self.cargo, self.rol,
+                self.foto_path, self.hora_entrada, self.hora_salida)
+
+
+class EmployeeIndex:
+    """Mapa {uid_normalizado: EmpleadoNFC} de empleados activos."""
+
+    def __init__(self, loader: Callable[[], Iterable[tuple]]):
+        # loader retorna filas (id, nombre_completo, cargo, rol, nfc_uid, foto_path, hora_entrada, hora_salida, activo)
+        self._loader = loader
+        self._by_uid: dict[str, EmpleadoNFC] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def buscar(self, nfc_uid) -> EmpleadoNFC | None:
+        if not self._loaded:
+            self.recargar()
+        return self._by_uid.get(normalizar_uid(nfc_uid))
+
+    def recargar(self, rows: Iterable[tuple] | None = None) -> int:
+        """Reconstruye el índice. Si no se pasan filas, se leen con el loader."""
+        try:
+            if rows is None:
+                rows = self._loader()
+            nuevo: dict[str, EmpleadoNFC] = {}
+            for row in rows:
+                emp_id, nombre, cargo, rol, nfc_uid, foto_path, he, hs, activo = row[:9]
+                if not activo or not nfc_uid:
+                    continue
+                uid_norm = normalizar_uid(nfc_uid)
+                if uid_norm:
+                    nuevo[uid_norm] = EmpleadoNFC(emp_id, nombre, cargo, rol, foto_path, he, hs, uid_norm)
+            # Reemplazo atómico: los lectores nunca ven un índice a medio construir
+            with self._lock:
+                self._by_uid = nuevo
+                self._loaded = True
+            return len(nuevo)
+        except Exception as e:
+            print(f"Error cargando índice de empleados: {e}")
+            return 0
+
+    def agregar(self, row: tuple, nfc_uid) -> None:
+        """Agregar un empleado encontrado por la ruta lenta (fila de obtener_empleado_por_nfc)."""
+        uid_norm = normalizar_uid(nfc_uid)
+        if not uid_norm or not row:
+            return
+        emp_id, nombre, cargo, rol, foto_path, he, hs = row[:7]
+        with self._lock:
+            self._by_uid[uid_norm] = EmpleadoNFC(emp_id, nombre, cargo, rol, foto_path, he, hs, uid_norm)
+
+    def empleados(self) -> list[EmpleadoNFC]:
+        """Empleados activos indexados (p. ej. para precalentar fotos)."""
+        if not self._loaded:
+            self.recargar()
+        return list(self._by_uid.values())
+
+    def invalidar(self) -> None:
+        """Marcar el índice como obsoleto; se recarga en la siguiente búsqueda."""
+        self._loaded = False
+
+    def __len__(self) -> int:
+        return len(self._by_uid)
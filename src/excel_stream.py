@@ -0,0 +1,152 @@
+"""
+Escritura de Excel por flujo (openpyxl en modo write-only).
+- Las filas se escriben a disco conforme llegan (lista o cursor de base de datos): la memoria no
+  crece con el número de filas y el tiempo es lineal.
+- Estilos con nombre registrados una vez por libro ('encabezado', 'centrado', 'verde', 'amarillo',
+  'rojo'); cada celda sólo referencia el estilo compartido.
+- Anchos de columna: en write-only deben fijarse antes de la primera fila, así que se calculan en
+  la misma pasada con las primeras MUESTRA_ANCHOS filas (más el encabezado), tope ANCHO_MAX.
+"""
+from __future__ import annotations
+from datetime import date, datetime, time as dt_time
+from typing import Iterable, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
+
+MUESTRA_ANCHOS = 500
+ANCHO_MAX = 50
+
+_COLORES = {'verde': 'C8E6C9', 'amarillo': 'FFF59D', 'rojo': 'FFCDD2'}
+
+
+def _estilos() -> list[NamedStyle]:
+    centro = dict(horizontal='center', vertical='center')
+    estilos = [
+        NamedStyle(name='encabezado', font=Font(bold=True), alignment=Alignment(**centro)),
+        NamedStyle(name='centrado', alignment=Alignment(**centro)),
+    ]
+    for nombre, color in _COLORES.items():
+        estilos.append(NamedStyle(name=nombre, alignment=Alignment(**centro),
+                                  fill=PatternFill(start_color=color, end_color=color, fill_type='solid')))
+    return estilos
+
+
+def estilo_estado(estado) -> str:
+    """Estilo por estado: A_TIEMPO/TEMPRANO verde, RETARDO/TARDE amarillo, FALTA/NO ASISTIÓ rojo."""
+    estado = str(estado or '').upper()
+    if estado in ('A_TIEMPO', 'TEMPRANO'):
+        return 'verde'
+    if estado in ('RETARDO', 'TARDE'):
+        return 'amarillo'
+    if estado in ('FALTA', 'NO ASISTIO', 'NO_ASISTIO'):
+        return 'rojo'
+    return 'centrado'
+
+
+def texto_fecha(valor) -> str:
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime('%Y-%m-%d')
+    return str(valor)[:10] if valor is not None else ''
+
+
+def texto_hora(valor) -> str:
+    """HH:MM:SS de un datetime/time o de un texto ISO (SQLite guarda texto)."""
+    if isinstance(valor, (datetime, dt_time)):
+        return valor.strftime('%H:%M:%S')
+    if valor is None:
+        return ''
+    try:
+        return datetime.fromisoformat(str(valor)).strftime('%H:%M:%S')
+    except ValueError:
+        return str(valor)
+
+
+class HojaStream:
+    """Hoja de sólo escritura. agregar() recibe los valores y opcionalmente el estilo de la fila
+    (un nombre) o de cada celda (lista de nombres/None).
+    """
+
+    def __init__(self, libro: 'LibroStream', titulo: str, encabezados: Sequence[str],
+                 ocultas: Iterable[int] = ()):
+        self._ws = libro.wb.create_sheet(title=titulo)
+        self._encabezados = list(encabezados)
+        self._ocultas = set(ocultas)  # índices de columna (0 = primera)
+        self._pendientes: list | None = []
+        self._anchos = [len(str(h)) for h in self._encabezados]
+        self.filas = 0
+
+    def agregar(self, valores: Sequence, estilo: str | Sequence[str | None] | None = 'centrado') -> None:
+        self.filas += 1
+        if self._pendientes is None:
+            self._escribir(valores, estilo)
+            return
+        for i, v in enumerate(valores[:len(self._anchos)]):
+            n = len(str(v)) if v is not None else 0
+            if n > self._anchos[i]:
+                self._anchos[i] = n
+        self._pendientes.append((valores, estilo))
+        if len(self._pendientes) >= MUESTRA_ANCHOS:
+            self._vaciar()
+
+    def _vaciar(self) -> None:
+        """Fijar anchos con la muestra, escribir encabezado y filas retenidas."""
+        pendientes, self._pendientes = self._pendientes, None
+        for i, ancho in enumerate(self._anchos):
+            dim = self._ws.column_dimensions[get_column_letter(i + 1)]
+            dim.width = min(ancho + 2, ANCHO_MAX)
+            if i in self._ocultas:
+                dim.hidden = True
+        self._escribir(self._encabezados, 'encabezado')
+        for valores, estilo in pendientes or ():
+            self._escribir(valores, estilo)
+
+    def _escribir(self, valores: Sequence, estilo) -> None:
+        celdas = []
+        for i, v in enumerate(valores):
+            nombre = estilo if estilo is None or isinstance(estilo, str) else estilo[i]
+            if nombre is None:
+                celdas.append(v)
+                continue
+            # Estilo antes del valor: así fechas y horas conservan su formato numérico
+            c = WriteOnlyCell(self._ws)
+            c.style = nombre
+            c.value = v
+            celdas.append(c)
+        self._ws.append(celdas)
+
+    def cerrar(self) -> None:
+        if self._pendientes is not None:
+            self._vaciar()
+
+
+class LibroStream:
+    """Libro de sólo escritura: with LibroStream(ruta) as libro: hoja = libro.hoja(...); ..."""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.wb = Workbook(write_only=True)
+        for estilo in _estilos():
+            self.wb.add_named_style(estilo)
+        self._hojas: list[HojaStream] = []
+
+    def hoja(self, titulo: str, encabezados: Sequence[str], ocultas: Iterable[int] = ()) -> HojaStream:
+        h = HojaStream(self, titulo, encabezados, ocultas)
+        self._hojas.append(h)
+        return h
+
+    def guardar(self) -> str:
+        for h in self._hojas:
+            h.cerrar()
+        self.wb.save(self.ruta)
+        return self.ruta
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        if tipo is None:
+            self.guardar()
+        return False
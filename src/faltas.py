@@ -0,0 +1,63 @@
+"""
+Detección de faltas por conjunto.
+- Candidatos: empleados cuyo horario efectivo del día (schedule_compiler) ya venció su
+  límite (entrada + FALTA_MINUTOS_TRAS_ENTRADA), sin justificación de FALTA y en día laborable.
+- La base de datos descarta en la misma sentencia a quienes ya tienen ENTRADA (o FALTA) en el
+  resumen diario e inserta todas las faltas de una vez.
+- client_uuid determinista 'falta-<empleado>-<fecha>': si varios kioscos corren la detección,
+  o una falta registrada sin conexión se envía después, la nube guarda una sola.
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from typing import Iterable, Mapping
+import os
+
+from schedule_compiler import HorarioEfectivo
+
+
+def minutos_tras_entrada() -> int:
+    """Minutos después de la hora de entrada para considerar falta."""
+    try:
+        return max(0, int(os.getenv('FALTA_MINUTOS_TRAS_ENTRADA', '180')))
+    except ValueError:
+        return 180
+
+
+def dias_descanso() -> frozenset[int]:
+    """Días sin detección de faltas (weekday(): 0 = lunes ... 6 = domingo)."""
+    valor = os.getenv('FALTA_DIAS_DESCANSO', '6')
+    try:
+        return frozenset(int(d) for d in valor.split(',') if d.strip())
+    except ValueError:
+        return frozenset({6})
+
+
+PREFIJO_CLIENT_UUID = 'falta-'
+
+
+def client_uuid_falta(empleado_id: int, fecha: date) -> str:
+    return f"{PREFIJO_CLIENT_UUID}{int(empleado_id)}-{fecha.isoformat()}"
+
+
+def candidatos(tabla: Mapping[int, HorarioEfectivo], fecha: date, ahora: datetime,
+               justificados: Iterable[int] = (), minutos: int | None = None,
+               descanso: Iterable[int] | None = None) -> list[int]:
+    """Empleados cuyo límite de entrada ya pasó (sin contar registros; eso lo filtra la base)."""
+    descanso = dias_descanso() if descanso is None else frozenset(descanso)
+    if fecha.weekday() in descanso:
+        return []
+    minutos = minutos_tras_entrada() if minutos is None else minutos
+    justificados = set(justificados)
+    salida = []
+    for empleado_id, horario in tabla.items():
+        # Jefes sin horario nunca generan falta
+        if horario.sin_horario or empleado_id in justificados:
+            continue
+        try:
+            h, m = (int(x) for x in horario.entrada.split(':')[:2])
+        except ValueError:
+            continue
+        limite = datetime.combine(fecha, datetime.min.time()) + timedelta(hours=h, minutes=m + minutos)
+        if ahora >= limite:
+            salida.append(empleado_id)
+    return sorted(salida)
@@ -1,12 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk, ImageOps
+from PIL import ImageTk
 import datetime
 import threading
 import time
 import os
 from database_manager import db_manager
 from admin_interface import AdminInterface
+from ui_events import UIEventChannel
+from records_view import RecordsViewModel
+from photo_cache import photo_cache
 
 class MainPublicScreen:
     def __init__(self):
@@ -45,10 +48,18 @@ class MainPublicScreen:
         
         # Variable para foto actual
         self.current_photo = None
+        # Reset visual pendiente del último registro (id de root.after)
+        self._reset_after_id = None
+
+        # Eventos desde hilos de lectura/sincronización, procesados en el hilo de Tk
+        self.ui_events = UIEventChannel(self.root)
+        self.ui_events.on('registro', lambda p: self.show_employee_registration(*p))
+        self.ui_events.on('refrescar', lambda _p: self.update_records_list())
         
         self.setup_ui()
+        self.ui_events.start()
         self.start_time_update()
-        self.start_sync_service()
+        self.start_refresh_loop()
         
         # Combinación de teclas para acceder a administración
         self.root.bind('<Control-Alt-a>', self.open_admin)
@@ -188,6 +199,20 @@ class MainPublicScreen:
                         font=('Segoe UI', 10, 'bold'))
         style.map('Treeview', background=[('selected', '#2A9D8F')], foreground=[('selected', 'white')])
 
+        # Configurar colores (una sola vez)
+        self.records_tree.tag_configure('verde', background='#1B5E20', foreground='#A5D6A7')
+        self.records_tree.tag_configure('amarillo', background='#7C4D00', foreground='#FFE082')
+        self.records_tree.tag_configure('rojo', background='#B71C1C', foreground='#EF9A9A')
+        self.records_tree.tag_configure('normal', background='white', foreground='#111111')
+
+        # Estado de la vista incremental
+        self.records_vm = RecordsViewModel()
+        self._records_reset_en = 0.0
+        self._records_aux_en = 0.0
+        self._records_just_map = {}
+        self._records_activos = {}
+        self._falta_iids = set()
+
         # Cargar registros iniciales
         self.update_records_list()
 
@@ -224,153 +249,121 @@ class MainPublicScreen:
 
         tick()
     
-    def start_sync_service(self):
-        """Iniciar servicio de sincronización"""
+    def start_refresh_loop(self):
+        """Refrescar periódicamente la lista de registros.
+        Las sincronizaciones con la nube las ejecuta el programador de tareas (scheduler).
+        """
         try:
             sync_interval = int(os.getenv('SYNC_INTERVAL_SECONDS', '10'))
         except Exception:
             sync_interval = 10
-        def sync_service():
-            while True:
-                try:
-                    # Intentar sincronizar datos cada 30 segundos
-                    if db_manager.is_online():
-                        db_manager.sync_empleados_to_local()
-                        db_manager.sync_registros_to_cloud()
-
-                except Exception as e:
-                    print(f"Error en sincronización: {e}")
-                
-                # Permitir intervalo mínimo de 1s
-                time.sleep(max(1, sync_interval))
-        
-        sync_thread = threading.Thread(target=sync_service, daemon=True)
-        sync_thread.start()
 
-        # Refresco periódico de la lista de registros sin usar hilos secundarios
+        # Refresco periódico de la lista de registros (se colapsa con otros refrescos pendientes)
         def refresh_loop():
-            try:
-                self.update_records_list()
-            except Exception as e:
-                print(f"Error actualizando lista: {e}")
-            finally:
-                # Permitir intervalo mínimo de 1s
-                self.root.after(max(1000, sync_interval * 1000), refresh_loop)
+            self.request_refresh()
+            # Permitir intervalo mínimo de 1s
+            self.root.after(max(1000, sync_interval * 1000), refresh_loop)
         self.root.after(max(1000, sync_interval * 1000), refresh_loop)
+
+    def notify_registration(self, empleado_data, tipo_movimiento, estado):
+        """Punto de entrada seguro desde cualquier hilo: mostrar un registro.
+        En ráfagas sólo se muestra el más reciente del cuadro.
+        """
+        # Preparar la foto aquí (hilo de trabajo) para que el hilo de Tk sólo cree el PhotoImage
+        imagen = photo_cache.obtener(empleado_data[4]) if len(empleado_data) > 4 else None
+        self.ui_events.publicar('registro', (empleado_data, tipo_movimiento, estado, imagen))
+        self.ui_events.publicar('refrescar')
+
+    def request_refresh(self):
+        """Solicitar refresco de la lista desde cualquier hilo (se colapsan en uno)."""
+        self.ui_events.publicar('refrescar')
     
+    # Reconstrucción completa periódica (captura borrados y correcciones) y refresco
+    # de empleados activos/justificaciones, en segundos
+    REFRESCO_COMPLETO_S = 300
+    REFRESCO_AUXILIAR_S = 60
+
     def update_records_list(self):
-        """Actualizar lista de registros del día"""
+        """Actualizar lista de registros del día de forma incremental"""
         try:
-            # Limpiar lista actual
-            for item in self.records_tree.get_children():
-                self.records_tree.delete(item)
-            
-            # Obtener registros del día
-            records = db_manager.obtener_registros_dia()
-            # Mapas auxiliares
-            # 1) Primer registro del día (cualquier movimiento) y última SALIDA por empleado
-            first_time = {}
-            last_exit = {}
-            for rec in sorted(records, key=lambda r: r[3]):
-                emp_id, nombre, foto_path, hora_registro, tipo_mov, estado, ubicacion = rec
-                if emp_id not in first_time:
-                    first_time[emp_id] = hora_registro
-                if tipo_mov == 'SALIDA':
-                    last_exit[emp_id] = hora_registro
-            # 2) Justificaciones del día
-            from datetime import date
-            hoy_iso = date.today().isoformat()
-            just_map = db_manager.obtener_justificaciones_por_fecha(hoy_iso)
-            # 3) Empleados activos para detectar faltas
-            empleados_activos = {emp_id: nombre for emp_id, nombre in db_manager.obtener_empleados_activos()}
-            empleados_con_registro = set([r[0] for r in records])
-            
-            # Para colorear solo primer registro (ENTRADA) por empleado
-            primeras_entradas = set()
-            
-            for record in records:
-                empleado_id, nombre, foto_path, hora_registro, tipo_movimiento, estado, ubicacion = record
-                
-                # Formatear hora
-                if isinstance(hora_registro, str):
-                    hora_dt = datetime.datetime.fromisoformat(hora_registro)
-                else:
-                    hora_dt = hora_registro
-                
-                hora_str = hora_dt.strftime("%H:%M:%S")
-                
-                # Determinar color con reglas:
-                # - Sólo el primer registro del día (del empleado) y la última SALIDA del día se colorean por estado.
-                # - Todos los intermedios quedan en blanco/normal y Estado vacío.
-                # - Justificaciones: RETARDO justificado -> verde y marcar con asterisco en Estado (solo si aplica en primer/último mostrado).
-                tag = 'normal'
-                est_up = (estado or '').upper()
-                estado_mostrar = ''
-                retardo_justificado = (empleado_id, 'RETARDO') in just_map and est_up == 'RETARDO'
-                # ¿Es el primer registro del día de este empleado?
-                is_first = (first_time.get(empleado_id) == hora_registro)
-                if is_first:
-                    estado_mostrar = estado  # mostrar estado sólo en el primero
-                    if est_up in ('A_TIEMPO', 'TEMPRANO'):
-                        tag = 'verde'
-                    elif est_up == 'RETARDO':
-                        tag = 'verde' if retardo_justificado else 'amarillo'
-                        if retardo_justificado:
-                            estado_mostrar = 'RETARDO*'
-                    elif est_up in ('FALTA',):
-                        tag = 'normal' if (empleado_id, 'FALTA') in just_map else 'rojo'
-                else:
-                    # ¿Es la última salida del día?
-                    if tipo_movimiento == 'SALIDA' and last_exit.get(empleado_id) == hora_registro:
-                        estado_mostrar = estado  # mostrar estado en la última salida
-                        if est_up in ('A_TIEMPO', 'TEMPRANO'):
-                            tag = 'verde'
-                        elif est_up == 'RETARDO':
-                            if retardo_justificado:
-                                tag = 'verde'
-                                estado_mostrar = 'RETARDO*'
-                            else:
-                                tag = 'amarillo'
-                        elif est_up in ('FALTA',):
-                            tag = 'rojo' if (empleado_id, 'FALTA') not in just_map else 'normal'
-                    else:
-                        # Intermedios: normal y estado vacío
-                        tag = 'normal'
-                        estado_mostrar = ''
-                
-                # Insertar registro
-                sitio_str = (ubicacion or '').upper()
-                item = self.records_tree.insert('', 'end', values=(
-                    hora_str, nombre, tipo_movimiento, estado_mostrar, sitio_str
-                ), tags=(tag,))
-
-            # Si ya es mediodía o después, para empleados sin registros hoy y sin justificación FALTA, mostrar fila de falta
-            ahora = datetime.datetime.now().time()
-            try:
-                es_despues_mediodia = ahora >= datetime.time(12, 0, 0)
-            except Exception:
-                es_despues_mediodia = False
-            if es_despues_mediodia:
-                for emp_id, nombre_emp in empleados_activos.items():
-                    if emp_id not in empleados_con_registro:
-                        # Si existe justificación de FALTA, no marcar en rojo
-                        if (emp_id, 'FALTA') in just_map:
-                            continue
-                        self.records_tree.insert('', 'end', values=(
-                            '--:--:--', nombre_emp, '—', 'FALTA', (os.getenv('UBICACION_PRINCIPAL', '')).upper()
-                        ), tags=('rojo',))
-            
-            # Configurar colores
-            self.records_tree.tag_configure('verde', background='#1B5E20', foreground='#A5D6A7')
-            self.records_tree.tag_configure('amarillo', background='#7C4D00', foreground='#FFE082')
-            self.records_tree.tag_configure('rojo', background='#B71C1C', foreground='#EF9A9A')
-            self.records_tree.tag_configure('normal', background='white', foreground='#111111')
-            
+            hoy_iso = datetime.date.today().isoformat()
+            ahora = time.monotonic()
+            vm = self.records_vm
+            completo = (vm.fecha != hoy_iso or ahora - self._records_reset_en >= self.REFRESCO_COMPLETO_S)
+
+            fuente, filas = db_manager.obtener_registros_dia_desde(hoy_iso, 0 if completo else vm.ultimo_id)
+            if fuente is None:
+                return
+            if not completo and fuente != vm.fuente:
+                # Cambió nube <-> local: los ids no son comparables, reconstruir
+                completo = True
+                fuente, filas = db_manager.obtener_registros_dia_desde(hoy_iso, 0)
+                if fuente is None:
+                    return
+
+            if completo:
+                self.records_tree.delete(*self.records_tree.get_children())
+                vm.reset(hoy_iso, fuente)
+                self._records_reset_en = ahora
+                self._records_aux_en = 0.0
+                self._falta_iids = set()
+
+            # Empleados activos y justificaciones cambian poco: refresco lento
+            recolorear_todo = False
+            if ahora - self._records_aux_en >= self.REFRESCO_AUXILIAR_S:
+                just_map = db_manager.obtener_justificaciones_por_fecha(hoy_iso)
+                recolorear_todo = just_map != self._records_just_map
+                self._records_just_map = just_map
+                self._records_activos = {emp_id: nombre for emp_id, nombre in db_manager.obtener_empleados_activos()}
+                self._records_aux_en = ahora
+            just_map = self._records_just_map
+
+            nuevos, afectados = vm.aplicar(filas)
+            for iid in nuevos:
+                valores, tag = vm.presentar(vm.registros[iid], just_map)
+                self.records_tree.insert('', vm.indice(iid), iid=iid, values=valores, tags=(tag,))
+
+            # Recalcular colores sólo de los empleados afectados (o todos si cambiaron justificaciones)
+            empleados = vm.empleados_con_registro() if recolorear_todo else afectados
+            nuevos_set = set(nuevos)
+            for emp_id in empleados:
+                for reg in vm.filas_empleado(emp_id):
+                    if reg.iid in nuevos_set:
+                        continue
+                    valores, tag = vm.presentar(reg, just_map)
+                    self.records_tree.item(reg.iid, values=valores, tags=(tag,))
+
+            self._actualizar_faltas(just_map)
+
         except Exception as e:
             print(f"Error actualizando registros: {e}")
+
+    def _actualizar_faltas(self, just_map):
+        """Filas de FALTA al final: empleados activos sin registros hoy, después de mediodía."""
+        try:
+            es_despues_mediodia = datetime.datetime.now().time() >= datetime.time(12, 0, 0)
+        except Exception:
+            es_despues_mediodia = False
+        con_registro = self.records_vm.empleados_con_registro()
+        deseadas = {}
+        if es_despues_mediodia:
+            for emp_id, nombre_emp in self._records_activos.items():
+                # Si existe justificación de FALTA, no marcar en rojo
+                if emp_id not in con_registro and (emp_id, 'FALTA') not in just_map:
+                    deseadas[f"falta:{emp_id}"] = nombre_emp
+        for iid in self._falta_iids - deseadas.keys():
+            if self.records_tree.exists(iid):
+                self.records_tree.delete(iid)
+        sitio = (os.getenv('UBICACION_PRINCIPAL', '')).upper()
+        for iid, nombre_emp in deseadas.items():
+            if iid not in self._falta_iids:
+                self.records_tree.insert('', 'end', iid=iid, values=(
+                    '--:--:--', nombre_emp, '—', 'FALTA', sitio
+                ), tags=('rojo',))
+        self._falta_iids = set(deseadas)
     
-    def show_employee_registration(self, empleado_data, tipo_movimiento, estado):
-        """Mostrar registro de empleado en pantalla"""
+    def show_employee_registration(self, empleado_data, tipo_movimiento, estado, imagen=None):
+        """Mostrar registro de empleado en pantalla (imagen: versión 560x560 ya preparada)"""
         try:
             nombre, foto_path = empleado_data[1], empleado_data[4]
             # rol puede venir en índice 2 (cargo) o 3 (rol)
@@ -396,19 +389,12 @@ class MainPublicScreen:
             self.last_employee_action.set(accion_text)
             self.last_employee_time.set(datetime.datetime.now().strftime("%H:%M:%S"))
             
-            # Cargar foto del empleado: usar contain para NO recortar y mostrar completa
-            if foto_path and os.path.exists(foto_path):
+            # Foto del empleado completa (560x560 con bandas) desde la caché de fotos
+            if imagen is None and foto_path:
+                imagen = photo_cache.obtener(foto_path)
+            if imagen is not None:
                 try:
-                    img = Image.open(foto_path)
-                    # Escalar para que quepa completa dentro de 560x560, agregando bandas si hace falta
-                    img = ImageOps.contain(img, (560, 560), Image.Resampling.LANCZOS)
-                    # Añadir un lienzo blanco 560x560 para centrar si quedó con bandas
-                    canvas = Image.new('RGB', (560, 560), 'white')
-                    x = (560 - img.width) // 2
-                    y = (560 - img.height) // 2
-                    canvas.paste(img, (x, y))
-                    img = canvas
-                    photo = ImageTk.PhotoImage(img)
+                    photo = ImageTk.PhotoImage(imagen)
                     # Fondo de la tarjeta se pinta acorde al estado pero el marco de foto se mantiene blanco para contraste
                     self.photo_frame.configure(bg='white')
                     self.photo_label.configure(image=photo, text="", bg='white')
@@ -422,7 +408,14 @@ class MainPublicScreen:
                                          font=('Segoe UI', 14, 'bold'), fg='white')
             
             # Mostrar solo 2s el último registro y luego reset visual
+            # (una lectura nueva cancela el reset pendiente de la anterior)
+            if self._reset_after_id is not None:
+                try:
+                    self.root.after_cancel(self._reset_after_id)
+                except Exception:
+                    pass
             def reset_last():
+                self._reset_after_id = None
                 # Regresar a estado neutro
                 self.photo_label.configure(image="", text="ESPERANDO\nREGISTRO", bg='white',
                                            font=('Segoe UI', 18, 'bold'), fg='#666666')
@@ -430,8 +423,8 @@ class MainPublicScreen:
                 self.last_employee_action.set("Listo para registrar")
                 self.last_employee_time.set("")
                 self.last_employee_role.set("")
-                self.update_records_list()
-            self.root.after(2000, reset_last)
+                self.request_refresh()
+            self._reset_after_id = self.root.after(2000, reset_last)
             
         except Exception as e:
             print(f"Error mostrando registro: {e}")
@@ -89,6 +89,70 @@ def _migration_add_daily_entry_overrides(conn_or_cursor) -> None:
     add_if_missing('entrada_viernes', 'entrada_viernes TEXT')
 
 
+def _migration_add_client_uuid(conn_or_cursor) -> None:
+    """Add idempotency key to registros_local and backfill existing rows (idempotent)."""
+    try:
+        c = conn_or_cursor.cursor()
+    except AttributeError:
+        c = conn_or_cursor
+    c.execute("PRAGMA table_info(registros_local)")
+    cols = {row[1] for row in c.fetchall()}
+    if 'client_uuid' not in cols:
+        c.execute("ALTER TABLE registros_local ADD COLUMN client_uuid TEXT")
+    c.execute("UPDATE registros_local SET client_uuid = lower(hex(randomblob(16))) WHERE client_uuid IS NULL")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_registros_local_client_uuid ON registros_local(client_uuid)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_registros_local_pendientes ON registros_local(sincronizado, id)")
+
+
+# Misma expresión que en PostgreSQL (pg_migrations) y que employee_index.normalizar_uid:
+# mayúsculas, sin espacios, ':' ni '-'
+NFC_UID_NORM_EXPR = "NULLIF(UPPER(REPLACE(REPLACE(REPLACE(nfc_uid,' ',''),':',''),'-','')),'')"
+
+
+def _migration_add_nfc_uid_norm(conn_or_cursor) -> None:
+    """Add generated nfc_uid_norm column with a unique index over active employees (idempotent)."""
+    try:
+        c = conn_or_cursor.cursor()
+    except AttributeError:
+        c = conn_or_cursor
+    c.execute("PRAGMA table_xinfo(empleados_local)")
+    cols = {row[1] for row in c.fetchall()}
+    if 'nfc_uid_norm' not in cols:
+        # Columna generada VIRTUAL: se calcula al leer y el índice la materializa
+        c.execute(f"ALTER TABLE empleados_local ADD COLUMN nfc_uid_norm TEXT GENERATED ALWAYS AS ({NFC_UID_NORM_EXPR}) VIRTUAL")
+    try:
+        c.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_empleados_local_nfc_norm
+            ON empleados_local(nfc_uid_norm) WHERE activo = 1
+        """)
+    except Exception as e:
+        # Datos previos con tarjetas duplicadas: índice no único para no bloquear el arranque
+        print(f"Aviso: tarjetas NFC duplicadas en empleados_local ({e}); índice sin restricción UNIQUE")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_empleados_local_nfc_norm ON empleados_local(nfc_uid_norm)")
+
+
+def _migration_covering_registros_index(cursor) -> None:
+    """Covering index for per-employee date-range reads; replaces the (empleado_id, fecha) one."""
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_registros_local_emp_fecha_hora
+        ON registros_local(empleado_id, fecha, hora_registro, tipo_movimiento, estado)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_registros_empleado_fecha")
+
+
+def _migration_resumen_diario(cursor) -> None:
+    """Daily summary table kept by triggers, backfilled from existing records (idempotent)."""
+    from resumen_diario import instalar_sqlite, reconstruir_sqlite
+    instalar_sqlite(cursor)
+    reconstruir_sqlite(cursor)
+
+
+def _migration_resumen_diario_borrado_por_lote(cursor) -> None:
+    """Drop the per-row delete trigger; deletes recompute their days via borrar_sqlite."""
+    from resumen_diario import instalar_sqlite
+    instalar_sqlite(cursor)
+
+
 def get_migrations() -> List[Migration]:
     return [
         {
@@ -116,6 +180,31 @@ def get_migrations() -> List[Migration]:
             "description": "Add per-day (Mon-Fri) entry overrides and unified enabled flag",
             "apply": _migration_add_daily_entry_overrides,
         },
+        {
+            "id": "2025-11-01_add_client_uuid",
+            "description": "Add client_uuid idempotency key to registros_local",
+            "apply": _migration_add_client_uuid,
+        },
+        {
+            "id": "2025-11-05_add_nfc_uid_norm",
+            "description": "Add generated nfc_uid_norm column with unique index",
+            "apply": _migration_add_nfc_uid_norm,
+        },
+        {
+            "id": "2025-11-08_covering_registros_index",
+            "description": "Covering index (empleado_id, fecha, hora_registro) on registros_local",
+            "apply": _migration_covering_registros_index,
+        },
+        {
+            "id": "2025-11-10_resumen_diario",
+            "description": "Daily summary table (resumen_diario_local) maintained by triggers",
+            "apply": _migration_resumen_diario,
+        },
+        {
+            "id": "2025-11-14_resumen_diario_borrado_por_lote",
+            "description": "Recompute daily summaries once per delete instead of per deleted row",
+            "apply": _migration_resumen_diario_borrado_por_lote,
+        },
     ]
 
 
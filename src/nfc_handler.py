@@ -2,8 +2,11 @@ import threading
 import time
 from datetime import datetime, time as dt_time, timedelta
 from database_manager import db_manager
+from periodos import rango_mes
 from acr122u_driver import acr122u_reader
 from acr122u_reader import ACR122UReader
+from schedule_compiler import resolver_horario
+from tap_dispatcher import TapDispatcher, TapEvent
 import os
 import json
 from pathlib import Path
@@ -17,14 +20,17 @@ class NFCReader:
         # Sitio que controla la visual (foto grande). Los otros sitios sólo registran y aparecen en la lista.
         self.visual_site = os.getenv('UBICACION_PRINCIPAL', 'Tepanecos')
         self._last_readers = []
+        # Los hilos del lector sólo encolan; el procesamiento ocurre en trabajadores
+        self.dispatcher = TapDispatcher(self._handle_tap_event)
         
         # Configurar el lector ACR122U con callback
-        acr122u_reader.callback_function = self.process_nfc_card
+        acr122u_reader.callback_function = self._enqueue_tap
         
     def start_reading(self):
         """Iniciar lectura continua de NFC"""
         if not self.is_reading:
             self.is_reading = True
+            self.dispatcher.start()
             print("🚀 Iniciando lector NFC ACR122U...")
             
             # Probar lector primero
@@ -71,6 +77,8 @@ class NFCReader:
         """Detener lectura de NFC"""
         self.is_reading = False
         acr122u_reader.stop_reading()
+        # Las lecturas ya encoladas se terminan de procesar antes de cerrar los trabajadores
+        self.dispatcher.stop()
         print("⏹️ Lector NFC detenido")
     
     # Eliminado modo simulación
@@ -130,10 +138,18 @@ class NFCReader:
         except Exception as e:
             print(f"⚠️  No se pudo aplicar preferencia de lector por sitio: {e}")
     
-    def process_nfc_card(self, nfc_uid):
-        """Procesar tarjeta NFC leída"""
+    def _enqueue_tap(self, nfc_uid, site=None):
+        """Callback de los hilos del lector: sólo encola la lectura."""
+        return self.dispatcher.submit(nfc_uid, site)
+
+    def _handle_tap_event(self, evento: TapEvent):
+        return self.process_nfc_card(evento.uid, evento.site)
+
+    def process_nfc_card(self, nfc_uid, site=None):
+        """Procesar tarjeta NFC leída (site=None usa el sitio principal)"""
+        ubicacion = site or self.ubicacion_actual
         try:
-            print(f"📱 Tarjeta NFC detectada: {nfc_uid}")
+            print(f"📱 Tarjeta NFC detectada: {nfc_uid} ({ubicacion})")
             
             # Buscar empleado por UID
             empleado = db_manager.obtener_empleado_por_nfc(nfc_uid)
@@ -160,15 +176,19 @@ class NFCReader:
             
             # Registrar asistencia
             success = db_manager.insertar_registro(
-                empleado_id, self.ubicacion_actual, tipo_movimiento, estado
+                empleado_id, ubicacion, tipo_movimiento, estado
             )
             
             if success:
                 print(f"💾 Registro guardado exitosamente")
                 
-                # Mostrar en pantalla principal sólo si la lectura corresponde al sitio visual
-                if self.main_screen and str(self.ubicacion_actual).upper() == str(self.visual_site).upper():
-                    self.main_screen.show_employee_registration(empleado, tipo_movimiento, estado)
+                # Mostrar en pantalla principal sólo si la lectura corresponde al sitio visual;
+                # se publica al canal de eventos (nunca se toca Tk desde este hilo)
+                if self.main_screen:
+                    if str(ubicacion).upper() == str(self.visual_site).upper():
+                        self.main_screen.notify_registration(empleado, tipo_movimiento, estado)
+                    else:
+                        self.main_screen.request_refresh()
                 
                 return True
             else:
@@ -186,126 +206,18 @@ class NFCReader:
             current_time = now.time()
             current_date = now.date()
             
-            # Convertir strings de hora a objetos time
-            if isinstance(hora_entrada_str, str):
-                hora_entrada = dt_time.fromisoformat(hora_entrada_str)
-            else:
-                hora_entrada = hora_entrada_str
-                
-            if isinstance(hora_salida_str, str):
-                hora_salida = dt_time.fromisoformat(hora_salida_str)
-            else:
-                hora_salida = hora_salida_str
-            
-            # Cargar posible doble horario con rotación semanal
-            try:
-                c = db_manager.sqlite_connection.cursor()
-                c.execute("PRAGMA table_info(empleados_local)")
-                cols = {r[1] for r in c.fetchall()}
-                # Primero cargar posibles overrides de doble horario
-                c.execute("SELECT hora_entrada_alt, hora_salida_alt, rotacion_semanal, rotacion_semana_base FROM empleados_local WHERE id = ?", (empleado_id,))
-                row = c.fetchone()
-                if row and (row[2] or 0):
-                    # Determinar semana par/impar respecto a base
-                    # Usamos número de semana ISO
-                    iso_year, iso_week, _ = now.isocalendar()
-                    base = int(row[3] or 0)
-                    use_alt = ((iso_week + base) % 2 == 1)
-                    if use_alt and row[0] and row[1]:
-                        # Sobrescribir horario con alternos
-                        try:
-                            hora_entrada = dt_time.fromisoformat(str(row[0])[:5])
-                            hora_salida = dt_time.fromisoformat(str(row[1])[:5])
-                        except Exception:
-                            pass
-                # Luego, aplicar personalizados por día (L-V)
-                has_unified = 'personalizado_por_dia_enabled' in cols
-                has_entries = all(n in cols for n in ['entrada_lunes','entrada_martes','entrada_miercoles','entrada_jueves','entrada_viernes'])
-                has_exits = all(n in cols for n in ['salida_lunes','salida_martes','salida_miercoles','salida_jueves','salida_viernes'])
-                if has_unified and (has_entries or has_exits):
-                    # Usar flag unificado
-                    entry_part = ', '.join(['entrada_lunes','entrada_martes','entrada_miercoles','entrada_jueves','entrada_viernes']) if has_entries else ''
-                    exit_part = ', '.join(['salida_lunes','salida_martes','salida_miercoles','salida_jueves','salida_viernes']) if has_exits else ''
-                    cols_select = 'personalizado_por_dia_enabled'
-                    if entry_part:
-                        cols_select += ', ' + entry_part
-                    if exit_part:
-                        cols_select += ', ' + exit_part
-                    c.execute(f"SELECT {cols_select} FROM empleados_local WHERE id = ?", (empleado_id,))
-                    prow = c.fetchone()
-                    if prow and (prow[0] or 0):
-                        wd = now.weekday()
-                        if wd in (0,1,2,3,4):
-                            idx = 1
-                            entradas = [None]*5
-                            salidas = [None]*5
-                            if has_entries:
-                                for i in range(5):
-                                    entradas[i] = prow[idx]; idx += 1
-                            if has_exits:
-                                for i in range(5):
-                                    salidas[i] = prow[idx]; idx += 1
-                            if has_entries and entradas[wd]:
-                                try:
-                                    hora_entrada = dt_time.fromisoformat(str(entradas[wd])[:5])
-                                except Exception:
-                                    pass
-                            if has_exits and salidas[wd]:
-                                try:
-                                    hora_salida = dt_time.fromisoformat(str(salidas[wd])[:5])
-                                except Exception:
-                                    pass
-                else:
-                    # Compatibilidad legacy: sólo salidas por día
-                    if {'salida_por_dia_enabled','salida_lunes','salida_martes','salida_miercoles','salida_jueves','salida_viernes'}.issubset(cols):
-                        c.execute("""
-                            SELECT salida_por_dia_enabled, salida_lunes, salida_martes, salida_miercoles, salida_jueves, salida_viernes
-                            FROM empleados_local WHERE id = ?
-                        """, (empleado_id,))
-                        drow = c.fetchone()
-                        if drow and (drow[0] or 0):
-                            wd = now.weekday()  # 0=Lunes ... 6=Domingo
-                            if wd in (0,1,2,3,4):
-                                s_map = {0:drow[1],1:drow[2],2:drow[3],3:drow[4],4:drow[5]}
-                                val = s_map.get(wd)
-                                if val:
-                                    try:
-                                        hora_salida = dt_time.fromisoformat(str(val)[:5])
-                                    except Exception:
-                                        pass
-            except Exception:
-                pass
-
-            # Regla especial: Sábado 08:00-14:00 para todos
-            # weekday(): Monday=0 .. Sunday=6; Saturday=5
-            if now.weekday() == 5:
-                try:
-                    # Detectar "Jefe" por horario 00:00-00:00
-                    if isinstance(hora_entrada_str, str):
-                        he_s = str(hora_entrada_str)[:5]
-                    else:
-                        he_s = f"{hora_entrada.hour:02d}:{hora_entrada.minute:02d}"
-                    if isinstance(hora_salida_str, str):
-                        hs_s = str(hora_salida_str)[:5]
-                    else:
-                        hs_s = f"{hora_salida.hour:02d}:{hora_salida.minute:02d}"
-                    es_jefe = (he_s == '00:00' and hs_s == '00:00')
-                except Exception:
-                    es_jefe = False
-                if not es_jefe:
-                    hora_entrada = dt_time(8, 0)
-                    hora_salida = dt_time(14, 0)
-
-            # Modo "sin horario" para jefes: si hora_entrada y hora_salida vienen nulas o '00:00'
-            no_schedule = False
-            try:
-                if (hora_entrada == dt_time(0, 0) and hora_salida == dt_time(0, 0)):
-                    no_schedule = True
-            except Exception:
-                pass
+            # Horario efectivo del día desde la tabla compilada (sin consultas por lectura)
+            horario = db_manager.horarios.obtener(empleado_id, current_date)
+            if horario is None:
+                # Empleado aún no presente en el espejo local: resolver con su horario base
+                horario = resolver_horario({'hora_entrada': hora_entrada_str, 'hora_salida': hora_salida_str}, current_date)
+            hora_entrada = dt_time.fromisoformat(horario.entrada)
+            hora_salida = dt_time.fromisoformat(horario.salida)
+            # Modo "sin horario" para jefes: 00:00–00:00
+            no_schedule = horario.sin_horario
 
-            # Verificar último registro del día
-            ultimo_registro = self._get_last_record_today(empleado_id, current_date)
+            # Último movimiento del día desde la bitácora en memoria (sin consultar la BD)
+            ultimo_registro = db_manager.ledger.ultimo(empleado_id, current_date)
             
             if not ultimo_registro:
                 # Primer registro del día - debe ser entrada (aquí sí se evalúa RETARDO/A_TIEMPO)
@@ -316,7 +228,7 @@ class NFCReader:
                     estado = self._calculate_entry_status(current_time, hora_entrada)
                 print(f"   Primer registro del día: {estado}")
             else:
-                ultimo_tipo = ultimo_registro[4]  # tipo_movimiento del último registro
+                ultimo_tipo = ultimo_registro.ultimo_tipo
                 
                 if ultimo_tipo == "ENTRADA":
                     # El último fue entrada, ahora debe ser salida
@@ -339,30 +251,6 @@ class NFCReader:
             print(f"Error determinando movimiento: {e}")
             return "ENTRADA", "A_TIEMPO"
     
-    def _get_last_record_today(self, empleado_id, fecha):
-        """Obtener último registro del empleado en el día"""
-        try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT * FROM registros_asistencia 
-                    WHERE empleado_id = %s AND fecha = %s 
-                    ORDER BY hora_registro DESC LIMIT 1
-                """, (empleado_id, fecha))
-                return cursor.fetchone()
-            else:
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("""
-                    SELECT * FROM registros_local 
-                    WHERE empleado_id = ? AND fecha = ? 
-                    ORDER BY hora_registro DESC LIMIT 1
-                """, (empleado_id, fecha.isoformat()))
-                return cursor.fetchone()
-                
-        except Exception as e:
-            print(f"Error obteniendo último registro: {e}")
-            return None
-    
     def _calculate_entry_status(self, current_time, hora_entrada):
         """Calcular estado de entrada"""
         try:
@@ -422,47 +310,10 @@ class AttendanceValidator:
     
     @staticmethod
     def check_daily_attendance():
-        """Verificar asistencias diarias y marcar faltas"""
+        """Verificar asistencias diarias y marcar faltas (según el horario de cada empleado)"""
         try:
-            current_date = datetime.now().date()
-            
-            # Obtener todos los empleados activos
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("SELECT id, nombre_completo FROM empleados WHERE activo = TRUE")
-                empleados = cursor.fetchall()
-                
-                for empleado_id, nombre in empleados:
-                    # Verificar si tiene registro de entrada hoy
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM registros_asistencia 
-                        WHERE empleado_id = %s AND fecha = %s AND tipo_movimiento = 'ENTRADA'
-                    """, (empleado_id, current_date))
-                    
-                    tiene_entrada = cursor.fetchone()[0] > 0
-                    
-                    if not tiene_entrada:
-                        # Verificar si ya hay un registro de falta
-                        cursor.execute("""
-                            SELECT COUNT(*) FROM registros_asistencia 
-                            WHERE empleado_id = %s AND fecha = %s AND estado = 'FALTA'
-                        """, (empleado_id, current_date))
-                        
-                        tiene_falta = cursor.fetchone()[0] > 0
-                        
-                        if not tiene_falta:
-                            # Registrar falta si ya pasó la hora límite
-                            now = datetime.now()
-                            if now.hour >= 12:  # Después del mediodía, considerar falta
-                                cursor.execute("""
-                                    INSERT INTO registros_asistencia 
-                                    (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado)
-                                    VALUES (%s, 1, %s, %s, 'ENTRADA', 'FALTA')
-                                """, (empleado_id, current_date, now))
-                
-                db_manager.pg_connection.commit()
-                print(f"✅ Verificación de asistencias completada")
-                
+            insertadas = db_manager.marcar_faltas(nfc_reader.ubicacion_actual)
+            print(f"✅ Verificación de asistencias completada ({insertadas} faltas nuevas)")
         except Exception as e:
             print(f"Error verificando asistencias diarias: {e}")
     
@@ -470,24 +321,18 @@ class AttendanceValidator:
     def get_employee_monthly_summary(empleado_id, year, month):
         """Obtener resumen mensual de un empleado"""
         try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT 
-                        fecha,
-                        MIN(CASE WHEN tipo_movimiento = 'ENTRADA' THEN hora_registro END) as primera_entrada,
-                        MAX(CASE WHEN tipo_movimiento = 'SALIDA' THEN hora_registro END) as ultima_salida,
-                        MIN(CASE WHEN tipo_movimiento = 'ENTRADA' THEN estado END) as estado_entrada,
-                        MAX(CASE WHEN tipo_movimiento = 'SALIDA' THEN estado END) as estado_salida
-                    FROM registros_asistencia 
-                    WHERE empleado_id = %s 
-                    AND EXTRACT(YEAR FROM fecha) = %s 
-                    AND EXTRACT(MONTH FROM fecha) = %s
-                    GROUP BY fecha
-                    ORDER BY fecha
-                """, (empleado_id, year, month))
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT fecha, primera_entrada, ultima_salida, estado_entrada, estado_salida
+                        FROM resumen_diario
+                        WHERE empleado_id = %s 
+                        AND fecha >= %s AND fecha < %s
+                        ORDER BY fecha
+                    """, (empleado_id, *rango_mes(year, month)))
                 
-                return cursor.fetchall()
+                    return cursor.fetchall()
                 
         except Exception as e:
             print(f"Error obteniendo resumen mensual: {e}")
@@ -549,6 +394,7 @@ class NFCReaderMulti(NFCReader):
         if self.is_reading:
             return
         self.is_reading = True
+        self.dispatcher.start()
         self._sites = sites  # Soportamos N sitios en paralelo
 
         print(f"🧵 Iniciando lectura en sitios: {self._sites}")
@@ -558,7 +404,7 @@ class NFCReaderMulti(NFCReader):
             fname = scfg.get('readerName')
             findex = scfg.get('readerIndex')
             try:
-                inst = ACR122UReader(callback=lambda uid, _s=site: self._process_with_site(uid, _s),
+                inst = ACR122UReader(callback=lambda uid, _s=site: self._enqueue_tap(uid, _s),
                                      force_name=fname, force_index=findex)
                 ok = inst.start_reading()
                 self._instances[site] = inst
@@ -587,15 +433,12 @@ class NFCReaderMulti(NFCReader):
         self._instances.clear()
         self._instance_running.clear()
         self._active_reader_names.clear()
+        self.dispatcher.stop()
         print("⏹️ Lectura detenida para todos los sitios")
 
     def _process_with_site(self, uid: str, site_override: str):
-        prev = self.ubicacion_actual
-        try:
-            self.ubicacion_actual = site_override
-            return self.process_nfc_card(uid)
-        finally:
-            self.ubicacion_actual = prev
+        # El sitio viaja con la lectura; no se toca self.ubicacion_actual
+        return self.process_nfc_card(uid, site_override)
 
     def _hotplug_dual_watcher(self):
         while self.is_reading and self.dual_enabled:
@@ -610,7 +453,7 @@ class NFCReaderMulti(NFCReader):
                     fname = scfg.get('readerName')
                     findex = scfg.get('readerIndex')
                     try:
-                        inst = ACR122UReader(callback=lambda uid, _s=site: self._process_with_site(uid, _s),
+                        inst = ACR122UReader(callback=lambda uid, _s=site: self._enqueue_tap(uid, _s),
                                              force_name=fname, force_index=findex)
                         ok = inst.start_reading()
                         self._instances[site] = inst
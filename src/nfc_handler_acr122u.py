@@ -2,6 +2,7 @@ import threading
 import time
 from datetime import datetime, time as dt_time, timedelta
 from database_manager import db_manager
+from periodos import rango_mes
 from acr122u_driver import acr122u_reader
 import os
 
@@ -101,7 +102,7 @@ class NFCReader:
                 
                 # Mostrar en pantalla principal si está disponible
                 if self.main_screen:
-                    self.main_screen.show_employee_registration(empleado, tipo_movimiento, estado)
+                    self.main_screen.notify_registration(empleado, tipo_movimiento, estado)
                 
                 return True
             else:
@@ -130,8 +131,8 @@ class NFCReader:
             else:
                 hora_salida = hora_salida_str
             
-            # Verificar último registro del día
-            ultimo_registro = self._get_last_record_today(empleado_id, current_date)
+            # Último movimiento del día desde la bitácora en memoria (sin consultar la BD)
+            ultimo_registro = db_manager.ledger.ultimo(empleado_id, current_date)
             
             if not ultimo_registro:
                 # Primer registro del día - debe ser entrada
@@ -139,7 +140,7 @@ class NFCReader:
                 estado = self._calculate_entry_status(current_time, hora_entrada)
                 print(f"   Primer registro del día: {estado}")
             else:
-                ultimo_tipo = ultimo_registro[4]  # tipo_movimiento del último registro
+                ultimo_tipo = ultimo_registro.ultimo_tipo
                 
                 if ultimo_tipo == "ENTRADA":
                     # El último fue entrada, ahora debe ser salida
@@ -158,30 +159,6 @@ class NFCReader:
             print(f"Error determinando movimiento: {e}")
             return "ENTRADA", "A_TIEMPO"
     
-    def _get_last_record_today(self, empleado_id, fecha):
-        """Obtener último registro del empleado en el día"""
-        try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT * FROM registros_asistencia 
-                    WHERE empleado_id = %s AND fecha = %s 
-                    ORDER BY hora_registro DESC LIMIT 1
-                """, (empleado_id, fecha))
-                return cursor.fetchone()
-            else:
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("""
-                    SELECT * FROM registros_local 
-                    WHERE empleado_id = ? AND fecha = ? 
-                    ORDER BY hora_registro DESC LIMIT 1
-                """, (empleado_id, fecha.isoformat()))
-                return cursor.fetchone()
-                
-        except Exception as e:
-            print(f"Error obteniendo último registro: {e}")
-            return None
-    
     def _calculate_entry_status(self, current_time, hora_entrada):
         """Calcular estado de entrada"""
         try:
@@ -241,47 +218,10 @@ class AttendanceValidator:
     
     @staticmethod
     def check_daily_attendance():
-        """Verificar asistencias diarias y marcar faltas"""
+        """Verificar asistencias diarias y marcar faltas (según el horario de cada empleado)"""
         try:
-            current_date = datetime.now().date()
-            
-            # Obtener todos los empleados activos
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("SELECT id, nombre_completo FROM empleados WHERE activo = TRUE")
-                empleados = cursor.fetchall()
-                
-                for empleado_id, nombre in empleados:
-                    # Verificar si tiene registro de entrada hoy
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM registros_asistencia 
-                        WHERE empleado_id = %s AND fecha = %s AND tipo_movimiento = 'ENTRADA'
-                    """, (empleado_id, current_date))
-                    
-                    tiene_entrada = cursor.fetchone()[0] > 0
-                    
-                    if not tiene_entrada:
-                        # Verificar si ya hay un registro de falta
-                        cursor.execute("""
-                            SELECT COUNT(*) FROM registros_asistencia 
-                            WHERE empleado_id = %s AND fecha = %s AND estado = 'FALTA'
-                        """, (empleado_id, current_date))
-                        
-                        tiene_falta = cursor.fetchone()[0] > 0
-                        
-                        if not tiene_falta:
-                            # Registrar falta si ya pasó la hora límite
-                            now = datetime.now()
-                            if now.hour >= 12:  # Después del mediodía, considerar falta
-                                cursor.execute("""
-                                    INSERT INTO registros_asistencia 
-                                    (empleado_id, ubicacion_id, fecha, hora_registro, tipo_movimiento, estado)
-                                    VALUES (%s, 1, %s, %s, 'ENTRADA', 'FALTA')
-                                """, (empleado_id, current_date, now))
-                
-                db_manager.pg_connection.commit()
-                print(f"✅ Verificación de asistencias completada")
-                
+            insertadas = db_manager.marcar_faltas(nfc_reader.ubicacion_actual)
+            print(f"✅ Verificación de asistencias completada ({insertadas} faltas nuevas)")
         except Exception as e:
             print(f"Error verificando asistencias diarias: {e}")
     
@@ -289,24 +229,18 @@ class AttendanceValidator:
     def get_employee_monthly_summary(empleado_id, year, month):
         """Obtener resumen mensual de un empleado"""
         try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT 
-                        fecha,
-                        MIN(CASE WHEN tipo_movimiento = 'ENTRADA' THEN hora_registro END) as primera_entrada,
-                        MAX(CASE WHEN tipo_movimiento = 'SALIDA' THEN hora_registro END) as ultima_salida,
-                        MIN(CASE WHEN tipo_movimiento = 'ENTRADA' THEN estado END) as estado_entrada,
-                        MAX(CASE WHEN tipo_movimiento = 'SALIDA' THEN estado END) as estado_salida
-                    FROM registros_asistencia 
-                    WHERE empleado_id = %s 
-                    AND EXTRACT(YEAR FROM fecha) = %s 
-                    AND EXTRACT(MONTH FROM fecha) = %s
-                    GROUP BY fecha
-                    ORDER BY fecha
-                """, (empleado_id, year, month))
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT fecha, primera_entrada, ultima_salida, estado_entrada, estado_salida
+                        FROM resumen_diario
+                        WHERE empleado_id = %s 
+                        AND fecha >= %s AND fecha < %s
+                        ORDER BY fecha
+                    """, (empleado_id, *rango_mes(year, month)))
                 
-                return cursor.fetchall()
+                    return cursor.fetchall()
                 
         except Exception as e:
             print(f"Error obteniendo resumen mensual: {e}")
@@ -0,0 +1,173 @@
+"""
+Particionado mensual de registros_asistencia en PostgreSQL (RANGE por fecha).
+- Una partición por mes: registros_asistencia_YYYY_MM = [primer día, primer día del mes siguiente).
+- registros_asistencia_default recibe fechas sin partición (p. ej. un kiosco con el reloj mal)
+  para que un envío nunca sea rechazado; al crear el mes, sus filas se mueven a la partición.
+- registros_asegurar_particion(mes) crea la partición de un mes si falta (la llama el programador
+  de tareas de la aplicación para los meses siguientes).
+- Un mes viejo se puede desprender (DETACH) y archivar sin reescribir la tabla.
+- La conversión inicial (renombrar, copiar y borrar la tabla vieja) toma el mismo candado
+  consultivo que las migraciones y vuelve a comprobar relkind al obtenerlo; con tablas grandes
+  se aplaza a tools/particionar_registros.py porque la copia bloquea las inserciones.
+Las llaves únicas de una tabla particionada incluyen la fecha: PRIMARY KEY (id, fecha) y
+UNIQUE (client_uuid, fecha); client_uuid ya es único por lectura, así que el efecto es el mismo.
+"""
+from __future__ import annotations
+from datetime import date
+
+
+def instalar_funciones(cursor) -> None:
+    """Funciones de mantenimiento de particiones (idempotente)."""
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION registros_asegurar_particion(p_mes DATE) RETURNS TEXT AS $$
+        DECLARE
+            inicio DATE := date_trunc('month', p_mes)::DATE;
+            fin DATE := (date_trunc('month', p_mes) + INTERVAL '1 month')::DATE;
+            nombre TEXT := 'registros_asistencia_' || to_char(date_trunc('month', p_mes), 'YYYY_MM');
+            movidas INTEGER;
+        BEGIN
+            IF to_regclass(nombre) IS NOT NULL THEN
+                RETURN nombre;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE registros_asistencia INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', nombre);
+            -- Filas del mes que cayeron en la partición por defecto
+            EXECUTE format(
+                'WITH m AS (DELETE FROM registros_asistencia_default WHERE fecha >= %L AND fecha < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM m', inicio, fin, nombre);
+            GET DIAGNOSTICS movidas = ROW_COUNT;
+            EXECUTE format('ALTER TABLE registros_asistencia ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           nombre, inicio, fin);
+            IF movidas > 0 THEN
+                -- Borrar directo en la partición no dispara el trigger por sentencia del padre:
+                -- se recalcula el mes movido
+                PERFORM resumen_diario_reconstruir(NULL, inicio, fin);
+            END IF;
+            RETURN nombre;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def convertir_tabla(cursor, meses_adelante: int = 2, max_filas: int | None = None) -> bool | None:
+    """Convertir registros_asistencia en tabla particionada copiando los datos existentes.
+    Retorna True si la convirtió, False si ya estaba particionada y None si se aplazó porque
+    tiene más de max_filas filas (estimadas; contadas si nunca se analizó). Debe correr en una
+    transacción: el candado consultivo se libera al confirmarla.
+    """
+    from pg_migrations import LOCK_MIGRACIONES
+    # Serializar con otros kioscos y volver a mirar el tipo de tabla ya con el candado
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_MIGRACIONES,))
+    cursor.execute("SELECT relkind, reltuples FROM pg_class WHERE oid = to_regclass('registros_asistencia')")
+    row = cursor.fetchone()
+    if row and row[0] == 'p':
+        return False
+    if max_filas is not None and row and _filas_estimadas(cursor, row[1], max_filas) > max_filas:
+        return None
+    cursor.execute("SELECT pg_get_serial_sequence('registros_asistencia', 'id')")
+    secuencia = cursor.fetchone()[0]
+    cursor.execute("SELECT to_regclass('vista_asistencia_diaria') IS NOT NULL, "
+                   "to_regclass('vista_resumen_diario') IS NOT NULL")
+    con_vista, con_vista_resumen = cursor.fetchone()
+
+    # No encolarse detrás de transacciones largas: un ACCESS EXCLUSIVE en espera frena a todos
+    cursor.execute("SET LOCAL lock_timeout = '5s'")
+    # La vista y la secuencia dependen de la tabla vieja: liberarlas antes de renombrar/borrar
+    cursor.execute("DROP VIEW IF EXISTS vista_asistencia_diaria")
+    if con_vista_resumen:
+        # La vista original agregaba registros_asistencia; sobre resumen_diario ya no depende de ella
+        from resumen_diario import instalar_vista_pg
+        instalar_vista_pg(cursor)
+    if secuencia:
+        cursor.execute(f"ALTER SEQUENCE {secuencia} OWNED BY NONE")
+    cursor.execute("ALTER TABLE registros_asistencia RENAME TO registros_asistencia_anterior")
+    # Mismas columnas, defaults (incluido nextval del id) y CHECKs
+    cursor.execute("""
+        CREATE TABLE registros_asistencia
+        (LIKE registros_asistencia_anterior INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (fecha)
+    """)
+    cursor.execute("CREATE TABLE registros_asistencia_default PARTITION OF registros_asistencia DEFAULT")
+    instalar_funciones(cursor)
+    # Particiones desde el mes más antiguo con datos hasta `meses_adelante` meses después del actual
+    cursor.execute("""
+        SELECT registros_asegurar_particion(m::DATE)
+        FROM generate_series(
+            date_trunc('month', LEAST(COALESCE((SELECT MIN(fecha) FROM registros_asistencia_anterior), CURRENT_DATE),
+                                      CURRENT_DATE)),
+            date_trunc('month', CURRENT_DATE) + %s * INTERVAL '1 month',
+            INTERVAL '1 month') AS m
+    """, (meses_adelante,))
+    # Copia sin triggers (el resumen diario ya está calculado para estas filas)
+    cursor.execute("INSERT INTO registros_asistencia SELECT * FROM registros_asistencia_anterior")
+    cursor.execute("DROP TABLE registros_asistencia_anterior")
+    if secuencia:
+        cursor.execute(f"ALTER SEQUENCE {secuencia} OWNED BY registros_asistencia.id")
+
+    cursor.execute("ALTER TABLE registros_asistencia ADD PRIMARY KEY (id, fecha)")
+    cursor.execute("ALTER TABLE registros_asistencia ADD FOREIGN KEY (empleado_id) REFERENCES empleados(id)")
+    cursor.execute("ALTER TABLE registros_asistencia ADD FOREIGN KEY (ubicacion_id) REFERENCES ubicaciones(id)")
+    cursor.execute("CREATE UNIQUE INDEX ux_registros_client_uuid ON registros_asistencia(client_uuid, fecha)")
+    cursor.execute("CREATE INDEX idx_registros_fecha ON registros_asistencia(fecha)")
+    cursor.execute("CREATE INDEX idx_registros_sincronizado ON registros_asistencia(sincronizado)")
+    cursor.execute("""
+        CREATE INDEX idx_registros_emp_fecha_hora
+        ON registros_asistencia(empleado_id, fecha, hora_registro) INCLUDE (tipo_movimiento, estado)
+    """)
+    # Triggers del resumen diario sobre la tabla nueva
+    from resumen_diario import instalar_pg
+    instalar_pg(cursor)
+
+    if con_vista:
+        cursor.execute("""
+            CREATE VIEW vista_asistencia_diaria AS
+            SELECT e.nombre_completo, e.cargo, r.fecha, r.hora_registro, r.tipo_movimiento, r.estado,
+                   u.nombre as ubicacion
+            FROM registros_asistencia r
+            JOIN empleados e ON r.empleado_id = e.id
+            JOIN ubicaciones u ON r.ubicacion_id = u.id
+            ORDER BY r.fecha DESC, r.hora_registro DESC
+        """)
+    return True
+
+
+def _filas_estimadas(cursor, reltuples: float, max_filas: int) -> float:
+    """reltuples de pg_class; -1 si la tabla nunca se analizó (PG14+): se cuenta hasta max_filas + 1."""
+    if reltuples >= 0:
+        return reltuples
+    cursor.execute("SELECT count(*) FROM (SELECT 1 FROM registros_asistencia LIMIT %s) s", (max_filas + 1,))
+    return cursor.fetchone()[0]
+
+
+def esta_particionada(cursor) -> bool:
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('registros_asistencia')")
+    row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def _sumar_meses(d: date, n: int) -> date:
+    total = d.year * 12 + (d.month - 1) + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def asegurar_particiones(cursor, meses_adelante: int = 2, hoy: date | None = None) -> list[str]:
+    """Crear (si faltan) las particiones del mes actual y los `meses_adelante` siguientes.
+    Sin particionar (conversión aplazada) no hay nada que crear.
+    """
+    if not esta_particionada(cursor):
+        return []
+    inicio = (hoy or date.today()).replace(day=1)
+    nombres = []
+    for n in range(meses_adelante + 1):
+        cursor.execute("SELECT registros_asegurar_particion(%s)", (_sumar_meses(inicio, n),))
+        nombres.append(cursor.fetchone()[0])
+    return nombres
+
+
+def desprender_mes(cursor, year: int, month: int) -> str | None:
+    """Desprender la partición de un mes (queda como tabla independiente para archivarla)."""
+    nombre = f"registros_asistencia_{int(year):04d}_{int(month):02d}"
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (nombre,))
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute(f'ALTER TABLE registros_asistencia DETACH PARTITION "{nombre}"')
+    return nombre
@@ -0,0 +1,24 @@
+"""
+Rangos de fechas para consultas por periodo.
+- Convierte (año, mes) o año en un rango semiabierto [inicio, fin) como fechas ISO.
+- Las consultas filtran con `fecha >= inicio AND fecha < fin`, que usa los índices sobre fecha
+  (EXTRACT(...) o substr(fecha, ...) obligan a recorrer toda la tabla).
+- Las fechas ISO 'YYYY-MM-DD' sirven igual para DATE en PostgreSQL y TEXT en SQLite.
+"""
+from __future__ import annotations
+from datetime import date
+
+
+def rango_mes(year: int, month: int) -> tuple[str, str]:
+    """[primer día del mes, primer día del mes siguiente)."""
+    year, month = int(year), int(month)
+    inicio = date(year, month, 1)
+    fin = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return inicio.isoformat(), fin.isoformat()
+
+
+def rango_anio(year: int) -> tuple[str, str]:
+    """[1 de enero, 1 de enero del año siguiente)."""
+    year = int(year)
+    return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+
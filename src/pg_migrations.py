@@ -0,0 +1,199 @@
+"""
+Migraciones del esquema en PostgreSQL (nube).
+- Registro de aplicadas en la tabla 'migraciones_pg' (compartida por todos los kioscos).
+- Los kioscos se serializan con pg_advisory_xact_lock(LOCK_MIGRACIONES): cada migración corre
+  en su transacción con el candado tomado y, al obtenerlo, se vuelve a comprobar si otro kiosco
+  ya la aplicó. Así también es segura la conversión a tabla particionada (renombra y copia, no es
+  idempotente por sí misma).
+- Una migración puede aplazarse retornando False: no se registra y se reintenta en el siguiente
+  arranque (p. ej. el particionado de una tabla grande, que se hace con tools/particionar_registros.py).
+- Se aplican una vez por proceso, en la primera conexión exitosa.
+"""
+from __future__ import annotations
+from typing import Callable, List, Dict
+import os
+
+Migration = Dict[str, object]
+
+# Llave del candado consultivo de migraciones (compartida con particiones.convertir_tabla)
+LOCK_MIGRACIONES = 0x494E5541
+
+
+def max_filas_particionar() -> int | None:
+    """Filas estimadas hasta las que el particionado se hace al arrancar el kiosco (la copia bloquea
+    las inserciones de todos los sitios mientras dura); por encima se aplaza a la herramienta.
+    PARTICIONAR_MAX_FILAS=0 quita el límite.
+    """
+    try:
+        return max(0, int(os.getenv('PARTICIONAR_MAX_FILAS', '200000'))) or None
+    except ValueError:
+        return 200000
+
+
+def _migration_client_uuid(cursor) -> None:
+    """Llave de idempotencia generada en el kiosco: los reintentos no duplican registros."""
+    cursor.execute("ALTER TABLE registros_asistencia ADD COLUMN IF NOT EXISTS client_uuid VARCHAR(64)")
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_registros_client_uuid ON registros_asistencia(client_uuid)"
+    )
+
+
+def _migration_empleados_updated_at(cursor) -> None:
+    """Marca de modificación en empleados para la replicación incremental hacia los kioscos."""
+    cursor.execute(
+        "ALTER TABLE empleados ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now()"
+    )
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION empleados_tocar_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := clock_timestamp();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_empleados_updated_at ON empleados")
+    cursor.execute("""
+        CREATE TRIGGER trg_empleados_updated_at
+        BEFORE INSERT OR UPDATE ON empleados
+        FOR EACH ROW EXECUTE PROCEDURE empleados_tocar_updated_at()
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_empleados_updated_at ON empleados(updated_at)")
+
+
+def _migration_empleados_nfc_uid_norm(cursor) -> None:
+    """UID normalizado como columna generada, con índice único sobre empleados activos."""
+    cursor.execute("""
+        ALTER TABLE empleados ADD COLUMN IF NOT EXISTS nfc_uid_norm VARCHAR(50)
+        GENERATED ALWAYS AS (NULLIF(UPPER(REPLACE(REPLACE(REPLACE(nfc_uid, ' ', ''), ':', ''), '-', '')), '')) STORED
+    """)
+    cursor.execute("SAVEPOINT nfc_norm")
+    try:
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_empleados_nfc_norm ON empleados(nfc_uid_norm) WHERE activo"
+        )
+    except Exception as e:
+        # Tarjetas duplicadas existentes: índice no único hasta depurarlas
+        cursor.execute("ROLLBACK TO SAVEPOINT nfc_norm")
+        print(f"Aviso: tarjetas NFC duplicadas en empleados ({e}); índice sin restricción UNIQUE")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_empleados_nfc_norm ON empleados(nfc_uid_norm)")
+
+
+def _migration_covering_registros_index(cursor) -> None:
+    """Índice cubriente para lecturas por empleado y rango de fechas (reportes mensuales/anuales)."""
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_registros_emp_fecha_hora
+        ON registros_asistencia(empleado_id, fecha, hora_registro) INCLUDE (tipo_movimiento, estado)
+    """)
+    # Prefijo del anterior: ya no aporta y encarece cada inserción
+    cursor.execute("DROP INDEX IF EXISTS idx_registros_empleado_fecha")
+
+
+def _migration_resumen_diario(cursor) -> None:
+    """Resumen diario mantenido por triggers, con carga inicial desde los registros existentes.
+    vista_resumen_diario pasa a leer del resumen (deja de depender de registros_asistencia).
+    """
+    from resumen_diario import instalar_pg, instalar_vista_pg, reconstruir_pg
+    instalar_pg(cursor)
+    reconstruir_pg(cursor)
+    instalar_vista_pg(cursor)
+
+
+def _migration_particionar_registros(cursor) -> bool:
+    """registros_asistencia particionada por mes (copia los datos existentes una sola vez)."""
+    from particiones import convertir_tabla, instalar_funciones
+    convertida = convertir_tabla(cursor, max_filas=max_filas_particionar())
+    if convertida is None:
+        print("Aviso: registros_asistencia es grande para particionarla al arrancar; "
+              "ejecute tools/particionar_registros.py en una ventana de mantenimiento")
+        return False
+    if not convertida:
+        instalar_funciones(cursor)
+    return True
+
+
+def _migration_resumen_diario_por_sentencia(cursor) -> None:
+    """Trigger de borrado del resumen diario por sentencia (tabla de transición) en vez de por fila."""
+    from resumen_diario import instalar_pg
+    instalar_pg(cursor)
+
+
+def get_pg_migrations() -> List[Migration]:
+    return [
+        {
+            "id": "2025-11-01_registros_client_uuid",
+            "description": "Add idempotency key (client_uuid) to registros_asistencia",
+            "apply": _migration_client_uuid,
+        },
+        {
+            "id": "2025-11-01_empleados_updated_at",
+            "description": "Add updated_at column and trigger to empleados",
+            "apply": _migration_empleados_updated_at,
+        },
+        {
+            "id": "2025-11-05_empleados_nfc_uid_norm",
+            "description": "Add generated nfc_uid_norm column with unique index",
+            "apply": _migration_empleados_nfc_uid_norm,
+        },
+        {
+            "id": "2025-11-08_covering_registros_index",
+            "description": "Covering index (empleado_id, fecha, hora_registro) INCLUDE (tipo_movimiento, estado)",
+            "apply": _migration_covering_registros_index,
+        },
+        {
+            "id": "2025-11-10_resumen_diario",
+            "description": "Daily summary table (resumen_diario) maintained by triggers",
+            "apply": _migration_resumen_diario,
+        },
+        {
+            "id": "2025-11-12_particionar_registros",
+            "description": "Range-partition registros_asistencia by month",
+            "apply": _migration_particionar_registros,
+        },
+        {
+            "id": "2025-11-14_resumen_diario_borrado_por_sentencia",
+            "description": "Statement-level delete trigger for resumen_diario",
+            "apply": _migration_resumen_diario_por_sentencia,
+        },
+    ]
+
+
+def apply_pending_pg_migrations(conn) -> list[str]:
+    """Aplicar migraciones pendientes (cada una en su transacción). Retorna los IDs aplicados."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS migraciones_pg (
+            id VARCHAR(100) PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.commit()
+    cursor.execute("SELECT id FROM migraciones_pg")
+    aplicadas = {row[0] for row in cursor.fetchall()}
+    applied: list[str] = []
+    for m in get_pg_migrations():
+        mig_id = str(m["id"])  # type: ignore
+        if mig_id in aplicadas:
+            continue
+        fn: Callable = m["apply"]  # type: ignore
+        try:
+            # Un kiosco a la vez; quien esperó el candado comprueba si otro ya la aplicó
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_MIGRACIONES,))
+            cursor.execute("SELECT 1 FROM migraciones_pg WHERE id = %s", (mig_id,))
+            if cursor.fetchone():
+                conn.commit()
+                continue
+            if fn(cursor) is False:
+                # Aplazada: lo hecho se confirma pero no se registra
+                conn.commit()
+                continue
+            cursor.execute(
+                "INSERT INTO migraciones_pg (id) VALUES (%s) ON CONFLICT (id) DO NOTHING", (mig_id,)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(mig_id)
+    return applied
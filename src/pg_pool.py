@@ -0,0 +1,206 @@
+"""
+Pool de conexiones a PostgreSQL.
+- Tamaño mínimo/máximo configurable; las conexiones se crean bajo demanda hasta el máximo.
+- Préstamo por hilo y reentrante: dentro de un mismo hilo, bloques anidados reciben la misma conexión.
+- Validación al prestar: conexiones cerradas se descartan y las inactivas por más de
+  `validar_tras_s` se prueban con SELECT 1 antes de entregarse.
+- connection(): préstamo simple; al devolverla se deshace cualquier transacción abierta.
+  transaction(): commit al salir sin error, rollback si hubo excepción.
+"""
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable
+import threading
+import time
+
+
+class PoolAgotado(Exception):
+    """No hay conexiones libres y se alcanzó el máximo del pool."""
+
+
+class _Prestamo:
+    __slots__ = ('conn', 'profundidad', 'tx', 'error')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.profundidad = 0
+        self.tx = 0
+        self.error = False
+
+
+class PGPool:
+    def __init__(self, connect: Callable[[], object], minconn: int = 1, maxconn: int = 4,
+                 validar_tras_s: float = 30.0, espera_s: float = 10.0):
+        # connect() crea una conexión nueva (psycopg2.connect con los parámetros del sistema)
+        self._connect = connect
+        self.minconn = max(0, int(minconn))
+        self.maxconn = max(1, int(maxconn), self.minconn)
+        self.validar_tras_s = validar_tras_s
+        self.espera_s = espera_s
+        self._libres: deque[tuple[object, float]] = deque()  # (conexión, devuelta_en)
+        self._creadas = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    # ---- préstamo / devolución ----
+    def checkout(self):
+        """Prestar una conexión al hilo actual (reentrante)."""
+        prestamo = getattr(self._local, 'prestamo', None)
+        if prestamo is not None:
+            prestamo.profundidad += 1
+            return prestamo.conn
+        conn = self._obtener()
+        prestamo = _Prestamo(conn)
+        prestamo.profundidad = 1
+        self._local.prestamo = prestamo
+        return conn
+
+    def checkin(self, conn, error: bool = False) -> None:
+        """Devolver la conexión prestada al hilo actual."""
+        prestamo = getattr(self._local, 'prestamo', None)
+        if prestamo is None or prestamo.conn is not conn:
+            # No fue prestada por este hilo: sólo devolverla
+            self._devolver(conn, error)
+            return
+        prestamo.error = prestamo.error or error
+        prestamo.profundidad -= 1
+        if prestamo.profundidad > 0:
+            return
+        self._local.prestamo = None
+        self._devolver(conn, prestamo.error)
+
+    @contextmanager
+    def connection(self):
+        conn = self.checkout()
+        error = False
+        try:
+            yield conn
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.checkin(conn, error)
+
+    @contextmanager
+    def transaction(self):
+        """Transacción: commit al salir (sólo el bloque más externo), rollback si hay excepción."""
+        with self.connection() as conn:
+            prestamo = self._local.prestamo
+            prestamo.tx += 1
+            try:
+                yield conn
+                if prestamo.tx == 1:
+                    conn.commit()
+            except Exception:
+                if prestamo.tx == 1:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                raise
+            finally:
+                prestamo.tx -= 1
+
+    def cerrar(self) -> None:
+        """Cerrar todas las conexiones libres (las prestadas se cierran al devolverse)."""
+        with self._cond:
+            while self._libres:
+                conn, _ = self._libres.popleft()
+                self._creadas -= 1
+                self._cerrar_conn(conn)
+            self._cond.notify_all()
+
+    def precalentar(self) -> int:
+        """Abrir conexiones hasta el mínimo configurado. Retorna cuántas se abrieron."""
+        abiertas = 0
+        while True:
+            with self._cond:
+                if self._creadas >= self.minconn:
+                    return abiertas
+                self._creadas += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._creadas -= 1
+                raise
+            with self._cond:
+                self._libres.append((conn, time.monotonic()))
+                self._cond.notify()
+            abiertas += 1
+
+    # ---- internos ----
+    def _obtener(self):
+        limite = time.monotonic() + self.espera_s
+        while True:
+            candidato = None
+            crear = False
+            with self._cond:
+                if self._libres:
+                    candidato = self._libres.pop()  # LIFO: la más recientemente usada
+                elif self._creadas < self.maxconn:
+                    self._creadas += 1
+                    crear = True
+                else:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise PoolAgotado(f"Sin conexiones libres (máximo {self.maxconn})")
+                    self._cond.wait(restante)
+                    continue
+            if crear:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._creadas -= 1
+                        self._cond.notify()
+                    raise
+            conn, devuelta_en = candidato
+            if self._valida(conn, time.monotonic() - devuelta_en):
+                return conn
+            # Descartar y reintentar (otra libre o una nueva)
+            self._descartar(conn)
+
+    def _valida(self, conn, inactiva_s: float) -> bool:
+        if getattr(conn, 'closed', 1) != 0:
+            return False
+        if inactiva_s < self.validar_tras_s:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _devolver(self, conn, error: bool) -> None:
+        if getattr(conn, 'closed', 1) != 0:
+            self._descartar(conn)
+            return
+        try:
+            # No dejar transacciones abiertas en conexiones libres
+            conn.rollback()
+        except Exception:
+            self._descartar(conn)
+            return
+        # Tras un error se fuerza la validación en el siguiente préstamo
+        devuelta_en = float('-inf') if error else time.monotonic()
+        with self._cond:
+            self._libres.append((conn, devuelta_en))
+            self._cond.notify()
+
+    def _descartar(self, conn) -> None:
+        self._cerrar_conn(conn)
+        with self._cond:
+            self._creadas -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _cerrar_conn(conn) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
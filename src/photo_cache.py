@@ -0,0 +1,169 @@
+"""
+Caché de fotos de empleados ya escaladas.
+- Versiones: 'pantalla' 560x560 completa sobre lienzo blanco (pantalla principal) y
+  'admin' 320x320 recortada al centro (administración).
+- En disco (database/fotos_cache) con clave por ruta, mtime y tamaño del archivo original:
+  si la foto cambia, la clave cambia, se vuelve a generar y se borra la versión anterior.
+  podar() borra las de fotos que ya no están en uso (empleados dados de baja).
+- En memoria, LRU de imágenes PIL ya decodificadas con límite en bytes.
+- Las imágenes PIL se preparan en cualquier hilo; el PhotoImage se crea en el hilo de Tk.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable
+import hashlib
+import os
+import threading
+
+from PIL import Image, ImageOps
+
+# nombre -> (lado en px, modo): 'contain' muestra completa con bandas, 'fit' recorta al centro
+RENDICIONES = {
+    'pantalla': (560, 'contain'),
+    'admin': (320, 'fit'),
+}
+
+
+class PhotoCache:
+    def __init__(self, cache_dir: str | Path | None = None, max_bytes: int = 64 * 1024 * 1024):
+        if cache_dir is None:
+            cache_dir = Path(__file__).resolve().parent.parent / 'database' / 'fotos_cache'
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._memoria: OrderedDict[tuple, Image.Image] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, foto_path, rendicion: str = 'pantalla') -> Image.Image | None:
+        """Imagen PIL de la versión pedida, o None si la foto no existe o no se puede leer."""
+        if not foto_path:
+            return None
+        try:
+            st = os.stat(foto_path)
+        except OSError:
+            return None
+        clave = (os.path.abspath(str(foto_path)), st.st_mtime_ns, st.st_size, rendicion)
+        with self._lock:
+            img = self._memoria.get(clave)
+            if img is not None:
+                self._memoria.move_to_end(clave)
+                return img
+        try:
+            img = self._leer_o_generar(clave)
+        except Exception as e:
+            print(f"Error preparando foto {foto_path}: {e}")
+            return None
+        self._guardar_en_memoria(clave, img)
+        return img
+
+    def precalentar(self, rutas: Iterable, rendiciones: Iterable[str] = ('pantalla',)) -> threading.Thread:
+        """Generar en segundo plano las versiones de una lista de fotos."""
+        rutas = [r for r in rutas if r]
+        rendiciones = tuple(rendiciones)
+
+        def _run():
+            for ruta in rutas:
+                for rend in rendiciones:
+                    self.obtener(ruta, rend)
+
+        t = threading.Thread(target=_run, daemon=True, name='fotos-cache')
+        t.start()
+        return t
+
+    def refrescar(self, foto_path) -> None:
+        """Descartar versiones en memoria de una foto reescrita y regenerarlas en segundo plano."""
+        ruta = os.path.abspath(str(foto_path))
+        with self._lock:
+            for clave in [k for k in self._memoria if k[0] == ruta]:
+                self._bytes -= self._tamano(self._memoria.pop(clave))
+        self.precalentar([foto_path], RENDICIONES.keys())
+
+    def podar(self, rutas_vigentes: Iterable) -> int:
+        """Borrar del disco las versiones de fotos que no están en `rutas_vigentes`. Retorna cuántas."""
+        vigentes = {self._prefijo(os.path.abspath(str(r))) for r in rutas_vigentes if r}
+        borrados = 0
+        try:
+            archivos = list(self.cache_dir.iterdir())
+        except OSError:
+            return 0
+        for archivo in archivos:
+            if archivo.name.split('_', 1)[0] not in vigentes:
+                try:
+                    archivo.unlink()
+                    borrados += 1
+                except OSError:
+                    pass
+        return borrados
+
+    @staticmethod
+    def _prefijo(ruta: str) -> str:
+        return hashlib.sha1(ruta.encode('utf-8')).hexdigest()[:16]
+
+    def _archivo_cache(self, clave: tuple) -> Path:
+        # <ruta>_<versión del original>_<rendición>: las versiones viejas de una ruta se ubican por prefijo
+        ruta, mtime_ns, size, rendicion = clave
+        version = hashlib.sha1(f"{mtime_ns}|{size}".encode('utf-8')).hexdigest()[:16]
+        return self.cache_dir / f"{self._prefijo(ruta)}_{version}_{rendicion}.jpg"
+
+    def _borrar_anteriores(self, archivo: Path) -> None:
+        """Borrar las versiones de la misma foto y rendición distintas de `archivo`."""
+        prefijo, _, rendicion = archivo.stem.split('_', 2)
+        for viejo in self.cache_dir.glob(f"{prefijo}_*_{rendicion}.jpg"):
+            if viejo != archivo:
+                try:
+                    viejo.unlink()
+                except OSError:
+                    pass
+
+    def _leer_o_generar(self, clave: tuple) -> Image.Image:
+        archivo = self._archivo_cache(clave)
+        if archivo.exists():
+            try:
+                with Image.open(archivo) as img:
+                    img.load()
+                    return img.convert('RGB')
+            except Exception:
+                pass  # archivo de caché dañado: regenerar
+        img = self._generar(clave[0], clave[3])
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = archivo.with_suffix('.tmp')
+            img.save(tmp, "JPEG", quality=90)
+            os.replace(tmp, archivo)
+            self._borrar_anteriores(archivo)
+        except Exception as e:
+            print(f"Aviso: no se pudo escribir caché de foto: {e}")
+        return img
+
+    @staticmethod
+    def _generar(ruta: str, rendicion: str) -> Image.Image:
+        lado, modo = RENDICIONES[rendicion]
+        with Image.open(ruta) as original:
+            # draft: el decodificador JPEG reduce la escala al leer fotos grandes
+            original.draft('RGB', (lado * 2, lado * 2))
+            original = original.convert('RGB')
+            if modo == 'fit':
+                return ImageOps.fit(original, (lado, lado), Image.Resampling.LANCZOS, centering=(0.5, 0.5))
+            img = ImageOps.contain(original, (lado, lado), Image.Resampling.LANCZOS)
+        canvas = Image.new('RGB', (lado, lado), 'white')
+        canvas.paste(img, ((lado - img.width) // 2, (lado - img.height) // 2))
+        return canvas
+
+    @staticmethod
+    def _tamano(img: Image.Image) -> int:
+        return img.width * img.height * len(img.getbands())
+
+    def _guardar_en_memoria(self, clave: tuple, img: Image.Image) -> None:
+        with self._lock:
+            if clave in self._memoria:
+                return
+            self._memoria[clave] = img
+            self._bytes += self._tamano(img)
+            while self._bytes > self.max_bytes and len(self._memoria) > 1:
+                _, viejo = self._memoria.popitem(last=False)
+                self._bytes -= self._tamano(viejo)
+
+
+# Instancia global
+photo_cache = PhotoCache()
@@ -0,0 +1,103 @@
+"""
+Modelo incremental de la lista "Registros del día" de la pantalla principal.
+- Cada registro se identifica por (fuente, id); sólo se piden filas con id mayor a la marca de agua.
+- Reglas de color: se colorean el primer registro del día del empleado y su última SALIDA;
+  los intermedios quedan en blanco y sin estado. RETARDO justificado -> verde con asterisco.
+- Las filas de FALTA (empleados sin registros después de mediodía) se identifican como falta:<id>.
+No depende de Tk: la pantalla aplica los cambios sobre el Treeview.
+"""
+from __future__ import annotations
+from bisect import bisect_left, insort
+from datetime import datetime
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+
+
+class RegistroVista:
+    __slots__ = ('iid', 'empleado_id', 'nombre', 'hora', 'tipo_movimiento', 'estado', 'ubicacion', 'orden')
+
+    def __init__(self, iid, empleado_id, nombre, hora, tipo_movimiento, estado, ubicacion, orden):
+        self.iid = iid
+        self.empleado_id = empleado_id
+        self.nombre = nombre
+        self.hora = hora
+        self.tipo_movimiento = tipo_movimiento
+        self.estado = estado
+        self.ubicacion = ubicacion
+        self.orden = orden
+
+
+class RecordsViewModel:
+    """Registros del día indexados por iid, en orden de hora descendente."""
+
+    def __init__(self):
+        self.reset(None, None)
+
+    def reset(self, fecha, fuente) -> None:
+        self.fecha = fecha
+        self.fuente = fuente
+        self.ultimo_id = 0
+        self.registros: dict[str, RegistroVista] = {}
+        self.por_empleado: dict[int, list[RegistroVista]] = {}
+        # Claves de orden (-timestamp, id) ascendentes => hora descendente
+        self._orden: list[tuple] = []
+
+    def aplicar(self, filas) -> tuple[list[str], set[int]]:
+        """Incorporar filas nuevas. Retorna (iids nuevos, empleados afectados)."""
+        nuevos: list[str] = []
+        afectados: set[int] = set()
+        for reg_id, empleado_id, nombre, _foto, hora_registro, tipo_mov, estado, ubicacion in filas:
+            self.ultimo_id = max(self.ultimo_id, int(reg_id))
+            iid = f"{self.fuente}:{reg_id}"
+            if iid in self.registros:
+                continue
+            hora = _as_datetime(hora_registro)
+            orden = (-hora.timestamp(), int(reg_id))
+            reg = RegistroVista(iid, empleado_id, nombre, hora, tipo_mov, estado, ubicacion, orden)
+            self.registros[iid] = reg
+            self.por_empleado.setdefault(empleado_id, []).append(reg)
+            insort(self._orden, orden)
+            nuevos.append(iid)
+            afectados.add(empleado_id)
+        return nuevos, afectados
+
+    def indice(self, iid: str) -> int:
+        """Posición del registro en la lista (hora descendente)."""
+        return bisect_left(self._orden, self.registros[iid].orden)
+
+    def empleados_con_registro(self) -> set[int]:
+        return set(self.por_empleado)
+
+    def filas_empleado(self, empleado_id: int) -> list[RegistroVista]:
+        return self.por_empleado.get(empleado_id, [])
+
+    def presentar(self, reg: RegistroVista, just_map: dict) -> tuple[tuple, str]:
+        """Valores y tag de color de un registro según las reglas de primer/última salida."""
+        filas = self.por_empleado.get(reg.empleado_id) or [reg]
+        primero = min(filas, key=lambda r: r.hora)
+        salidas = [r for r in filas if r.tipo_movimiento == 'SALIDA']
+        ultima_salida = max(salidas, key=lambda r: r.hora) if salidas else None
+
+        tag = 'normal'
+        est_up = (reg.estado or '').upper()
+        estado_mostrar = ''
+        retardo_justificado = (reg.empleado_id, 'RETARDO') in just_map and est_up == 'RETARDO'
+        falta_justificada = (reg.empleado_id, 'FALTA') in just_map
+        if reg is primero or reg is ultima_salida:
+            estado_mostrar = reg.estado
+            if est_up in ('A_TIEMPO', 'TEMPRANO'):
+                tag = 'verde'
+            elif est_up == 'RETARDO':
+                tag = 'verde' if retardo_justificado else 'amarillo'
+                if retardo_justificado:
+                    estado_mostrar = 'RETARDO*'
+            elif est_up == 'FALTA':
+                tag = 'normal' if falta_justificada else 'rojo'
+
+        valores = (reg.hora.strftime("%H:%M:%S"), reg.nombre, reg.tipo_movimiento,
+                   estado_mostrar, (reg.ubicacion or '').upper())
+        return valores, tag
@@ -0,0 +1,129 @@
+"""
+Caché de reportes generados.
+- Clave: tipo de reporte, periodo, formato y una huella de los datos del periodo (la calcula
+  ReportGenerator a partir del resumen diario, las justificaciones y la firma de empleados).
+  Si nada cambió, el reporte se entrega copiando los archivos guardados, sin consultar ni generar.
+- En disco (database/reportes_cache): <clave>.json con la lista de archivos y <clave>__<archivo>.
+- Expulsión por antigüedad del último uso (REPORTES_CACHE_DIAS) y por tamaño total
+  (REPORTES_CACHE_MB), empezando por lo menos usado.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterable
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# Cambiar al modificar el contenido de los reportes para invalidar lo guardado
+VERSION_FORMATO = 2
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    try:
+        return max(0, int(os.getenv(nombre, str(defecto))))
+    except ValueError:
+        return defecto
+
+
+class ReportCache:
+    def __init__(self, cache_dir: str | Path | None = None, max_bytes: int | None = None,
+                 max_edad_s: float | None = None):
+        if cache_dir is None:
+            cache_dir = Path(__file__).resolve().parent.parent / 'database' / 'reportes_cache'
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes if max_bytes is not None else _entero_env('REPORTES_CACHE_MB', 200) * 1024 * 1024
+        self.max_edad_s = max_edad_s if max_edad_s is not None else _entero_env('REPORTES_CACHE_DIAS', 30) * 86400
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(tipo: str, periodo: str, formato: str, huella: str) -> str:
+        texto = f"{VERSION_FORMATO}|{tipo}|{periodo}|{formato}|{huella}"
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()[:32]
+
+    def obtener(self, tipo: str, periodo: str, formato: str, huella: str, destino_dir: str) -> list[str] | None:
+        """Rutas en destino_dir de los archivos guardados para esta clave, o None si no hay."""
+        if not huella:
+            return None
+        clave = self.clave(tipo, periodo, formato, huella)
+        meta = self.cache_dir / f"{clave}.json"
+        with self._lock:
+            try:
+                nombres = json.loads(meta.read_text(encoding='utf-8'))['archivos']
+                rutas = []
+                for nombre in nombres:
+                    destino = os.path.join(destino_dir, nombre)
+                    shutil.copyfile(self.cache_dir / f"{clave}__{nombre}", destino)
+                    rutas.append(destino)
+                # Marca de uso para la expulsión
+                os.utime(meta)
+                return rutas
+            except (OSError, ValueError, KeyError):
+                return None
+
+    def guardar(self, tipo: str, periodo: str, formato: str, huella: str, archivos: Iterable[str]) -> None:
+        if not huella:
+            return
+        archivos = [a for a in archivos if a and os.path.isfile(a)]
+        if not archivos:
+            return
+        clave = self.clave(tipo, periodo, formato, huella)
+        with self._lock:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                nombres = []
+                for ruta in archivos:
+                    nombre = os.path.basename(ruta)
+                    shutil.copyfile(ruta, self.cache_dir / f"{clave}__{nombre}")
+                    nombres.append(nombre)
+                (self.cache_dir / f"{clave}.json").write_text(
+                    json.dumps({'tipo': tipo, 'periodo': periodo, 'formato': formato, 'archivos': nombres},
+                               ensure_ascii=False), encoding='utf-8')
+            except OSError as e:
+                print(f"Aviso: no se pudo guardar el reporte en caché: {e}")
+                return
+        self.purgar()
+
+    def purgar(self) -> None:
+        """Expulsar entradas viejas y, si se excede el tamaño, las menos usadas."""
+        with self._lock:
+            try:
+                metas = sorted(self.cache_dir.glob('*.json'), key=lambda p: p.stat().st_mtime)
+            except OSError:
+                return
+            ahora = time.time()
+            entradas = []
+            total = 0
+            for meta in metas:
+                clave = meta.stem
+                archivos = list(self.cache_dir.glob(f"{clave}__*"))
+                try:
+                    tam = sum(a.stat().st_size for a in archivos)
+                    edad = ahora - meta.stat().st_mtime
+                except OSError:
+                    continue
+                if self.max_edad_s and edad > self.max_edad_s:
+                    self._borrar(meta, archivos)
+                    continue
+                entradas.append((meta, archivos, tam))
+                total += tam
+            # metas va de la menos a la más recientemente usada
+            for meta, archivos, tam in entradas:
+                if total <= self.max_bytes:
+                    break
+                self._borrar(meta, archivos)
+                total -= tam
+
+    @staticmethod
+    def _borrar(meta: Path, archivos) -> None:
+        for ruta in [meta, *archivos]:
+            try:
+                ruta.unlink()
+            except OSError:
+                pass
+
+
+# Instancia global
+report_cache = ReportCache()
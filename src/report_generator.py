@@ -1,12 +1,20 @@
 import pandas as pd
 from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.pagesizes import letter, A4, landscape
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
 from database_manager import db_manager
+from periodos import rango_mes, rango_anio
+from excel_stream import LibroStream, estilo_estado, texto_fecha, texto_hora
+import report_render
+import attendance_matrix
+import worked_hours
+from report_cache import report_cache
+import json
+import hashlib
 import calendar
 
 class ReportGenerator:
@@ -55,6 +63,12 @@ class ReportGenerator:
             fecha = datetime.now().date()
         
         try:
+            # Si nada cambió en el día, entregar los archivos ya generados
+            huella = self._huella_periodo(fecha.isoformat(), (fecha + timedelta(days=1)).isoformat())
+            cached = report_cache.obtener('diario', fecha.isoformat(), formato, huella, self.reports_dir)
+            if cached:
+                return cached
+            
             # Obtener datos del día
             data = self._get_daily_data(fecha)
             
@@ -74,6 +88,7 @@ class ReportGenerator:
                 if pdf_file:
                     files_generated.append(pdf_file)
             
+            report_cache.guardar('diario', fecha.isoformat(), formato, huella, files_generated)
             return files_generated
             
         except Exception as e:
@@ -88,12 +103,20 @@ class ReportGenerator:
             month = datetime.now().month
         
         try:
+            # Si nada cambió en el mes, entregar los archivos ya generados
+            periodo = f"{year}-{int(month):02d}"
+            huella = self._huella_periodo(*rango_mes(year, month))
+            cached = report_cache.obtener('mensual', periodo, formato, huella, self.reports_dir)
+            if cached:
+                return cached
+            
             # Obtener datos del mes
             data = self._get_monthly_data(year, month)
             
             if not data:
                 print(f"No hay registros para {month}/{year}")
                 return None
+            horas = worked_hours.por_dia(self.obtener_horas_trabajadas(*rango_mes(year, month)))
             
             files_generated = []
             
@@ -105,21 +128,126 @@ class ReportGenerator:
                 pass
 
             if formato in ['excel', 'both']:
-                excel_file = self._generate_monthly_excel(data, year, month)
+                excel_file = self._generate_monthly_excel(data, year, month, horas)
                 if excel_file:
                     files_generated.append(excel_file)
             
             if formato in ['pdf', 'both']:
-                pdf_file = self._generate_monthly_pdf(data, year, month)
+                pdf_file = self._generate_monthly_pdf(data, year, month, horas)
                 if pdf_file:
                     files_generated.append(pdf_file)
             
+            report_cache.guardar('mensual', periodo, formato, huella, files_generated)
             return files_generated
             
         except Exception as e:
             print(f"Error generando reporte mensual: {e}")
             return None
     
+    def generate_monthly_matrix_report(self, year=None, month=None, formato='both'):
+        """Generar la matriz mensual de asistencia (empleados × días, incluidas faltas y descansos)."""
+        if year is None:
+            year = datetime.now().year
+        if month is None:
+            month = datetime.now().month
+        
+        try:
+            periodo = f"{year}-{int(month):02d}"
+            desde, hasta = rango_mes(year, month)
+            huella = self._huella_periodo(desde, hasta)
+            cached = report_cache.obtener('matriz', periodo, formato, huella, self.reports_dir)
+            if cached:
+                return cached
+            
+            # Empleados activos (también los que no tienen registros en el mes)
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT id, nombre_completo FROM empleados WHERE activo = TRUE")
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("SELECT id, nombre_completo FROM empleados_local WHERE activo = 1")
+                empleados = cursor.fetchall()
+            if not empleados:
+                print("No hay empleados activos")
+                return None
+            
+            c = db_manager.sqlite_connection.cursor()
+            c.execute("""
+                SELECT empleado_id, fecha, tipo FROM justificaciones_local
+                WHERE fecha >= ? AND fecha < ?
+            """, (desde, hasta))
+            justificaciones = c.fetchall()
+            
+            matriz = attendance_matrix.construir(year, int(month), empleados, self._get_monthly_data(year, month),
+                                                 db_manager.horarios.tabla, justificaciones)
+            
+            files_generated = []
+            if formato in ['excel', 'both']:
+                files_generated.append(report_render.excel_matriz(self.reports_dir, matriz))
+            if formato in ['pdf', 'both']:
+                files_generated.append(report_render.pdf_matriz(self.reports_dir, matriz))
+            
+            # El día actual cambia de clase con la hora (faltas vencidas): sólo guardar meses cerrados
+            if hasta <= datetime.now().date().isoformat():
+                report_cache.guardar('matriz', periodo, formato, huella, files_generated)
+            print(f"Matriz mensual generada: {', '.join(files_generated)}")
+            return files_generated
+            
+        except Exception as e:
+            print(f"Error generando matriz mensual: {e}")
+            return None
+    
+    def export_records_excel(self, year=None, month=None):
+        """Exportar a Excel todos los registros (todas las ubicaciones) de un año o de un mes.
+        Las filas se escriben conforme se leen del cursor, sin cargarlas en memoria.
+        """
+        if year is None:
+            year = datetime.now().year
+        try:
+            desde, hasta = rango_mes(year, month) if month else rango_anio(year)
+            sufijo = f"{year}_{int(month):02d}" if month else f"{year}"
+            filepath = os.path.join(self.reports_dir, f"registros_{sufijo}.xlsx")
+            encabezados = ['Fecha', 'Hora', 'Empleado', 'Cargo', 'Movimiento', 'Estado', 'Ubicación']
+
+            with db_manager.pg_session() as conn:
+                if conn:
+                    # Cursor del servidor: se reciben lotes, no todo el periodo
+                    cursor = conn.cursor(name='exportar_registros')
+                    cursor.itersize = 2000
+                    cursor.execute("""
+                        SELECT r.fecha, r.hora_registro, e.nombre_completo, e.cargo,
+                               r.tipo_movimiento, r.estado, u.nombre
+                        FROM registros_asistencia r
+                        JOIN empleados e ON r.empleado_id = e.id
+                        JOIN ubicaciones u ON r.ubicacion_id = u.id
+                        WHERE r.fecha >= %s AND r.fecha < %s
+                        ORDER BY r.fecha, r.hora_registro
+                    """, (desde, hasta))
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("""
+                        SELECT r.fecha, r.hora_registro, e.nombre_completo, e.cargo,
+                               r.tipo_movimiento, r.estado, r.ubicacion_nombre
+                        FROM registros_local r
+                        JOIN empleados_local e ON r.empleado_id = e.id
+                        WHERE r.fecha >= ? AND r.fecha < ?
+                        ORDER BY r.fecha, r.hora_registro
+                    """, (desde, hasta))
+
+                with LibroStream(filepath) as libro:
+                    hoja = libro.hoja('Registros', encabezados)
+                    for fecha, hora, nombre, cargo, mov, estado, ubicacion in cursor:
+                        hoja.agregar([texto_fecha(fecha), texto_hora(hora), nombre, cargo, mov, estado,
+                                      ubicacion], estilo_estado(estado))
+
+            print(f"Exportación Excel generada: {filepath} ({hoja.filas} registros)")
+            return filepath
+
+        except Exception as e:
+            print(f"Error exportando registros a Excel: {e}")
+            return None
+
     def generate_employee_report(self, empleado_id, year=None, month=None, formato='both'):
         """Generar reporte individual de empleado"""
         if year is None:
@@ -136,14 +264,16 @@ class ReportGenerator:
                 return None
             
             files_generated = []
+            horas = worked_hours.calcular([(empleado_id,) + tuple(r) for r in attendance_data],
+                                          db_manager.horarios.tabla)
             
             if formato in ['excel', 'both']:
-                excel_file = self._generate_employee_excel(employee_data, attendance_data, year, month)
+                excel_file = self._generate_employee_excel(employee_data, attendance_data, year, month, horas)
                 if excel_file:
                     files_generated.append(excel_file)
             
             if formato in ['pdf', 'both']:
-                pdf_file = self._generate_employee_pdf(employee_data, attendance_data, year, month)
+                pdf_file = self._generate_employee_pdf(employee_data, attendance_data, year, month, horas)
                 if pdf_file:
                     files_generated.append(pdf_file)
             
@@ -160,36 +290,37 @@ class ReportGenerator:
                 fecha = datetime.now().date()
 
             # Obtener datos del empleado y registros del día
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
-                    FROM empleados WHERE id = %s AND activo = TRUE
-                """, (empleado_id,))
-                employee_data = cursor.fetchone()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
+                        FROM empleados WHERE id = %s AND activo = TRUE
+                    """, (empleado_id,))
+                    employee_data = cursor.fetchone()
 
-                cursor.execute("""
-                    SELECT fecha, hora_registro, tipo_movimiento, estado
-                    FROM registros_asistencia 
-                    WHERE empleado_id = %s AND fecha = %s
-                    ORDER BY hora_registro
-                """, (empleado_id, fecha))
-                attendance_data = cursor.fetchall()
-            else:
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("""
-                    SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
-                    FROM empleados_local WHERE id = ? AND activo = 1
-                """, (empleado_id,))
-                employee_data = cursor.fetchone()
+                    cursor.execute("""
+                        SELECT fecha, hora_registro, tipo_movimiento, estado
+                        FROM registros_asistencia 
+                        WHERE empleado_id = %s AND fecha = %s
+                        ORDER BY hora_registro
+                    """, (empleado_id, fecha))
+                    attendance_data = cursor.fetchall()
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("""
+                        SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
+                        FROM empleados_local WHERE id = ? AND activo = 1
+                    """, (empleado_id,))
+                    employee_data = cursor.fetchone()
 
-                cursor.execute("""
-                    SELECT fecha, hora_registro, tipo_movimiento, estado
-                    FROM registros_local 
-                    WHERE empleado_id = ? AND fecha = ?
-                    ORDER BY hora_registro
-                """, (empleado_id, fecha.isoformat()))
-                attendance_data = cursor.fetchall()
+                    cursor.execute("""
+                        SELECT fecha, hora_registro, tipo_movimiento, estado
+                        FROM registros_local 
+                        WHERE empleado_id = ? AND fecha = ?
+                        ORDER BY hora_registro
+                    """, (empleado_id, fecha.isoformat()))
+                    attendance_data = cursor.fetchall()
 
             if not employee_data:
                 print(f"Empleado con ID {empleado_id} no encontrado")
@@ -204,41 +335,18 @@ class ReportGenerator:
                     filename = f"asistencia_diaria_{nombre.replace(' ', '_')}_{fecha.strftime('%Y%m%d')}.xlsx"
                     filepath = os.path.join(self.employee_reports_dir, filename)
 
-                    df = pd.DataFrame(attendance_data, columns=['Fecha', 'Hora', 'Movimiento', 'Estado'])
-                    if not df.empty:
-                        df['Hora'] = pd.to_datetime(df['Hora']).dt.strftime('%H:%M:%S')
-
                     # Calcular horario efectivo del día
                     try:
                         he_eff, hs_eff = db_manager.obtener_horario_efectivo(empleado_id, fecha)
                     except Exception:
                         he_eff, hs_eff = str(employee_data[3])[:5], str(employee_data[4])[:5]
 
-                    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                        summary_df = pd.DataFrame({
-                            'Empleado': [nombre],
-                            'Cargo': [employee_data[1]],
-                            'Rol': [employee_data[2]],
-                            'Horario Entrada': [he_eff],
-                            'Horario Salida': [hs_eff],
-                            'Fecha': [fecha.strftime('%Y-%m-%d')]
-                        })
-                        summary_df.to_excel(writer, sheet_name='Información', index=False)
-                        df.to_excel(writer, sheet_name='Asistencias', index=False)
-
-                        for sheet_name in writer.sheets:
-                            worksheet = writer.sheets[sheet_name]
-                            for column in worksheet.columns:
-                                max_length = 0
-                                column_letter = column[0].column_letter
-                                for cell in column:
-                                    try:
-                                        if len(str(cell.value)) > max_length:
-                                            max_length = len(str(cell.value))
-                                    except:
-                                        pass
-                                adjusted_width = min(max_length + 2, 50)
-                                worksheet.column_dimensions[column_letter].width = adjusted_width
+                    with LibroStream(filepath) as libro:
+                        info = libro.hoja('Información', ['Empleado', 'Cargo', 'Rol', 'Horario Entrada',
+                                                          'Horario Salida', 'Fecha'])
+                        info.agregar([nombre, employee_data[1], employee_data[2], he_eff, hs_eff,
+                                      fecha.strftime('%Y-%m-%d')], None)
+                        report_render.hoja_asistencias(libro, attendance_data)
 
                     files_generated.append(filepath)
                 except Exception as e:
@@ -322,41 +430,43 @@ class ReportGenerator:
         try:
             now = datetime.now()
             year = now.year
+            desde, hasta = rango_anio(year)
 
             # Obtener datos del empleado
-            if db_manager.is_online():
-                c = db_manager.pg_connection.cursor()
-                c.execute("""
-                    SELECT id, nombre_completo, cargo, rol, hora_entrada, hora_salida
-                    FROM empleados WHERE id = %s AND activo = TRUE
-                """, (empleado_id,))
-                emp = c.fetchone()
-                if not emp:
-                    return None
-                # Traer todo el año
-                c.execute("""
-                    SELECT fecha, hora_registro, tipo_movimiento, estado
-                    FROM registros_asistencia
-                    WHERE empleado_id = %s AND EXTRACT(YEAR FROM fecha) = %s
-                    ORDER BY fecha, hora_registro
-                """, (empleado_id, year))
-                rows = c.fetchall()
-            else:
-                c = db_manager.sqlite_connection.cursor()
-                c.execute("""
-                    SELECT id, nombre_completo, cargo, rol, hora_entrada, hora_salida
-                    FROM empleados_local WHERE id = ? AND activo = 1
-                """, (empleado_id,))
-                emp = c.fetchone()
-                if not emp:
-                    return None
-                c.execute("""
-                    SELECT fecha, hora_registro, tipo_movimiento, estado
-                    FROM registros_local
-                    WHERE empleado_id = ? AND substr(fecha,1,4) = ?
-                    ORDER BY fecha, hora_registro
-                """, (empleado_id, str(year)))
-                rows = c.fetchall()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    c = conn.cursor()
+                    c.execute("""
+                        SELECT id, nombre_completo, cargo, rol, hora_entrada, hora_salida
+                        FROM empleados WHERE id = %s AND activo = TRUE
+                    """, (empleado_id,))
+                    emp = c.fetchone()
+                    if not emp:
+                        return None
+                    # Traer todo el año
+                    c.execute("""
+                        SELECT fecha, hora_registro, tipo_movimiento, estado
+                        FROM registros_asistencia
+                        WHERE empleado_id = %s AND fecha >= %s AND fecha < %s
+                        ORDER BY fecha, hora_registro
+                    """, (empleado_id, desde, hasta))
+                    rows = c.fetchall()
+                else:
+                    c = db_manager.sqlite_connection.cursor()
+                    c.execute("""
+                        SELECT id, nombre_completo, cargo, rol, hora_entrada, hora_salida
+                        FROM empleados_local WHERE id = ? AND activo = 1
+                    """, (empleado_id,))
+                    emp = c.fetchone()
+                    if not emp:
+                        return None
+                    c.execute("""
+                        SELECT fecha, hora_registro, tipo_movimiento, estado
+                        FROM registros_local
+                        WHERE empleado_id = ? AND fecha >= ? AND fecha < ?
+                        ORDER BY fecha, hora_registro
+                    """, (empleado_id, desde, hasta))
+                    rows = c.fetchall()
 
             if not rows:
                 return None
@@ -431,29 +541,53 @@ class ReportGenerator:
             print(f"Error generando expediente completo: {e}")
             return None
     
-    def auto_generate_monthly_reports(self):
-        """Generar automáticamente reportes mensuales de todos los empleados"""
+    def auto_generate_monthly_reports(self, year=None, month=None, formato='both', workers=None, progreso=None):
+        """Generar los reportes mensuales de todos los empleados activos (por defecto, del mes anterior).
+        Una sola consulta trae el mes de todos; los archivos se generan en paralelo (REPORTES_WORKERS)
+        y se escribe un manifiesto con el resultado de cada archivo.
+        """
         try:
-            last_month = datetime.now().replace(day=1) - timedelta(days=1)
-            year = last_month.year
-            month = last_month.month
+            if year is None or month is None:
+                last_month = datetime.now().replace(day=1) - timedelta(days=1)
+                year, month = last_month.year, last_month.month
+            inicio = datetime.now()
             
-            # Obtener todos los empleados activos
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("SELECT id, nombre_completo FROM empleados WHERE activo = TRUE")
-                employees = cursor.fetchall()
-            else:
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("SELECT id, nombre_completo FROM empleados_local WHERE activo = 1")
-                employees = cursor.fetchall()
+            datos = self._get_month_data_all_employees(year, month)
+            # Horas trabajadas de todo el personal en un solo cálculo, repartidas por empleado
+            horas = worked_hours.calcular(
+                ((empleado_id,) + r for empleado_id, (_, attendance_data) in datos.items() for r in attendance_data),
+                db_manager.horarios.tabla)
+            horas_por_empleado = {empleado_id: df for empleado_id, df in horas.groupby('empleado_id')}
+            trabajos = [
+                {'empleado_id': empleado_id, 'employee_data': employee_data, 'attendance_data': attendance_data,
+                 'horas': horas_por_empleado.get(empleado_id),
+                 'year': year, 'month': month, 'formato': formato, 'directorio': self.employee_reports_dir}
+                for empleado_id, (employee_data, attendance_data) in datos.items()
+            ]
+            
+            def _progreso(hechos, total, resultados):
+                if progreso:
+                    progreso(hechos, total, resultados)
+                for r in resultados:
+                    if not r['ok']:
+                        print(f"Error generando {r['formato']} de {r['empleado']}: {r['error']}")
+                if hechos == total or hechos % 10 == 0:
+                    print(f"Reportes mensuales: {hechos}/{total} empleados")
             
-            generated_files = []
+            manifiesto = report_render.generar_lote(trabajos, workers=workers, progreso=_progreso)
+            generated_files = [m['archivo'] for m in manifiesto if m['ok']]
             
-            for empleado_id, nombre in employees:
-                files = self.generate_employee_report(empleado_id, year, month, 'both')
-                if files:
-                    generated_files.extend(files)
+            ruta_manifiesto = os.path.join(self.employee_reports_dir, f"manifiesto_reportes_{year}_{month:02d}.json")
+            with open(ruta_manifiesto, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'periodo': f"{year}-{month:02d}",
+                    'inicio': inicio.isoformat(),
+                    'fin': datetime.now().isoformat(),
+                    'empleados': len(trabajos),
+                    'generados': len(generated_files),
+                    'errores': sum(1 for m in manifiesto if not m['ok']),
+                    'archivos': manifiesto,
+                }, f, ensure_ascii=False, indent=2)
             
             print(f"Generados {len(generated_files)} archivos de reportes automáticos")
             return generated_files
@@ -462,34 +596,166 @@ class ReportGenerator:
             print(f"Error en generación automática: {e}")
             return []
     
-    def _get_daily_data(self, fecha):
-        """Obtener datos del día"""
-        try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
+    def _get_month_data_all_employees(self, year, month):
+        """{empleado_id: (employee_data, attendance_data)} de todos los empleados activos en una consulta.
+        Mismas tuplas que _get_employee_data; los empleados sin registros quedan con lista vacía.
+        """
+        desde, hasta = rango_mes(year, month)
+        with db_manager.pg_session() as conn:
+            if conn:
+                cursor = conn.cursor()
                 cursor.execute("""
-                    SELECT 
-                        e.id, e.nombre_completo, e.cargo, r.hora_registro, 
-                        r.tipo_movimiento, r.estado, u.nombre as ubicacion
-                    FROM registros_asistencia r
-                    JOIN empleados e ON r.empleado_id = e.id
-                    JOIN ubicaciones u ON r.ubicacion_id = u.id
-                    WHERE r.fecha = %s
-                    ORDER BY r.hora_registro
-                """, (fecha,))
-                return cursor.fetchall()
+                    SELECT e.id, e.nombre_completo, e.cargo, e.rol, e.hora_entrada, e.hora_salida,
+                           r.fecha, r.hora_registro, r.tipo_movimiento, r.estado
+                    FROM empleados e
+                    LEFT JOIN registros_asistencia r
+                      ON r.empleado_id = e.id AND r.fecha >= %s AND r.fecha < %s
+                    WHERE e.activo = TRUE
+                    ORDER BY e.id, r.fecha, r.hora_registro
+                """, (desde, hasta))
             else:
                 cursor = db_manager.sqlite_connection.cursor()
                 cursor.execute("""
-                    SELECT 
-                        e.id, e.nombre_completo, e.cargo, r.hora_registro,
-                        r.tipo_movimiento, r.estado, r.ubicacion_nombre
-                    FROM registros_local r
-                    JOIN empleados_local e ON r.empleado_id = e.id
-                    WHERE r.fecha = ?
-                    ORDER BY r.hora_registro
-                """, (fecha.isoformat(),))
-                return cursor.fetchall()
+                    SELECT e.id, e.nombre_completo, e.cargo, e.rol, e.hora_entrada, e.hora_salida,
+                           r.fecha, r.hora_registro, r.tipo_movimiento, r.estado
+                    FROM empleados_local e
+                    LEFT JOIN registros_local r
+                      ON r.empleado_id = e.id AND r.fecha >= ? AND r.fecha < ?
+                    WHERE e.activo = 1
+                    ORDER BY e.id, r.fecha, r.hora_registro
+                """, (desde, hasta))
+            filas = cursor.fetchall()
+        
+        por_empleado = {}
+        for row in filas:
+            empleado_id = row[0]
+            if empleado_id not in por_empleado:
+                por_empleado[empleado_id] = (tuple(row[1:6]), [])
+            if row[7] is not None:
+                por_empleado[empleado_id][1].append(tuple(row[6:10]))
+        return por_empleado
+    
+    def _get_registros_periodo(self, desde, hasta, empleado_id=None):
+        """Lecturas (empleado_id, fecha, hora_registro, tipo_movimiento, estado) de [desde, hasta)."""
+        filtro_pg = " AND empleado_id = %s" if empleado_id is not None else ""
+        filtro_local = " AND empleado_id = ?" if empleado_id is not None else ""
+        params = (desde, hasta) + ((empleado_id,) if empleado_id is not None else ())
+        with db_manager.pg_session() as conn:
+            if conn:
+                cursor = conn.cursor()
+                cursor.execute(f"""
+                    SELECT empleado_id, fecha, hora_registro, tipo_movimiento, estado
+                    FROM registros_asistencia
+                    WHERE fecha >= %s AND fecha < %s{filtro_pg}
+                """, params)
+            else:
+                cursor = db_manager.sqlite_connection.cursor()
+                cursor.execute(f"""
+                    SELECT empleado_id, fecha, hora_registro, tipo_movimiento, estado
+                    FROM registros_local
+                    WHERE fecha >= ? AND fecha < ?{filtro_local}
+                """, params)
+            return cursor.fetchall()
+    
+    def obtener_horas_trabajadas(self, desde, hasta, empleado_id=None):
+        """DataFrame de worked_hours (una fila por empleado y día) para [desde, hasta), contra el
+        horario efectivo de cada día. Vacío si no se pudieron leer los registros.
+        """
+        try:
+            return worked_hours.calcular(self._get_registros_periodo(desde, hasta, empleado_id),
+                                         db_manager.horarios.tabla)
+        except Exception as e:
+            print(f"Error calculando horas trabajadas: {e}")
+            return worked_hours.calcular([])
+    
+    def _huella_periodo(self, desde, hasta):
+        """Huella de los datos de [desde, hasta) para la caché de reportes, o None si no se pudo calcular.
+        Sale del resumen diario (una fila por empleado y día), las justificaciones locales, la firma
+        de la última sincronización de empleados y los horarios efectivos del periodo (las horas
+        trabajadas y la matriz dependen de ellos y se editan sólo en local); no lee registros_asistencia.
+        """
+        try:
+            sql_resumen = """
+                SELECT COUNT(*), COALESCE(SUM(registros), 0),
+                       md5(COALESCE(string_agg(
+                           empleado_id || '|' || fecha || '|' || registros || '|' ||
+                           COALESCE(primera_entrada::text, '') || '|' || COALESCE(estado_entrada, '') || '|' ||
+                           COALESCE(ultima_salida::text, '') || '|' || COALESCE(estado_salida, ''),
+                           ',' ORDER BY empleado_id, fecha), ''))
+                FROM {tabla} WHERE fecha >= {p} AND fecha < {p}
+            """
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute(sql_resumen.format(tabla='resumen_diario', p='%s'), (desde, hasta))
+                    resumen = ('pg',) + tuple(cursor.fetchone())
+                else:
+                    # SQLite no tiene md5: group_concat ordenado y hash en Python
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("""
+                        SELECT COUNT(*), COALESCE(SUM(registros), 0), group_concat(fila, ',')
+                        FROM (SELECT empleado_id || '|' || fecha || '|' || registros || '|' ||
+                                     COALESCE(primera_entrada, '') || '|' || COALESCE(estado_entrada, '') || '|' ||
+                                     COALESCE(ultima_salida, '') || '|' || COALESCE(estado_salida, '') AS fila,
+                                     registros
+                              FROM resumen_diario_local WHERE fecha >= ? AND fecha < ?
+                              ORDER BY empleado_id, fecha)
+                    """, (desde, hasta))
+                    n, total, filas = cursor.fetchone()
+                    resumen = ('local', n, total, hashlib.md5((filas or '').encode('utf-8')).hexdigest())
+            cursor = db_manager.sqlite_connection.cursor()
+            cursor.execute("""
+                SELECT COUNT(*), MAX(id), MAX(created_at) FROM justificaciones_local
+                WHERE fecha >= ? AND fecha < ?
+            """, (desde, hasta))
+            justificaciones = tuple(cursor.fetchone())
+            empleados = db_manager.leer_configuracion('EMPLEADOS_SYNC_FIRMA')
+            texto = repr((resumen, justificaciones, empleados, self._huella_horarios(desde, hasta)))
+            return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+        except Exception as e:
+            print(f"Aviso: no se pudo calcular la huella del periodo: {e}")
+            return None
+    
+    @staticmethod
+    def _huella_horarios(desde, hasta):
+        """Digest de las tablas de horario efectivo de cada día de [desde, hasta) y de las reglas de falta."""
+        from faltas import dias_descanso, minutos_tras_entrada
+        h = hashlib.sha256(repr((minutos_tras_entrada(), sorted(dias_descanso()))).encode('utf-8'))
+        dia, fin = date.fromisoformat(str(desde)[:10]), date.fromisoformat(str(hasta)[:10])
+        while dia < fin:
+            h.update(repr(sorted(db_manager.horarios.tabla(dia).items())).encode('utf-8'))
+            dia += timedelta(days=1)
+        return h.hexdigest()
+    
+    def _get_daily_data(self, fecha):
+        """Obtener datos del día"""
+        try:
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT 
+                            e.id, e.nombre_completo, e.cargo, r.hora_registro, 
+                            r.tipo_movimiento, r.estado, u.nombre as ubicacion
+                        FROM registros_asistencia r
+                        JOIN empleados e ON r.empleado_id = e.id
+                        JOIN ubicaciones u ON r.ubicacion_id = u.id
+                        WHERE r.fecha = %s
+                        ORDER BY r.hora_registro
+                    """, (fecha,))
+                    return cursor.fetchall()
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("""
+                        SELECT 
+                            e.id, e.nombre_completo, e.cargo, r.hora_registro,
+                            r.tipo_movimiento, r.estado, r.ubicacion_nombre
+                        FROM registros_local r
+                        JOIN empleados_local e ON r.empleado_id = e.id
+                        WHERE r.fecha = ?
+                        ORDER BY r.hora_registro
+                    """, (fecha.isoformat(),))
+                    return cursor.fetchall()
                 
         except Exception as e:
             print(f"Error obteniendo datos diarios: {e}")
@@ -498,41 +764,33 @@ class ReportGenerator:
     def _get_monthly_data(self, year, month):
         """Obtener datos del mes"""
         try:
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT 
-                        e.id, e.nombre_completo, r.fecha,
-                        MIN(CASE WHEN r.tipo_movimiento = 'ENTRADA' THEN r.hora_registro END) as primera_entrada,
-                        MAX(CASE WHEN r.tipo_movimiento = 'SALIDA' THEN r.hora_registro END) as ultima_salida,
-                        MIN(CASE WHEN r.tipo_movimiento = 'ENTRADA' THEN r.estado END) as estado_entrada,
-                        MAX(CASE WHEN r.tipo_movimiento = 'SALIDA' THEN r.estado END) as estado_salida
-                    FROM registros_asistencia r
-                    JOIN empleados e ON r.empleado_id = e.id
-                    WHERE EXTRACT(YEAR FROM r.fecha) = %s 
-                    AND EXTRACT(MONTH FROM r.fecha) = %s
-                    GROUP BY e.id, e.nombre_completo, r.fecha
-                    ORDER BY r.fecha, e.nombre_completo
-                """, (year, month))
-                return cursor.fetchall()
-            else:
-                # Para SQLite, necesitamos una consulta diferente
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("""
-                    SELECT 
-                        e.id, e.nombre_completo, r.fecha,
-                        MIN(CASE WHEN r.tipo_movimiento = 'ENTRADA' THEN r.hora_registro END) as primera_entrada,
-                        MAX(CASE WHEN r.tipo_movimiento = 'SALIDA' THEN r.hora_registro END) as ultima_salida,
-                        MIN(CASE WHEN r.tipo_movimiento = 'ENTRADA' THEN r.estado END) as estado_entrada,
-                        MAX(CASE WHEN r.tipo_movimiento = 'SALIDA' THEN r.estado END) as estado_salida
-                    FROM registros_local r
-                    JOIN empleados_local e ON r.empleado_id = e.id
-                    WHERE substr(r.fecha, 1, 4) = ? 
-                    AND substr(r.fecha, 6, 2) = ?
-                    GROUP BY e.id, e.nombre_completo, r.fecha
-                    ORDER BY r.fecha, e.nombre_completo
-                """, (str(year), f"{month:02d}"))
-                return cursor.fetchall()
+            desde, hasta = rango_mes(year, month)
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    # Resumen diario precalculado: una fila por empleado y día
+                    cursor.execute("""
+                        SELECT 
+                            e.id, e.nombre_completo, s.fecha,
+                            s.primera_entrada, s.ultima_salida, s.estado_entrada, s.estado_salida
+                        FROM resumen_diario s
+                        JOIN empleados e ON s.empleado_id = e.id
+                        WHERE s.fecha >= %s AND s.fecha < %s
+                        ORDER BY s.fecha, e.nombre_completo
+                    """, (desde, hasta))
+                    return cursor.fetchall()
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("""
+                        SELECT 
+                            e.id, e.nombre_completo, s.fecha,
+                            s.primera_entrada, s.ultima_salida, s.estado_entrada, s.estado_salida
+                        FROM resumen_diario_local s
+                        JOIN empleados_local e ON s.empleado_id = e.id
+                        WHERE s.fecha >= ? AND s.fecha < ?
+                        ORDER BY s.fecha, e.nombre_completo
+                    """, (desde, hasta))
+                    return cursor.fetchall()
                 
         except Exception as e:
             print(f"Error obteniendo datos mensuales: {e}")
@@ -541,42 +799,42 @@ class ReportGenerator:
     def _get_employee_data(self, empleado_id, year, month):
         """Obtener datos específicos de un empleado"""
         try:
+            desde, hasta = rango_mes(year, month)
             # Datos del empleado
-            if db_manager.is_online():
-                cursor = db_manager.pg_connection.cursor()
-                cursor.execute("""
-                    SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
-                    FROM empleados WHERE id = %s AND activo = TRUE
-                """, (empleado_id,))
-                employee_data = cursor.fetchone()
+            with db_manager.pg_session() as conn:
+                if conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
+                        FROM empleados WHERE id = %s AND activo = TRUE
+                    """, (empleado_id,))
+                    employee_data = cursor.fetchone()
                 
-                # Datos de asistencia
-                cursor.execute("""
-                    SELECT fecha, hora_registro, tipo_movimiento, estado
-                    FROM registros_asistencia 
-                    WHERE empleado_id = %s 
-                    AND EXTRACT(YEAR FROM fecha) = %s 
-                    AND EXTRACT(MONTH FROM fecha) = %s
-                    ORDER BY fecha, hora_registro
-                """, (empleado_id, year, month))
-                attendance_data = cursor.fetchall()
-            else:
-                cursor = db_manager.sqlite_connection.cursor()
-                cursor.execute("""
-                    SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
-                    FROM empleados_local WHERE id = ? AND activo = 1
-                """, (empleado_id,))
-                employee_data = cursor.fetchone()
+                    # Datos de asistencia
+                    cursor.execute("""
+                        SELECT fecha, hora_registro, tipo_movimiento, estado
+                        FROM registros_asistencia 
+                        WHERE empleado_id = %s 
+                        AND fecha >= %s AND fecha < %s
+                        ORDER BY fecha, hora_registro
+                    """, (empleado_id, desde, hasta))
+                    attendance_data = cursor.fetchall()
+                else:
+                    cursor = db_manager.sqlite_connection.cursor()
+                    cursor.execute("""
+                        SELECT nombre_completo, cargo, rol, hora_entrada, hora_salida
+                        FROM empleados_local WHERE id = ? AND activo = 1
+                    """, (empleado_id,))
+                    employee_data = cursor.fetchone()
                 
-                cursor.execute("""
-                    SELECT fecha, hora_registro, tipo_movimiento, estado
-                    FROM registros_local 
-                    WHERE empleado_id = ? 
-                    AND substr(fecha, 1, 4) = ? 
-                    AND substr(fecha, 6, 2) = ?
-                    ORDER BY fecha, hora_registro
-                """, (empleado_id, str(year), f"{month:02d}"))
-                attendance_data = cursor.fetchall()
+                    cursor.execute("""
+                        SELECT fecha, hora_registro, tipo_movimiento, estado
+                        FROM registros_local 
+                        WHERE empleado_id = ? 
+                        AND fecha >= ? AND fecha < ?
+                        ORDER BY fecha, hora_registro
+                    """, (empleado_id, desde, hasta))
+                    attendance_data = cursor.fetchall()
             
             return employee_data, attendance_data
             
@@ -585,80 +843,22 @@ class ReportGenerator:
             return None, []
     
     def _generate_daily_excel(self, data, fecha):
-        """Generar reporte diario en Excel"""
+        """Generar reporte diario en Excel (por flujo, filas coloreadas por estado)"""
         try:
-            # data esperado: (empleado_id, nombre, cargo, hora, mov, estado, ubicacion)
-            df = pd.DataFrame(data, columns=[
-                'EmpleadoID','Empleado', 'Cargo', 'Hora', 'Movimiento', 'Estado', 'Ubicación'
-            ])
-            # Formatear hora
-            df['Hora'] = pd.to_datetime(df['Hora']).dt.strftime('%H:%M:%S')
-            
             filename = f"reporte_diario_{fecha.strftime('%Y%m%d')}.xlsx"
             filepath = os.path.join(self.reports_dir, filename)
             
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Asistencia Diaria', index=False)
-
-                # Formatear el archivo (centrado y colores por estado)
-                from openpyxl.styles import PatternFill, Alignment, Font
-                workbook = writer.book
-                worksheet = writer.sheets['Asistencia Diaria']
-
-                # Ocultar columna EmpleadoID
-                worksheet.column_dimensions['A'].hidden = True
-
-                # Ajustar ancho de columnas y centrar
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except Exception:
-                            pass
-                        # Centrar todas las celdas
-                        cell.alignment = Alignment(horizontal='center', vertical='center')
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-
-                # Colorear filas por Estado (A_TIEMPO/TEMPRANO=verde, RETARDO/TARDE=amarillo, FALTA/NO ASISTIÓ=rojo)
-                # Considerar justificaciones del día
-                just_map = db_manager.obtener_justificaciones_por_fecha(fecha.isoformat())
-                state_col_idx = None
-                id_col_idx = None
-                # Detectar encabezados
-                headers = [c.value for c in next(worksheet.iter_rows(min_row=1, max_row=1))]
-                for idx, h in enumerate(headers, start=1):
-                    if str(h).upper() == 'ESTADO':
-                        state_col_idx = idx
-                    if str(h).upper() == 'EMPLEADOID':
-                        id_col_idx = idx
-                if state_col_idx and id_col_idx:
-                    for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-                        emp_id = row[id_col_idx-1].value
-                        estado_val = str(row[state_col_idx-1].value or '').upper()
-                        # Si RETARDO justificado => verde y añadir asterisco visual en la celda
-                        if (int(emp_id) if emp_id is not None else None, 'RETARDO') in just_map and estado_val == 'RETARDO':
-                            row[state_col_idx-1].value = 'RETARDO*'
-                            fill = PatternFill(start_color='C8E6C9', end_color='C8E6C9', fill_type='solid')
-                            for cell in row:
-                                cell.fill = fill
-                            continue
-                        # Otros justificados -> neutral, sin color
-                        if (int(emp_id) if emp_id is not None else None, estado_val) in just_map:
-                            continue
-                        fill = None
-                        if estado_val in ('A_TIEMPO', 'TEMPRANO'):
-                            fill = PatternFill(start_color='C8E6C9', end_color='C8E6C9', fill_type='solid')
-                        elif estado_val in ('RETARDO', 'TARDE'):
-                            fill = PatternFill(start_color='FFF59D', end_color='FFF59D', fill_type='solid')
-                        elif estado_val in ('FALTA', 'NO ASISTIO', 'NO_ASISTIO'):
-                            fill = PatternFill(start_color='FFCDD2', end_color='FFCDD2', fill_type='solid')
-                        if fill:
-                            for cell in row:
-                                cell.fill = fill
+            # Considerar justificaciones del día
+            just_map = db_manager.obtener_justificaciones_por_fecha(fecha.isoformat())
+            with LibroStream(filepath) as libro:
+                # data esperado: (empleado_id, nombre, cargo, hora, mov, estado, ubicacion); EmpleadoID oculto
+                hoja = libro.hoja('Asistencia Diaria', [
+                    'EmpleadoID', 'Empleado', 'Cargo', 'Hora', 'Movimiento', 'Estado', 'Ubicación'
+                ], ocultas=[0])
+                for emp_id, nombre, cargo, hora, mov, estado, ubicacion in data:
+                    # Colorear la fila por Estado (RETARDO justificado => verde con asterisco)
+                    estado_txt, estilo = self._celda_estado(emp_id, estado, just_map)
+                    hoja.agregar([emp_id, nombre, cargo, texto_hora(hora), mov, estado_txt, ubicacion], estilo)
             
             print(f"Reporte Excel generado: {filepath}")
             return filepath
@@ -667,6 +867,22 @@ class ReportGenerator:
             print(f"Error generando Excel diario: {e}")
             return None
     
+    @staticmethod
+    def _celda_estado(emp_id, estado, just_map):
+        """(texto, estilo) de un estado: RETARDO justificado => 'RETARDO*' en verde,
+        otros justificados sin color, el resto por estado.
+        """
+        estado_val = str(estado or '').upper()
+        try:
+            emp_id = int(emp_id) if emp_id is not None else None
+        except (TypeError, ValueError):
+            pass
+        if estado_val == 'RETARDO' and (emp_id, 'RETARDO') in just_map:
+            return 'RETARDO*', 'verde'
+        if (emp_id, estado_val) in just_map:
+            return estado, 'centrado'
+        return estado, estilo_estado(estado_val)
+    
     def _generate_daily_pdf(self, data, fecha):
         """Generar reporte diario en PDF"""
         try:
@@ -754,52 +970,11 @@ class ReportGenerator:
             print(f"Error generando PDF diario: {e}")
             return None
     
-    def _generate_employee_excel(self, employee_data, attendance_data, year, month):
+    def _generate_employee_excel(self, employee_data, attendance_data, year, month, horas=None):
         """Generar reporte de empleado en Excel"""
         try:
-            nombre = employee_data[0]
-            filename = f"asistencia_{nombre.replace(' ', '_')}_{year}_{month:02d}.xlsx"
-            filepath = os.path.join(self.employee_reports_dir, filename)
-            
-            # Crear DataFrame
-            df = pd.DataFrame(attendance_data, columns=[
-                'Fecha', 'Hora', 'Movimiento', 'Estado'
-            ])
-            
-            # Formatear fechas y horas
-            df['Hora'] = pd.to_datetime(df['Hora']).dt.strftime('%H:%M:%S')
-            
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                # Hoja de resumen
-                summary_data = {
-                    'Empleado': [nombre],
-                    'Cargo': [employee_data[1]],
-                    'Rol': [employee_data[2]],
-                    'Horario Entrada': [str(employee_data[3])[:5]],
-                    'Horario Salida': [str(employee_data[4])[:5]],
-                    'Mes/Año': [f"{month:02d}/{year}"]
-                }
-                summary_df = pd.DataFrame(summary_data)
-                summary_df.to_excel(writer, sheet_name='Información', index=False)
-                
-                # Hoja de asistencia
-                df.to_excel(writer, sheet_name='Asistencias', index=False)
-                
-                # Formatear
-                for sheet_name in writer.sheets:
-                    worksheet = writer.sheets[sheet_name]
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = min(max_length + 2, 50)
-                        worksheet.column_dimensions[column_letter].width = adjusted_width
-            
+            filepath = report_render.excel_empleado(self.employee_reports_dir, employee_data, attendance_data,
+                                                    year, month, horas)
             print(f"Reporte empleado Excel generado: {filepath}")
             return filepath
             
@@ -807,89 +982,11 @@ class ReportGenerator:
             print(f"Error generando Excel empleado: {e}")
             return None
     
-    def _generate_employee_pdf(self, employee_data, attendance_data, year, month):
+    def _generate_employee_pdf(self, employee_data, attendance_data, year, month, horas=None):
         """Generar reporte de empleado en PDF"""
         try:
-            nombre = employee_data[0]
-            filename = f"asistencia_{nombre.replace(' ', '_')}_{year}_{month:02d}.pdf"
-            filepath = os.path.join(self.employee_reports_dir, filename)
-            
-            doc = SimpleDocTemplate(filepath, pagesize=A4)
-            styles = getSampleStyleSheet()
-            story = []
-            
-            # Título
-            month_name = calendar.month_name[month]
-            title = Paragraph(f"REPORTE DE ASISTENCIA - {nombre.upper()}", styles['Title'])
-            subtitle = Paragraph(f"{month_name} {year}", styles['Heading2'])
-            
-            story.append(title)
-            story.append(subtitle)
-            story.append(Spacer(1, 12))
-            
-            # Información del empleado
-            info_data = [
-                ['Empleado:', nombre],
-                ['Cargo:', employee_data[1]],
-                ['Rol:', employee_data[2]],
-                ['Horario:', f"{str(employee_data[3])[:5]} - {str(employee_data[4])[:5]}"]
-            ]
-            
-            info_table = Table(info_data)
-            info_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            
-            story.append(info_table)
-            story.append(Spacer(1, 20))
-            
-            # Tabla de asistencias con colores por estado
-            if attendance_data:
-                table_data = [['Fecha', 'Hora', 'Movimiento', 'Estado']]
-                row_colors = []
-
-                for row in attendance_data:
-                    if isinstance(row[1], str):
-                        hora_dt = datetime.fromisoformat(row[1])
-                    else:
-                        hora_dt = row[1]
-                    hora_str = hora_dt.strftime('%H:%M:%S')
-                    est = (row[3] or '').upper()
-                    table_data.append([str(row[0]), hora_str, row[2], est])
-                    # Color: A_TIEMPO/TEMPRANO=verde, RETARDO/TARDE=amarillo, FALTA/NO ASISTIÓ=rojo
-                    if est in ('A_TIEMPO', 'TEMPRANO'):
-                        row_colors.append(colors.lightgreen)
-                    elif est in ('RETARDO', 'TARDE'):
-                        row_colors.append(colors.yellow)
-                    elif est in ('FALTA', 'NO ASISTIO', 'NO_ASISTIO'):
-                        row_colors.append(colors.salmon)
-                    else:
-                        row_colors.append(colors.beige)
-                
-                attendance_table = Table(table_data)
-                style_cmds = [
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]
-                # Colores por fila (saltando encabezado)
-                for ridx, bg in enumerate(row_colors, start=1):
-                    style_cmds.append(('BACKGROUND', (0, ridx), (-1, ridx), bg))
-                attendance_table.setStyle(TableStyle(style_cmds))
-                
-                story.append(attendance_table)
-            else:
-                story.append(Paragraph("No hay registros de asistencia para este período.", styles['Normal']))
-            
-            doc.build(story)
-            
+            filepath = report_render.pdf_empleado(self.employee_reports_dir, employee_data, attendance_data,
+                                                  year, month, horas)
             print(f"Reporte empleado PDF generado: {filepath}")
             return filepath
             
@@ -897,78 +994,43 @@ class ReportGenerator:
             print(f"Error generando PDF empleado: {e}")
             return None
 
-    def _generate_monthly_excel(self, data, year, month):
-        """Generar reporte mensual en Excel con colores por estado y centrado."""
+    @staticmethod
+    def _horas_fila(horas, emp_id, fecha_iso):
+        """Horas trabajadas, retardo, salida temprana y extra de un empleado-día para los reportes."""
+        h = (horas or {}).get((emp_id, fecha_iso))
+        if h is None:
+            return ['', '', '', '']
+        return [worked_hours.formato_horas(h.minutos_trabajados), int(h.minutos_retardo),
+                int(h.minutos_salida_temprana), worked_hours.formato_horas(h.minutos_extra)]
+    
+    def _generate_monthly_excel(self, data, year, month, horas=None):
+        """Generar reporte mensual en Excel con colores por estado y centrado.
+        horas: {(empleado_id, fecha): fila de worked_hours} para las columnas de tiempo trabajado.
+        """
         try:
-            # data: (empleado_id, nombre, fecha, primera_entrada, ultima_salida, estado_entrada, estado_salida)
-            df = pd.DataFrame(data, columns=[
-                'EmpleadoID', 'Empleado', 'Fecha', 'Primera Entrada', 'Última Salida', 'Estado Entrada', 'Estado Salida'
-            ])
-
             filename = f"reporte_mensual_{year}_{month:02d}.xlsx"
             filepath = os.path.join(self.reports_dir, filename)
 
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Asistencia Mensual', index=False)
-
-                from openpyxl.styles import PatternFill, Alignment
-                ws = writer.sheets['Asistencia Mensual']
-
-                # Ocultar ID
-                ws.column_dimensions['A'].hidden = True
-
-                # Ajuste ancho y centrado
-                for column in ws.columns:
-                    max_length = 0
-                    letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            max_length = max(max_length, len(str(cell.value)))
-                        except Exception:
-                            pass
-                        cell.alignment = Alignment(horizontal='center', vertical='center')
-                    ws.column_dimensions[letter].width = min(max_length + 2, 50)
-
-                # Aplicar colores a columnas de estados si no hay justificación
-                headers = [c.value for c in next(ws.iter_rows(min_row=1, max_row=1))]
-                emp_idx = headers.index('EmpleadoID') + 1
-                fecha_idx = headers.index('Fecha') + 1
-                ee_idx = headers.index('Estado Entrada') + 1
-                es_idx = headers.index('Estado Salida') + 1
-
-                for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-                    emp_id = row[emp_idx-1].value
-                    fecha_val = row[fecha_idx-1].value
-                    try:
-                        fecha_iso = pd.to_datetime(fecha_val).date().isoformat()
-                    except Exception:
-                        fecha_iso = str(fecha_val)
-                    just_map = db_manager.obtener_justificaciones_por_fecha(fecha_iso)
-                    est_e = str(row[ee_idx-1].value or '').upper()
-                    est_s = str(row[es_idx-1].value or '').upper()
-                    def fill_for(state):
-                        if state in ('A_TIEMPO', 'TEMPRANO'):
-                            return PatternFill(start_color='C8E6C9', end_color='C8E6C9', fill_type='solid')
-                        if state in ('RETARDO', 'TARDE'):
-                            return PatternFill(start_color='FFF59D', end_color='FFF59D', fill_type='solid')
-                        if state in ('FALTA', 'NO ASISTIO', 'NO_ASISTIO'):
-                            return PatternFill(start_color='FFCDD2', end_color='FFCDD2', fill_type='solid')
-                        return None
-                    # RETARDO justificado: asterisco + verde
-                    if (int(emp_id), 'RETARDO') in just_map and est_e == 'RETARDO':
-                        row[ee_idx-1].value = 'RETARDO*'
-                        row[ee_idx-1].fill = PatternFill(start_color='C8E6C9', end_color='C8E6C9', fill_type='solid')
-                    elif (int(emp_id), est_e) not in just_map:
-                        f = fill_for(est_e)
-                        if f:
-                            row[ee_idx-1].fill = f
-                    if (int(emp_id), 'RETARDO') in just_map and est_s == 'RETARDO':
-                        row[es_idx-1].value = 'RETARDO*'
-                        row[es_idx-1].fill = PatternFill(start_color='C8E6C9', end_color='C8E6C9', fill_type='solid')
-                    elif (int(emp_id), est_s) not in just_map:
-                        f = fill_for(est_s)
-                        if f:
-                            row[es_idx-1].fill = f
+            just_por_fecha = {}
+            with LibroStream(filepath) as libro:
+                hoja = libro.hoja('Asistencia Mensual', [
+                    'EmpleadoID', 'Empleado', 'Fecha', 'Primera Entrada', 'Última Salida', 'Estado Entrada', 'Estado Salida',
+                    'Horas Trabajadas', 'Retardo (min)', 'Salida Temprana (min)', 'Horas Extra'
+                ], ocultas=[0])
+                # data: (empleado_id, nombre, fecha, primera_entrada, ultima_salida, estado_entrada, estado_salida)
+                for emp_id, nombre, fecha, entrada, salida, est_e, est_s in data:
+                    fecha_iso = texto_fecha(fecha)
+                    # Justificaciones leídas una vez por día
+                    just_map = just_por_fecha.get(fecha_iso)
+                    if just_map is None:
+                        just_map = just_por_fecha[fecha_iso] = db_manager.obtener_justificaciones_por_fecha(fecha_iso)
+                    # Colores sólo en las columnas de estado
+                    est_e, estilo_e = self._celda_estado(emp_id, est_e, just_map)
+                    est_s, estilo_s = self._celda_estado(emp_id, est_s, just_map)
+                    hoja.agregar(
+                        [emp_id, nombre, fecha_iso, entrada, salida, est_e, est_s]
+                        + self._horas_fila(horas, emp_id, fecha_iso),
+                        ['centrado'] * 5 + [estilo_e, estilo_s] + ['centrado'] * 4)
 
             print(f"Reporte mensual Excel generado: {filepath}")
             return filepath
@@ -976,13 +1038,13 @@ class ReportGenerator:
             print(f"Error generando Excel mensual: {e}")
             return None
 
-    def _generate_monthly_pdf(self, data, year, month):
+    def _generate_monthly_pdf(self, data, year, month, horas=None):
         """Generar reporte mensual en PDF con colores por estado y centrado."""
         try:
             filename = f"reporte_mensual_{year}_{month:02d}.pdf"
             filepath = os.path.join(self.reports_dir, filename)
 
-            doc = SimpleDocTemplate(filepath, pagesize=A4)
+            doc = SimpleDocTemplate(filepath, pagesize=landscape(A4))
             styles = getSampleStyleSheet()
             story = []
 
@@ -991,7 +1053,8 @@ class ReportGenerator:
             story.append(title)
             story.append(Spacer(1, 12))
 
-            table_data = [['Empleado', 'Fecha', 'Primera Entrada', 'Última Salida', 'Estado Entrada', 'Estado Salida']]
+            table_data = [['Empleado', 'Fecha', 'Primera Entrada', 'Última Salida', 'Estado Entrada', 'Estado Salida',
+                           'Horas', 'Ret. min', 'Temp. min', 'Extra']]
             cell_bg_cmds = []
 
             for idx, row in enumerate(data, start=1):
@@ -1014,7 +1077,7 @@ class ReportGenerator:
                     str(us)[:19] if us else '',
                     ee_show,
                     es_show
-                ])
+                ] + self._horas_fila(horas, emp_id, fecha_iso))
                 # Justificaciones por fecha
                 # ya obtenido arriba
                 # Calcular colores para columnas 4 y 5 (base 0)
@@ -0,0 +1,334 @@
+"""
+Generación de archivos de reporte por empleado, sin acceso a la base de datos.
+- excel_empleado / pdf_empleado reciben los datos ya consultados y sólo escriben el archivo;
+  por eso pueden correr en otros procesos (este módulo no importa database_manager).
+- generar_lote reparte los trabajos en un ProcessPoolExecutor (REPORTES_WORKERS procesos,
+  por defecto la mitad de los núcleos para no acaparar el kiosco), informa el avance y
+  retorna una entrada de manifiesto por archivo (ok/error, segundos).
+- excel_matriz / pdf_matriz escriben la matriz mensual de asistencia (attendance_matrix).
+- Las horas trabajadas (worked_hours) llegan ya calculadas en el trabajo ('horas'), porque el
+  horario efectivo sale de la base de datos.
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Iterable
+import calendar
+import os
+import time
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from excel_stream import LibroStream, texto_fecha, texto_hora
+from worked_hours import formato_horas
+
+
+def workers_por_defecto() -> int:
+    try:
+        valor = int(os.getenv('REPORTES_WORKERS', '0'))
+    except ValueError:
+        valor = 0
+    if valor > 0:
+        return valor
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _nombre_archivo(nombre: str, year: int, month: int, extension: str) -> str:
+    return f"asistencia_{nombre.replace(' ', '_')}_{year}_{month:02d}.{extension}"
+
+
+def hoja_asistencias(libro: LibroStream, attendance_data):
+    """Hoja 'Asistencias' (Fecha, Hora, Movimiento, Estado) escrita por flujo."""
+    hoja = libro.hoja('Asistencias', ['Fecha', 'Hora', 'Movimiento', 'Estado'])
+    for f, h, mov, est in attendance_data:
+        hoja.agregar([texto_fecha(f), texto_hora(h), mov, est], None)
+    return hoja
+
+
+# Tabla de horas trabajadas por día (worked_hours.calcular de un empleado)
+ENCABEZADOS_HORAS = ['Fecha', 'Entrada', 'Salida', 'Intervalos', 'Sin salida', 'Trabajadas',
+                     'Programadas', 'Retardo (min)', 'Salida temprana (min)', 'Extra']
+
+
+def filas_horas(horas) -> tuple[list[list], list]:
+    """Filas por día y fila de totales de la tabla de horas."""
+    filas = [[h.fecha, h.primera_entrada, h.ultima_salida, int(h.intervalos), int(h.sin_salida),
+              formato_horas(h.minutos_trabajados), formato_horas(h.minutos_programados),
+              int(h.minutos_retardo), int(h.minutos_salida_temprana), formato_horas(h.minutos_extra)]
+             for h in horas.itertuples(index=False)]
+    total = ['Total', '', '', int(horas['intervalos'].sum()), int((horas['sin_salida'] > 0).sum()),
+             formato_horas(horas['minutos_trabajados'].sum()), formato_horas(horas['minutos_programados'].sum()),
+             int(horas['minutos_retardo'].sum()), int(horas['minutos_salida_temprana'].sum()),
+             formato_horas(horas['minutos_extra'].sum())]
+    return filas, total
+
+
+def excel_empleado(directorio: str, employee_data, attendance_data, year: int, month: int,
+                   horas=None) -> str:
+    """Reporte mensual de un empleado en Excel. employee_data: (nombre, cargo, rol, entrada, salida).
+    horas: DataFrame de worked_hours del empleado en el mes (hoja 'Horas'), opcional.
+    """
+    nombre = employee_data[0]
+    filepath = os.path.join(directorio, _nombre_archivo(nombre, year, month, 'xlsx'))
+    with LibroStream(filepath) as libro:
+        # Hoja de resumen
+        info = libro.hoja('Información', ['Empleado', 'Cargo', 'Rol', 'Horario Entrada',
+                                          'Horario Salida', 'Mes/Año'])
+        info.agregar([nombre, employee_data[1], employee_data[2], str(employee_data[3])[:5],
+                      str(employee_data[4])[:5], f"{month:02d}/{year}"], None)
+        # Hoja de asistencia
+        hoja_asistencias(libro, attendance_data)
+        # Hoja de horas trabajadas
+        if horas is not None and not horas.empty:
+            hoja = libro.hoja('Horas', ENCABEZADOS_HORAS)
+            filas, total = filas_horas(horas)
+            for fila in filas:
+                hoja.agregar(fila)
+            hoja.agregar(total, 'encabezado')
+    return filepath
+
+
+def pdf_empleado(directorio: str, employee_data, attendance_data, year: int, month: int,
+                 horas=None) -> str:
+    """Reporte mensual de un empleado en PDF con colores por estado (y horas trabajadas si se dan)."""
+    nombre = employee_data[0]
+    filepath = os.path.join(directorio, _nombre_archivo(nombre, year, month, 'pdf'))
+
+    doc = SimpleDocTemplate(filepath, pagesize=A4)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Título
+    month_name = calendar.month_name[month]
+    story.append(Paragraph(f"REPORTE DE ASISTENCIA - {nombre.upper()}", styles['Title']))
+    story.append(Paragraph(f"{month_name} {year}", styles['Heading2']))
+    story.append(Spacer(1, 12))
+
+    # Información del empleado
+    info_data = [
+        ['Empleado:', nombre],
+        ['Cargo:', employee_data[1]],
+        ['Rol:', employee_data[2]],
+        ['Horario:', f"{str(employee_data[3])[:5]} - {str(employee_data[4])[:5]}"]
+    ]
+    info_table = Table(info_data)
+    info_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story.append(info_table)
+    story.append(Spacer(1, 20))
+
+    # Tabla de asistencias con colores por estado
+    if attendance_data:
+        table_data = [['Fecha', 'Hora', 'Movimiento', 'Estado']]
+        row_colors = []
+        for row in attendance_data:
+            hora_dt = datetime.fromisoformat(row[1]) if isinstance(row[1], str) else row[1]
+            est = (row[3] or '').upper()
+            table_data.append([str(row[0]), hora_dt.strftime('%H:%M:%S'), row[2], est])
+            # Color: A_TIEMPO/TEMPRANO=verde, RETARDO/TARDE=amarillo, FALTA/NO ASISTIÓ=rojo
+            if est in ('A_TIEMPO', 'TEMPRANO'):
+                row_colors.append(colors.lightgreen)
+            elif est in ('RETARDO', 'TARDE'):
+                row_colors.append(colors.yellow)
+            elif est in ('FALTA', 'NO ASISTIO', 'NO_ASISTIO'):
+                row_colors.append(colors.salmon)
+            else:
+                row_colors.append(colors.beige)
+
+        attendance_table = Table(table_data)
+        style_cmds = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]
+        # Colores por fila (saltando encabezado)
+        for ridx, bg in enumerate(row_colors, start=1):
+            style_cmds.append(('BACKGROUND', (0, ridx), (-1, ridx), bg))
+        attendance_table.setStyle(TableStyle(style_cmds))
+        story.append(attendance_table)
+    else:
+        story.append(Paragraph("No hay registros de asistencia para este período.", styles['Normal']))
+
+    # Horas trabajadas por día
+    if horas is not None and not horas.empty:
+        filas, total = filas_horas(horas)
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Horas trabajadas", styles['Heading2']))
+        encabezados = ['Fecha', 'Entrada', 'Salida', 'Int.', 'Sin sal.', 'Trab.', 'Prog.',
+                       'Ret. min', 'Temp. min', 'Extra']
+        horas_table = Table([encabezados] + filas + [total], repeatRows=1)
+        horas_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]))
+        story.append(horas_table)
+
+    doc.build(story)
+    return filepath
+
+
+# Matriz mensual: estilo de Excel y color de PDF por clase de celda
+_ESTILO_MATRIZ = {'A_TIEMPO': 'verde', 'RETARDO': 'amarillo', 'TEMPRANO': 'amarillo', 'FALTA': 'rojo'}
+_COLOR_MATRIZ = {'A_TIEMPO': colors.lightgreen, 'RETARDO': colors.yellow, 'TEMPRANO': colors.yellow,
+                 'FALTA': colors.salmon, 'DESCANSO': colors.lightgrey}
+
+
+def _matriz_filas(matriz):
+    """(encabezados, filas [(empleado_id, nombre, clases_por_dia, totales)], filas de totales por día)."""
+    from attendance_matrix import TOTALES_EMPLEADO
+    dias = [int(d) for d in matriz.estados.columns]
+    encabezados = ['EmpleadoID', 'Empleado'] + [str(d) for d in dias] + [e for _, e in TOTALES_EMPLEADO]
+    estados = matriz.estados.to_numpy()
+    totales = matriz.por_empleado.to_numpy()
+    filas = [(emp_id, nombre, estados[i], totales[i].tolist())
+             for i, (emp_id, nombre) in enumerate(matriz.empleados['nombre'].items())]
+    por_dia = [(etiqueta, matriz.por_dia.loc[etiqueta].tolist()) for etiqueta in matriz.por_dia.index]
+    return encabezados, filas, por_dia
+
+
+def excel_matriz(directorio: str, matriz) -> str:
+    """Matriz mensual (empleados × días) en Excel, con leyenda."""
+    from attendance_matrix import CODIGOS, LEYENDA
+    filepath = os.path.join(directorio, f"matriz_asistencia_{matriz.year}_{matriz.month:02d}.xlsx")
+    encabezados, filas, por_dia = _matriz_filas(matriz)
+    n_totales = len(encabezados) - 2 - matriz.estados.shape[1]
+    with LibroStream(filepath) as libro:
+        hoja = libro.hoja('Matriz', encabezados, ocultas=[0])
+        for emp_id, nombre, clases, totales in filas:
+            hoja.agregar([emp_id, nombre] + [CODIGOS.get(c, c) for c in clases] + totales,
+                         [None, None] + [_ESTILO_MATRIZ.get(c, 'centrado') for c in clases] + ['centrado'] * n_totales)
+        for etiqueta, valores in por_dia:
+            hoja.agregar(['', etiqueta] + valores + [''] * n_totales, 'encabezado')
+        leyenda = libro.hoja('Leyenda', ['Código', 'Significado'])
+        for clase, texto in LEYENDA.items():
+            leyenda.agregar([CODIGOS[clase], texto], [_ESTILO_MATRIZ.get(clase, 'centrado'), None])
+    return filepath
+
+
+def pdf_matriz(directorio: str, matriz) -> str:
+    """Matriz mensual (empleados × días) en PDF horizontal."""
+    from attendance_matrix import CODIGOS, LEYENDA
+    filepath = os.path.join(directorio, f"matriz_asistencia_{matriz.year}_{matriz.month:02d}.pdf")
+    encabezados, filas, por_dia = _matriz_filas(matriz)
+    n_dias = matriz.estados.shape[1]
+
+    doc = SimpleDocTemplate(filepath, pagesize=landscape(A4), leftMargin=18, rightMargin=18,
+                            topMargin=24, bottomMargin=24)
+    styles = getSampleStyleSheet()
+    story = [Paragraph(f"MATRIZ DE ASISTENCIA - {calendar.month_name[matriz.month]} {matriz.year}", styles['Title'])]
+    leyenda = '   '.join(f"{CODIGOS[c]} = {t}" for c, t in LEYENDA.items())
+    story.append(Paragraph(leyenda, styles['Normal']))
+    story.append(Spacer(1, 8))
+
+    # Sin la columna oculta EmpleadoID; totales abreviados para que quepa el mes
+    cabecera = ['Empleado'] + encabezados[2:2 + n_dias] + ['A', 'R', 'T', 'F', 'J']
+    table_data = [cabecera]
+    style_cmds = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 6),
+        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 1),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+    ]
+    for ridx, (_, nombre, clases, totales) in enumerate(filas, start=1):
+        table_data.append([nombre[:28]] + [CODIGOS.get(c, c) for c in clases] + totales)
+        for cidx, clase in enumerate(clases, start=1):
+            color = _COLOR_MATRIZ.get(clase)
+            if color is not None:
+                style_cmds.append(('BACKGROUND', (cidx, ridx), (cidx, ridx), color))
+    for etiqueta, valores in por_dia:
+        table_data.append([etiqueta] + valores + [''] * 5)
+        style_cmds.append(('FONTNAME', (0, len(table_data) - 1), (-1, len(table_data) - 1), 'Helvetica-Bold'))
+
+    tabla = Table(table_data, repeatRows=1, colWidths=[110] + [17] * n_dias + [18] * 5)
+    tabla.setStyle(TableStyle(style_cmds))
+    story.append(tabla)
+    doc.build(story)
+    return filepath
+
+
+_RENDERIZADORES = {'excel': excel_empleado, 'pdf': pdf_empleado}
+
+
+def render_empleado(trabajo: dict) -> list[dict]:
+    """Generar los formatos pedidos de un empleado. Nunca lanza: los errores van al manifiesto."""
+    formatos = ('excel', 'pdf') if trabajo.get('formato', 'both') == 'both' else (trabajo['formato'],)
+    resultados = []
+    for formato in formatos:
+        inicio = time.perf_counter()
+        entrada = {'empleado_id': trabajo['empleado_id'], 'empleado': trabajo['employee_data'][0],
+                   'formato': formato, 'archivo': None, 'ok': False, 'error': None}
+        try:
+            entrada['archivo'] = _RENDERIZADORES[formato](
+                trabajo['directorio'], trabajo['employee_data'], trabajo['attendance_data'],
+                trabajo['year'], trabajo['month'], trabajo.get('horas'))
+            entrada['ok'] = True
+        except Exception as e:
+            entrada['error'] = str(e)
+        entrada['segundos'] = round(time.perf_counter() - inicio, 3)
+        resultados.append(entrada)
+    return resultados
+
+
+def _bajar_prioridad() -> None:
+    """Los procesos de reportes ceden CPU a la interfaz y al lector NFC."""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass
+
+
+def generar_lote(trabajos: Iterable[dict], workers: int | None = None,
+                 progreso: Callable[[int, int, list[dict]], None] | None = None) -> list[dict]:
+    """Generar los reportes de varios empleados en paralelo. Retorna el manifiesto (una entrada
+    por archivo). progreso(hechos, total, resultados_del_empleado) se llama al terminar cada uno.
+    """
+    trabajos = list(trabajos)
+    total = len(trabajos)
+    workers = min(workers or workers_por_defecto(), max(1, total))
+    manifiesto: list[dict] = []
+    hechos = 0
+
+    def _terminado(resultados):
+        nonlocal hechos
+        hechos += 1
+        manifiesto.extend(resultados)
+        if progreso:
+            progreso(hechos, total, resultados)
+
+    if workers <= 1:
+        for trabajo in trabajos:
+            _terminado(render_empleado(trabajo))
+        return manifiesto
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_bajar_prioridad) as pool:
+        futuros = {pool.submit(render_empleado, t): t for t in trabajos}
+        for futuro in as_completed(futuros):
+            try:
+                _terminado(futuro.result())
+            except Exception as e:
+                # El proceso murió (no un error de generación): registrar el fallo del empleado
+                t = futuros[futuro]
+                _terminado([{'empleado_id': t['empleado_id'], 'empleado': t['employee_data'][0],
+                             'formato': t.get('formato', 'both'), 'archivo': None, 'ok': False,
+                             'error': str(e), 'segundos': 0}])
+    return manifiesto
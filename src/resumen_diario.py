@@ -0,0 +1,262 @@
+"""
+Resumen diario por empleado: una fila por (empleado_id, fecha).
+- primera_entrada / estado_entrada: la ENTRADA más temprana del día y su estado.
+- ultima_salida / estado_salida: la SALIDA más tardía del día y su estado.
+- registros: cantidad de lecturas; ubicaciones: sitios donde registró
+  (nombres separados por coma en SQLite, arreglo de ids en PostgreSQL).
+Se mantiene con triggers al insertar (se ajusta la fila del día). Al borrar, los días afectados
+se recalculan una sola vez por sentencia, no por fila: en PostgreSQL con un trigger por sentencia
+con tabla de transición; en SQLite (sin triggers por sentencia) borrando con borrar_sqlite.
+reconstruir_* recalcula un rango completo (migración inicial o a demanda).
+"""
+from __future__ import annotations
+
+# ---- SQLite (registros_local -> resumen_diario_local) ----
+
+_AGREGADO_SQLITE = """
+    SELECT r.empleado_id, r.fecha,
+        (SELECT MIN(x.hora_registro) FROM registros_local x
+          WHERE x.empleado_id = r.empleado_id AND x.fecha = r.fecha AND x.tipo_movimiento = 'ENTRADA'),
+        (SELECT x.estado FROM registros_local x
+          WHERE x.empleado_id = r.empleado_id AND x.fecha = r.fecha AND x.tipo_movimiento = 'ENTRADA'
+          ORDER BY x.hora_registro LIMIT 1),
+        (SELECT MAX(x.hora_registro) FROM registros_local x
+          WHERE x.empleado_id = r.empleado_id AND x.fecha = r.fecha AND x.tipo_movimiento = 'SALIDA'),
+        (SELECT x.estado FROM registros_local x
+          WHERE x.empleado_id = r.empleado_id AND x.fecha = r.fecha AND x.tipo_movimiento = 'SALIDA'
+          ORDER BY x.hora_registro DESC LIMIT 1),
+        COUNT(*),
+        COALESCE(group_concat(DISTINCT r.ubicacion_nombre), '')
+    FROM registros_local r
+    WHERE r.empleado_id IS NOT NULL AND {filtro}
+    GROUP BY r.empleado_id, r.fecha
+"""
+
+_COLUMNAS = ("empleado_id, fecha, primera_entrada, estado_entrada, "
+             "ultima_salida, estado_salida, registros, ubicaciones")
+
+
+def instalar_sqlite(cursor) -> None:
+    """Crear tabla y triggers en SQLite (idempotente)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_diario_local (
+            empleado_id INTEGER NOT NULL,
+            fecha TEXT NOT NULL,
+            primera_entrada TEXT,
+            estado_entrada TEXT,
+            ultima_salida TEXT,
+            estado_salida TEXT,
+            registros INTEGER NOT NULL DEFAULT 0,
+            ubicaciones TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (empleado_id, fecha)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumen_diario_local_fecha ON resumen_diario_local(fecha)")
+    # En el SET de SQLite todas las expresiones ven los valores previos de la fila
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_resumen_diario_local_ins
+        AFTER INSERT ON registros_local
+        WHEN NEW.empleado_id IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO resumen_diario_local (empleado_id, fecha) VALUES (NEW.empleado_id, NEW.fecha);
+            UPDATE resumen_diario_local SET
+                registros = registros + 1,
+                primera_entrada = CASE WHEN NEW.tipo_movimiento = 'ENTRADA'
+                    AND (primera_entrada IS NULL OR NEW.hora_registro < primera_entrada)
+                    THEN NEW.hora_registro ELSE primera_entrada END,
+                estado_entrada = CASE WHEN NEW.tipo_movimiento = 'ENTRADA'
+                    AND (primera_entrada IS NULL OR NEW.hora_registro < primera_entrada)
+                    THEN NEW.estado ELSE estado_entrada END,
+                ultima_salida = CASE WHEN NEW.tipo_movimiento = 'SALIDA'
+                    AND (ultima_salida IS NULL OR NEW.hora_registro > ultima_salida)
+                    THEN NEW.hora_registro ELSE ultima_salida END,
+                estado_salida = CASE WHEN NEW.tipo_movimiento = 'SALIDA'
+                    AND (ultima_salida IS NULL OR NEW.hora_registro > ultima_salida)
+                    THEN NEW.estado ELSE estado_salida END,
+                ubicaciones = CASE
+                    WHEN NEW.ubicacion_nombre IS NULL
+                      OR instr(',' || ubicaciones || ',', ',' || NEW.ubicacion_nombre || ',') > 0
+                    THEN ubicaciones
+                    WHEN ubicaciones = '' THEN NEW.ubicacion_nombre
+                    ELSE ubicaciones || ',' || NEW.ubicacion_nombre END
+            WHERE empleado_id = NEW.empleado_id AND fecha = NEW.fecha;
+        END
+    """)
+    # El trigger por fila al borrar recalculaba el día completo por cada fila: ahora borrar_sqlite
+    cursor.execute("DROP TRIGGER IF EXISTS trg_resumen_diario_local_del")
+
+
+def borrar_sqlite(cursor, where: str, params=()) -> int:
+    """DELETE FROM registros_local WHERE <where> y recálculo de cada (empleado, fecha) afectado una
+    sola vez. Usa el cursor dado (la transacción del llamador). Retorna las filas borradas.
+    """
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS resumen_dias_borrados (empleado_id INTEGER, fecha TEXT)")
+    cursor.execute("DELETE FROM temp.resumen_dias_borrados")
+    cursor.execute(f"""
+        INSERT INTO temp.resumen_dias_borrados
+        SELECT DISTINCT empleado_id, fecha FROM registros_local
+        WHERE empleado_id IS NOT NULL AND ({where})
+    """, params)
+    cursor.execute(f"DELETE FROM registros_local WHERE {where}", params)
+    borradas = cursor.rowcount
+    dias = "(SELECT empleado_id, fecha FROM temp.resumen_dias_borrados)"
+    cursor.execute(f"DELETE FROM resumen_diario_local WHERE (empleado_id, fecha) IN {dias}")
+    cursor.execute(f"INSERT INTO resumen_diario_local ({_COLUMNAS}) "
+                   f"{_AGREGADO_SQLITE.format(filtro=f'(r.empleado_id, r.fecha) IN {dias}')}")
+    return borradas
+
+
+def _filtro(col_emp: str, col_fecha: str, marcador: str, empleado_id, desde, hasta) -> tuple[str, list]:
+    condiciones, params = ["1 = 1"], []
+    if empleado_id is not None:
+        condiciones.append(f"{col_emp} = {marcador}")
+        params.append(empleado_id)
+    if desde is not None:
+        condiciones.append(f"{col_fecha} >= {marcador}")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append(f"{col_fecha} < {marcador}")
+        params.append(hasta)
+    return " AND ".join(condiciones), params
+
+
+def reconstruir_sqlite(cursor, empleado_id=None, desde=None, hasta=None) -> None:
+    """Recalcular el resumen local para un empleado y/o rango [desde, hasta) (None = todo)."""
+    filtro, params = _filtro("empleado_id", "fecha", "?", empleado_id, desde, hasta)
+    cursor.execute(f"DELETE FROM resumen_diario_local WHERE {filtro}", params)
+    filtro, params = _filtro("r.empleado_id", "r.fecha", "?", empleado_id, desde, hasta)
+    cursor.execute(f"INSERT INTO resumen_diario_local ({_COLUMNAS}) {_AGREGADO_SQLITE.format(filtro=filtro)}", params)
+
+
+# ---- PostgreSQL (registros_asistencia -> resumen_diario) ----
+
+# {dias}: JOIN opcional con los días a recalcular; {filtro}: condición extra
+_AGREGADO_PG = """
+    SELECT r.empleado_id, r.fecha,
+        MIN(r.hora_registro) FILTER (WHERE r.tipo_movimiento = 'ENTRADA'),
+        (array_agg(r.estado ORDER BY r.hora_registro) FILTER (WHERE r.tipo_movimiento = 'ENTRADA'))[1],
+        MAX(r.hora_registro) FILTER (WHERE r.tipo_movimiento = 'SALIDA'),
+        (array_agg(r.estado ORDER BY r.hora_registro DESC) FILTER (WHERE r.tipo_movimiento = 'SALIDA'))[1],
+        COUNT(*),
+        COALESCE(array_agg(DISTINCT r.ubicacion_id) FILTER (WHERE r.ubicacion_id IS NOT NULL), '{{}}')
+    FROM registros_asistencia r {dias}
+    WHERE r.empleado_id IS NOT NULL AND {filtro}
+    GROUP BY r.empleado_id, r.fecha
+"""
+
+def instalar_pg(cursor) -> None:
+    """Crear tabla, función de reconstrucción y triggers en PostgreSQL (idempotente)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_diario (
+            empleado_id INTEGER NOT NULL,
+            fecha DATE NOT NULL,
+            primera_entrada TIMESTAMP,
+            estado_entrada VARCHAR(20),
+            ultima_salida TIMESTAMP,
+            estado_salida VARCHAR(20),
+            registros INTEGER NOT NULL DEFAULT 0,
+            ubicaciones INTEGER[] NOT NULL DEFAULT '{}',
+            PRIMARY KEY (empleado_id, fecha)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumen_diario_fecha ON resumen_diario(fecha)")
+    filtro_rango = ("(p_empleado IS NULL OR r.empleado_id = p_empleado) "
+                    "AND (p_desde IS NULL OR r.fecha >= p_desde) AND (p_hasta IS NULL OR r.fecha < p_hasta)")
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION resumen_diario_reconstruir(p_empleado INTEGER, p_desde DATE, p_hasta DATE)
+        RETURNS void AS $$
+        BEGIN
+            DELETE FROM resumen_diario
+            WHERE (p_empleado IS NULL OR empleado_id = p_empleado)
+              AND (p_desde IS NULL OR fecha >= p_desde)
+              AND (p_hasta IS NULL OR fecha < p_hasta);
+            INSERT INTO resumen_diario ({_COLUMNAS})
+            {_AGREGADO_PG.format(dias='', filtro=filtro_rango)};
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION resumen_diario_aplicar() RETURNS trigger AS $$
+        DECLARE
+            es_entrada BOOLEAN := NEW.tipo_movimiento = 'ENTRADA';
+            es_salida BOOLEAN := NEW.tipo_movimiento = 'SALIDA';
+        BEGIN
+            IF NEW.empleado_id IS NULL THEN
+                RETURN NULL;
+            END IF;
+            INSERT INTO resumen_diario AS s (empleado_id, fecha, primera_entrada, estado_entrada,
+                                             ultima_salida, estado_salida, registros, ubicaciones)
+            VALUES (NEW.empleado_id, NEW.fecha,
+                    CASE WHEN es_entrada THEN NEW.hora_registro END,
+                    CASE WHEN es_entrada THEN NEW.estado END,
+                    CASE WHEN es_salida THEN NEW.hora_registro END,
+                    CASE WHEN es_salida THEN NEW.estado END,
+                    1,
+                    CASE WHEN NEW.ubicacion_id IS NULL THEN '{}'::INTEGER[] ELSE ARRAY[NEW.ubicacion_id] END)
+            ON CONFLICT (empleado_id, fecha) DO UPDATE SET
+                registros = s.registros + 1,
+                primera_entrada = CASE WHEN es_entrada
+                    AND (s.primera_entrada IS NULL OR NEW.hora_registro < s.primera_entrada)
+                    THEN NEW.hora_registro ELSE s.primera_entrada END,
+                estado_entrada = CASE WHEN es_entrada
+                    AND (s.primera_entrada IS NULL OR NEW.hora_registro < s.primera_entrada)
+                    THEN NEW.estado ELSE s.estado_entrada END,
+                ultima_salida = CASE WHEN es_salida
+                    AND (s.ultima_salida IS NULL OR NEW.hora_registro > s.ultima_salida)
+                    THEN NEW.hora_registro ELSE s.ultima_salida END,
+                estado_salida = CASE WHEN es_salida
+                    AND (s.ultima_salida IS NULL OR NEW.hora_registro > s.ultima_salida)
+                    THEN NEW.estado ELSE s.estado_salida END,
+                ubicaciones = CASE
+                    WHEN NEW.ubicacion_id IS NULL OR NEW.ubicacion_id = ANY(s.ubicaciones) THEN s.ubicaciones
+                    ELSE array_append(s.ubicaciones, NEW.ubicacion_id) END;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Por sentencia: cada (empleado, fecha) de las filas borradas se recalcula una sola vez
+    dias = "(SELECT DISTINCT empleado_id, fecha FROM borradas WHERE empleado_id IS NOT NULL)"
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION resumen_diario_quitar_lote() RETURNS trigger AS $$
+        BEGIN
+            DELETE FROM resumen_diario s USING {dias} d
+            WHERE s.empleado_id = d.empleado_id AND s.fecha = d.fecha;
+            INSERT INTO resumen_diario ({_COLUMNAS})
+            {_AGREGADO_PG.format(dias=f'JOIN {dias} d ON d.empleado_id = r.empleado_id AND d.fecha = r.fecha',
+                                 filtro='TRUE')};
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_resumen_diario_ins ON registros_asistencia")
+    cursor.execute("""
+        CREATE TRIGGER trg_resumen_diario_ins AFTER INSERT ON registros_asistencia
+        FOR EACH ROW EXECUTE PROCEDURE resumen_diario_aplicar()
+    """)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_resumen_diario_del ON registros_asistencia")
+    cursor.execute("DROP FUNCTION IF EXISTS resumen_diario_quitar()")
+    cursor.execute("""
+        CREATE TRIGGER trg_resumen_diario_del AFTER DELETE ON registros_asistencia
+        REFERENCING OLD TABLE AS borradas
+        FOR EACH STATEMENT EXECUTE PROCEDURE resumen_diario_quitar_lote()
+    """)
+
+
+def instalar_vista_pg(cursor) -> None:
+    """vista_resumen_diario sobre resumen_diario. La vista original agregaba registros_asistencia
+    (y dependía de esa tabla); se reemplaza completa porque cambian los tipos de sus columnas.
+    """
+    cursor.execute("DROP VIEW IF EXISTS vista_resumen_diario")
+    cursor.execute("""
+        CREATE VIEW vista_resumen_diario AS
+        SELECT e.id AS empleado_id, e.nombre_completo, s.fecha, s.primera_entrada, s.ultima_salida,
+               s.estado_entrada, s.estado_salida
+        FROM empleados e
+        LEFT JOIN resumen_diario s ON e.id = s.empleado_id
+        ORDER BY s.fecha DESC, e.nombre_completo
+    """)
+
+
+def reconstruir_pg(cursor, empleado_id=None, desde=None, hasta=None) -> None:
+    """Recalcular el resumen en la nube para un empleado y/o rango [desde, hasta) (None = todo)."""
+    cursor.execute("SELECT resumen_diario_reconstruir(%s, %s::date, %s::date)", (empleado_id, desde, hasta))
@@ -0,0 +1,116 @@
+"""
+Compilador de horarios efectivos por día.
+- Resuelve una vez por fecha el horario (entrada, salida, sin_horario) de todos los empleados.
+- Produce una tabla inmutable {empleado_id: HorarioEfectivo} que leen el lector y los reportes.
+- Es la única fuente de verdad para las reglas de horario:
+  rotación semanal de doble horario, personalizados por día (L-V) y sábado 08:00–14:00 (excepto jefes).
+"""
+from __future__ import annotations
+from datetime import date
+from types import MappingProxyType
+from typing import Callable, Iterable, Mapping, NamedTuple
+import threading
+
+_DIAS_LV = ('lunes', 'martes', 'miercoles', 'jueves', 'viernes')
+_ENTRADAS_LV = tuple(f'entrada_{d}' for d in _DIAS_LV)
+_SALIDAS_LV = tuple(f'salida_{d}' for d in _DIAS_LV)
+
+
+class HorarioEfectivo(NamedTuple):
+    entrada: str        # 'HH:MM'
+    salida: str         # 'HH:MM'
+    sin_horario: bool   # Jefes (00:00–00:00): nunca RETARDO/TEMPRANO
+
+
+def _hhmm(value, default: str) -> str:
+    return str(value)[:5] if value else default
+
+
+def resolver_horario(emp: Mapping, fecha: date) -> HorarioEfectivo:
+    """Aplica las reglas de horario a una fila de empleado (dict columna -> valor).
+    Las columnas opcionales sólo se consideran si existen en la fila.
+    """
+    he = _hhmm(emp.get('hora_entrada'), '09:00')
+    hs = _hhmm(emp.get('hora_salida'), '18:00')
+    # Jefe: horario base 00:00–00:00
+    es_jefe = (he == '00:00' and hs == '00:00')
+
+    # Doble horario con rotación semanal (semana ISO par/impar respecto a base)
+    if emp.get('rotacion_semanal'):
+        _, iso_week, _ = fecha.isocalendar()
+        base = int(emp.get('rotacion_semana_base') or 0)
+        if (iso_week + base) % 2 == 1 and emp.get('hora_entrada_alt') and emp.get('hora_salida_alt'):
+            he = _hhmm(emp.get('hora_entrada_alt'), he)
+            hs = _hhmm(emp.get('hora_salida_alt'), hs)
+
+    # Personalizados por día (L-V): flag unificado; si no existe, legacy de sólo salidas
+    wd = fecha.weekday()
+    has_entries = all(n in emp for n in _ENTRADAS_LV)
+    has_exits = all(n in emp for n in _SALIDAS_LV)
+    if 'personalizado_por_dia_enabled' in emp and (has_entries or has_exits):
+        if emp.get('personalizado_por_dia_enabled') and wd < 5:
+            if has_entries and emp.get(_ENTRADAS_LV[wd]):
+                he = _hhmm(emp.get(_ENTRADAS_LV[wd]), he)
+            if has_exits and emp.get(_SALIDAS_LV[wd]):
+                hs = _hhmm(emp.get(_SALIDAS_LV[wd]), hs)
+    elif 'salida_por_dia_enabled' in emp and has_exits:
+        if emp.get('salida_por_dia_enabled') and wd < 5 and emp.get(_SALIDAS_LV[wd]):
+            hs = _hhmm(emp.get(_SALIDAS_LV[wd]), hs)
+
+    # Sábado especial 08:00–14:00 (excepto jefes)
+    if wd == 5 and not es_jefe:
+        he, hs = '08:00', '14:00'
+
+    return HorarioEfectivo(he, hs, he == '00:00' and hs == '00:00')
+
+
+class ScheduleCompiler:
+    """Tablas de horario efectivo por fecha, compiladas bajo demanda y cacheadas."""
+
+    # Suficiente para un reporte mensual completo más el día actual
+    MAX_FECHAS = 64
+
+    def __init__(self, loader: Callable[[], Iterable[Mapping]]):
+        # loader retorna las filas de empleados como dicts (todas las columnas disponibles)
+        self._loader = loader
+        self._filas: tuple | None = None
+        self._tablas: dict[date, Mapping[int, HorarioEfectivo]] = {}
+        self._lock = threading.Lock()
+
+    def tabla(self, fecha: date | None = None) -> Mapping[int, HorarioEfectivo]:
+        """Tabla inmutable {empleado_id: HorarioEfectivo} para la fecha (hoy por defecto)."""
+        fecha = fecha or date.today()
+        tabla = self._tablas.get(fecha)
+        if tabla is None:
+            tabla = self._compilar(fecha)
+        return tabla
+
+    def obtener(self, empleado_id: int, fecha: date | None = None) -> HorarioEfectivo | None:
+        try:
+            return self.tabla(fecha).get(int(empleado_id))
+        except Exception:
+            return None
+
+    def invalidar(self) -> None:
+        """Descartar filas y tablas compiladas (empleado editado o sincronizado)."""
+        with self._lock:
+            self._filas = None
+            self._tablas = {}
+
+    def _compilar(self, fecha: date) -> Mapping[int, HorarioEfectivo]:
+        with self._lock:
+            tabla = self._tablas.get(fecha)
+            if tabla is not None:
+                return tabla
+            try:
+                if self._filas is None:
+                    self._filas = tuple(self._loader())
+                tabla = MappingProxyType({int(emp['id']): resolver_horario(emp, fecha) for emp in self._filas})
+            except Exception as e:
+                print(f"Error compilando horarios: {e}")
+                # No cachear tablas vacías por error; se reintenta en la siguiente consulta
+                return MappingProxyType({})
+            if len(self._tablas) >= self.MAX_FECHAS:
+                self._tablas = {}
+            self._tablas[fecha] = tabla
+            return tabla
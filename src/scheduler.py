@@ -0,0 +1,241 @@
+"""
+Programador de tareas único de la aplicación.
+- Tareas con nombre, por intervalo (con variación aleatoria para que los kioscos no consulten
+  la nube al mismo tiempo) o tipo cron (minuto/hora/día/día de la semana).
+- Una tarea nunca se traslapa consigo misma: si sigue corriendo, se omite ese turno.
+- Intervalo adaptativo: si la tarea retorna False/0 (no había trabajo) o su condición no se
+  cumple (p. ej. sin conexión), el intervalo se duplica hasta `max_s`; al haber trabajo vuelve al base.
+- Recuperación: una tarea cron cuya hora pasó mientras el equipo dormía o la aplicación estaba
+  cerrada se ejecuta una vez al detectarlo (la última ejecución se guarda con `persistencia`).
+  Sólo cuenta como ejecutada si terminó sin error y no retornó False/0 (p. ej. backup sin conexión);
+  si no, se reintenta cada REINTENTO_CRON_S hasta lograrlo o hasta su siguiente turno.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Callable
+import random
+import threading
+
+
+class Cron:
+    """Especificación tipo cron; None en un campo significa 'cualquiera'."""
+    __slots__ = ('minuto', 'hora', 'dia', 'dia_semana')
+
+    def __init__(self, minuto: int = 0, hora: int | None = None, dia: int | None = None,
+                 dia_semana: int | None = None):
+        self.minuto = minuto
+        self.hora = hora
+        self.dia = dia
+        self.dia_semana = dia_semana  # weekday(): 0 = lunes ... 6 = domingo
+
+    def _dia_ok(self, t: datetime) -> bool:
+        return ((self.dia is None or t.day == self.dia)
+                and (self.dia_semana is None or t.weekday() == self.dia_semana))
+
+    def siguiente(self, despues_de: datetime) -> datetime:
+        """Primer instante que cumple la especificación, estrictamente posterior a `despues_de`."""
+        t = despues_de.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limite = t + timedelta(days=400)
+        while t < limite:
+            if not self._dia_ok(t):
+                t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if self.hora is not None and t.hour != self.hora:
+                t = (t + timedelta(hours=1)).replace(minute=0)
+                continue
+            if self.minuto is not None and t.minute != self.minuto:
+                t += timedelta(minutes=1)
+                continue
+            return t
+        raise ValueError("Especificación cron sin coincidencias")
+
+
+class Tarea:
+    def __init__(self, nombre: str, funcion: Callable[[], object], intervalo_s: float | None = None,
+                 cron: Cron | None = None, jitter_s: float = 0.0, max_s: float | None = None,
+                 condicion: Callable[[], bool] | None = None, recuperar: bool = True):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo_s = intervalo_s
+        self.cron = cron
+        self.jitter_s = jitter_s
+        self.max_s = max_s or intervalo_s
+        self.condicion = condicion
+        self.recuperar = recuperar
+        self.intervalo_actual = intervalo_s
+        self.proxima: datetime = datetime.now()
+        self.ultima: datetime | None = None
+        self.en_ejecucion = False
+        self.errores = 0
+
+    def programar(self, ahora: datetime) -> None:
+        if self.cron is not None:
+            self.proxima = self.cron.siguiente(ahora)
+        else:
+            espera = self.intervalo_actual + (random.uniform(0, self.jitter_s) if self.jitter_s else 0)
+            self.proxima = ahora + timedelta(seconds=espera)
+
+    def ajustar(self, hubo_trabajo: bool) -> None:
+        """Intervalo adaptativo (sólo tareas por intervalo)."""
+        if self.cron is not None:
+            return
+        if hubo_trabajo:
+            self.intervalo_actual = self.intervalo_s
+        else:
+            self.intervalo_actual = min(self.max_s, self.intervalo_actual * 2)
+
+
+class Scheduler:
+    # Máxima espera entre revisiones (detecta saltos de reloj y suspensiones)
+    REVISION_MAX_S = 30.0
+    # Espera antes de reintentar una tarea cron que falló
+    REINTENTO_CRON_S = 900.0
+
+    def __init__(self):
+        self._tareas: dict[str, Tarea] = {}
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._activo = False
+        # (leer(clave) -> str|None, guardar(clave, valor)) para recordar la última ejecución
+        self.persistencia: tuple[Callable[[str], str | None], Callable[[str, str], None]] | None = None
+
+    # ---- registro ----
+    def cada(self, nombre: str, funcion: Callable[[], object], intervalo_s: float, jitter_s: float = 0.0,
+             max_s: float | None = None, condicion: Callable[[], bool] | None = None,
+             inmediato: bool = True) -> Tarea:
+        """Tarea por intervalo. Con `max_s` el intervalo crece mientras no haya trabajo."""
+        tarea = Tarea(nombre, funcion, intervalo_s=max(1.0, float(intervalo_s)), jitter_s=jitter_s,
+                      max_s=max_s, condicion=condicion)
+        if not inmediato:
+            tarea.programar(datetime.now())
+        return self._agregar(tarea)
+
+    def cron(self, nombre: str, funcion: Callable[[], object], minuto: int = 0, hora: int | None = None,
+             dia: int | None = None, dia_semana: int | None = None,
+             condicion: Callable[[], bool] | None = None, recuperar: bool = True) -> Tarea:
+        tarea = Tarea(nombre, funcion, cron=Cron(minuto, hora, dia, dia_semana),
+                      condicion=condicion, recuperar=recuperar)
+        ahora = datetime.now()
+        ultima = self._leer_ultima(nombre)
+        if recuperar and ultima is not None and tarea.cron.siguiente(ultima) <= ahora:
+            # Se perdió al menos una ejecución: correr una vez ahora
+            tarea.proxima = ahora
+        else:
+            tarea.programar(ahora)
+            if ultima is None:
+                self._guardar_ultima(nombre, ahora)
+        return self._agregar(tarea)
+
+    def _agregar(self, tarea: Tarea) -> Tarea:
+        with self._lock:
+            self._tareas[tarea.nombre] = tarea
+        self._evento.set()
+        return tarea
+
+    # ---- control ----
+    def start(self) -> None:
+        if self._activo:
+            return
+        self._activo = True
+        threading.Thread(target=self._loop, daemon=True, name='programador').start()
+
+    def stop(self) -> None:
+        self._activo = False
+        self._evento.set()
+
+    def despertar(self, nombre: str | None = None) -> None:
+        """Adelantar tareas por intervalo (todas o una) y restablecer su intervalo base."""
+        ahora = datetime.now()
+        with self._lock:
+            for tarea in self._tareas.values():
+                if tarea.cron is None and (nombre is None or tarea.nombre == nombre):
+                    tarea.intervalo_actual = tarea.intervalo_s
+                    tarea.proxima = ahora
+        self._evento.set()
+
+    def ejecutar_ahora(self, nombre: str) -> bool:
+        """Lanzar una tarea fuera de programa (se omite si ya está corriendo)."""
+        with self._lock:
+            tarea = self._tareas.get(nombre)
+        return bool(tarea) and self._lanzar(tarea, datetime.now())
+
+    def estado(self) -> list[dict]:
+        with self._lock:
+            return [{'nombre': t.nombre, 'proxima': t.proxima, 'ultima': t.ultima,
+                     'en_ejecucion': t.en_ejecucion, 'intervalo_s': t.intervalo_actual, 'errores': t.errores}
+                    for t in self._tareas.values()]
+
+    # ---- internos ----
+    def _loop(self) -> None:
+        while self._activo:
+            ahora = datetime.now()
+            with self._lock:
+                vencidas = [t for t in self._tareas.values() if t.proxima <= ahora]
+                pendientes = [t.proxima for t in self._tareas.values() if t.proxima > ahora]
+            for tarea in vencidas:
+                self._lanzar(tarea, ahora)
+            espera = self.REVISION_MAX_S
+            if pendientes:
+                espera = min(espera, max(0.05, (min(pendientes) - datetime.now()).total_seconds()))
+            self._evento.wait(espera)
+            self._evento.clear()
+
+    def _lanzar(self, tarea: Tarea, ahora: datetime) -> bool:
+        with self._lock:
+            if tarea.en_ejecucion:
+                return False
+            tarea.en_ejecucion = True
+            # Reprogramar desde ahora: los turnos perdidos se colapsan en esta ejecución
+            tarea.programar(ahora)
+        threading.Thread(target=self._ejecutar, args=(tarea,), daemon=True,
+                         name=f'tarea-{tarea.nombre}').start()
+        return True
+
+    def _ejecutar(self, tarea: Tarea) -> None:
+        hubo_trabajo = False
+        exito = False
+        try:
+            if tarea.condicion is not None and not tarea.condicion():
+                return
+            resultado = tarea.funcion()
+            hubo_trabajo = resultado is None or bool(resultado)
+            exito = hubo_trabajo
+            tarea.errores = 0
+        except Exception as e:
+            tarea.errores += 1
+            print(f"Error en tarea programada '{tarea.nombre}': {e}")
+        finally:
+            fin = datetime.now()
+            with self._lock:
+                tarea.en_ejecucion = False
+                tarea.ultima = fin
+                tarea.ajustar(hubo_trabajo)
+                if tarea.cron is None:
+                    tarea.programar(fin)
+                elif tarea.recuperar and not exito:
+                    # No se guarda como hecha: reintentar antes de su siguiente turno
+                    tarea.proxima = min(fin + timedelta(seconds=self.REINTENTO_CRON_S), tarea.proxima)
+            if tarea.cron is not None and tarea.recuperar and exito:
+                self._guardar_ultima(tarea.nombre, fin)
+            self._evento.set()
+
+    def _leer_ultima(self, nombre: str) -> datetime | None:
+        if not self.persistencia:
+            return None
+        try:
+            valor = self.persistencia[0](f"TAREA_ULTIMA_{nombre}")
+            return datetime.fromisoformat(valor) if valor else None
+        except Exception:
+            return None
+
+    def _guardar_ultima(self, nombre: str, cuando: datetime) -> None:
+        if not self.persistencia:
+            return
+        try:
+            self.persistencia[1](f"TAREA_ULTIMA_{nombre}", cuando.isoformat())
+        except Exception as e:
+            print(f"Aviso: no se pudo guardar la última ejecución de '{nombre}': {e}")
+
+
+# Instancia global
+scheduler = Scheduler()
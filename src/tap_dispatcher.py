@@ -0,0 +1,118 @@
+"""
+Despacho de lecturas NFC hacia un grupo de hilos de trabajo.
+- Los hilos del lector PC/SC sólo encolan (uid, sitio, marca monotónica) y siguen sondeando.
+- Colas acotadas por trabajador; cada UID se asigna siempre al mismo trabajador,
+  así las lecturas de una misma tarjeta se procesan en orden.
+- El sitio viaja con el evento (no se modifica estado compartido del lector).
+- Configurable con NFC_WORKERS y NFC_QUEUE_SIZE.
+"""
+from __future__ import annotations
+from typing import Callable, NamedTuple
+from zlib import crc32
+import os
+import queue
+import threading
+import time
+
+from employee_index import normalizar_uid
+
+# Espera en cola a partir de la cual se avisa en consola (segundos)
+_AVISO_ESPERA_S = 2.0
+# Tiempo máximo de stop() para terminar las lecturas encoladas (segundos)
+_ESPERA_CIERRE_S = 5.0
+
+
+class TapEvent(NamedTuple):
+    uid: str
+    site: str | None
+    ts: float  # time.monotonic() al momento de la lectura
+
+
+def _env_int(name: str, default: int, minimo: int = 1) -> int:
+    try:
+        return max(minimo, int(os.getenv(name, str(default))))
+    except Exception:
+        return default
+
+
+class TapDispatcher:
+    """Colas acotadas + trabajadores que ejecutan `handler(evento)`."""
+
+    def __init__(self, handler: Callable[[TapEvent], object], workers: int | None = None,
+                 queue_size: int | None = None):
+        self._handler = handler
+        self._workers = workers or _env_int('NFC_WORKERS', 2)
+        self._queue_size = queue_size or _env_int('NFC_QUEUE_SIZE', 64)
+        self._colas: list[queue.Queue] = []
+        self._hilos: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._activo = False
+
+    def start(self) -> None:
+        with self._lock:
+            if self._activo:
+                return
+            self._activo = True
+            self._colas = [queue.Queue(maxsize=self._queue_size) for _ in range(self._workers)]
+            self._hilos = []
+            for i, cola in enumerate(self._colas):
+                t = threading.Thread(target=self._trabajar, args=(cola,), daemon=True, name=f'nfc-worker-{i}')
+                t.start()
+                self._hilos.append(t)
+
+    def stop(self, timeout: float = _ESPERA_CIERRE_S) -> bool:
+        """Dejar de aceptar lecturas, terminar las ya encoladas y esperar a los trabajadores.
+        Retorna False si alguno no terminó dentro de `timeout` segundos.
+        """
+        with self._lock:
+            if not self._activo:
+                return True
+            self._activo = False
+            colas, hilos = self._colas, self._hilos
+        # Fuera del candado: submit ya no encola, y la marca de fin queda detrás de lo pendiente
+        limite = time.monotonic() + timeout
+        for cola in colas:
+            try:
+                cola.put(None, timeout=max(0.0, limite - time.monotonic()))
+            except queue.Full:
+                pass
+        for t in hilos:
+            t.join(max(0.0, limite - time.monotonic()))
+        vivos = [t.name for t in hilos if t.is_alive()]
+        if vivos:
+            print(f"⚠️  Trabajadores NFC sin terminar tras {timeout:.1f}s: {', '.join(vivos)}")
+        return not vivos
+
+    def submit(self, uid: str, site: str | None = None) -> bool:
+        """Encolar una lectura sin bloquear al hilo del lector. Retorna False si se descartó
+        (cola llena o despachador detenido).
+        """
+        evento = TapEvent(str(uid), site, time.monotonic())
+        with self._lock:
+            if not self._activo:
+                print(f"⚠️  Despachador detenido; se descarta lectura {uid} ({site or 'sitio principal'})")
+                return False
+            cola = self._colas[crc32(normalizar_uid(uid).encode('utf-8')) % len(self._colas)]
+            try:
+                cola.put_nowait(evento)
+                return True
+            except queue.Full:
+                pass
+        print(f"⚠️  Cola de lecturas llena; se descarta lectura {uid} ({site or 'sitio principal'})")
+        return False
+
+    def pendientes(self) -> int:
+        return sum(c.qsize() for c in self._colas)
+
+    def _trabajar(self, cola: queue.Queue) -> None:
+        while True:
+            evento = cola.get()
+            if evento is None:
+                break
+            espera = time.monotonic() - evento.ts
+            if espera > _AVISO_ESPERA_S:
+                print(f"⏱️  Lectura {evento.uid} esperó {espera:.1f}s en cola")
+            try:
+                self._handler(evento)
+            except Exception as e:
+                print(f"❌ Error procesando lectura encolada: {e}")
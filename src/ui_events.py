@@ -0,0 +1,57 @@
+"""
+Canal de eventos hacia la interfaz Tk.
+- Cualquier hilo publica eventos; sólo el hilo de Tk los procesa (drenado con root.after).
+- Por cuadro se conserva el último evento de cada tipo: una ráfaga de lecturas muestra
+  sólo la más reciente y varias solicitudes de refresco se colapsan en una.
+"""
+from __future__ import annotations
+from typing import Any, Callable
+import threading
+
+
+class UIEventChannel:
+    """Eventos coalescidos por tipo, entregados en el hilo de Tk."""
+
+    def __init__(self, root, intervalo_ms: int = 50):
+        self._root = root
+        self._intervalo_ms = max(10, int(intervalo_ms))
+        self._handlers: dict[str, Callable[[Any], None]] = {}
+        # tipo -> último payload; el orden de inserción define el orden de entrega
+        self._pendientes: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._activo = False
+
+    def on(self, tipo: str, handler: Callable[[Any], None]) -> None:
+        """Registrar el manejador de un tipo de evento (llamar desde el hilo de Tk)."""
+        self._handlers[tipo] = handler
+
+    def publicar(self, tipo: str, payload: Any = None) -> None:
+        """Publicar un evento desde cualquier hilo. Reemplaza al pendiente del mismo tipo."""
+        with self._lock:
+            self._pendientes[tipo] = payload
+
+    def start(self) -> None:
+        if not self._activo:
+            self._activo = True
+            self._root.after(self._intervalo_ms, self._drenar)
+
+    def stop(self) -> None:
+        self._activo = False
+
+    def _drenar(self) -> None:
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        for tipo, payload in pendientes.items():
+            handler = self._handlers.get(tipo)
+            if handler is None:
+                continue
+            try:
+                handler(payload)
+            except Exception as e:
+                print(f"Error procesando evento de interfaz '{tipo}': {e}")
+        if self._activo:
+            try:
+                self._root.after(self._intervalo_ms, self._drenar)
+            except Exception:
+                # Ventana destruida
+                self._activo = False
@@ -0,0 +1,187 @@
+"""
+Horas trabajadas por empleado y día a partir de las lecturas ENTRADA/SALIDA.
+- Las lecturas de cada empleado-día se ordenan por hora y cada ENTRADA se empareja con la lectura
+  siguiente si es una SALIDA (reentradas: varios intervalos por día). Una ENTRADA seguida de otra
+  ENTRADA, o la última del día, queda sin salida: se cuenta en 'sin_salida' y no suma minutos.
+  Las SALIDA sueltas se ignoran y los registros FALTA no participan.
+- Contra el horario efectivo del día (schedule_compiler):
+  minutos_retardo        primera ENTRADA marcada RETARDO: minutos después de la hora de entrada;
+  minutos_salida_temprana última lectura SALIDA marcada TEMPRANO: minutos antes de la hora de salida;
+  minutos_extra          trabajados por encima de la jornada programada (no aplica a sin horario).
+  Se usan los estados que asignó el lector, así la tolerancia es la misma que en el kiosco.
+- Todo con NumPy/pandas sobre el periodo completo (sin ciclos por lectura).
+"""
+from __future__ import annotations
+from datetime import date
+from typing import Callable, Iterable, Mapping
+
+import numpy as np
+import pandas as pd
+
+from schedule_compiler import HorarioEfectivo
+
+CLAVE = ['empleado_id', 'fecha']
+COLUMNAS = ['empleado_id', 'fecha', 'primera_entrada', 'ultima_salida', 'intervalos', 'sin_salida',
+            'minutos_trabajados', 'minutos_programados', 'minutos_retardo', 'minutos_salida_temprana',
+            'minutos_extra']
+MINUTOS = ['minutos_trabajados', 'minutos_retardo', 'minutos_salida_temprana', 'minutos_extra']
+
+# 'HH:MM' de cada minuto del día; el último elemento ('') es para valores nulos
+_HHMM = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(1440)] + [''], dtype=object)
+
+
+def formato_horas(minutos) -> str:
+    """Minutos -> 'H:MM'."""
+    try:
+        minutos = int(minutos)
+    except (TypeError, ValueError):
+        return ''
+    return f"{minutos // 60}:{minutos % 60:02d}"
+
+
+def _minuto_del_dia(horas: pd.Series) -> np.ndarray:
+    return (horas.dt.hour * 60 + horas.dt.minute + horas.dt.second / 60).to_numpy(
+        dtype=float, na_value=np.nan, copy=True)
+
+
+def _minutos_registro(serie: pd.Series) -> np.ndarray:
+    """Minuto del día (con segundos como fracción) de timestamps de PostgreSQL o ISO de SQLite.
+    Se usa la hora local registrada (con zona horaria, la del propio valor); no válidos -> NaN.
+    """
+    minutos = _minuto_del_dia(pd.to_datetime(serie, errors='coerce', format='ISO8601'))
+    # Desfases distintos (p. ej. cambio de horario) quedan NaT: se releen sin desfase, a hora de pared
+    reintentar = np.isnan(minutos) & serie.notna().to_numpy()
+    if reintentar.any():
+        texto = serie[reintentar].astype(str).str.slice(0, 26)
+        minutos[reintentar] = _minuto_del_dia(pd.to_datetime(texto, errors='coerce', format='ISO8601'))
+    return minutos
+
+
+def _por_valor(serie: pd.Series, funcion) -> np.ndarray:
+    """Aplicar funcion una vez por valor distinto (tipos, estados y fechas se repiten mucho)."""
+    codigos, valores = pd.factorize(serie, use_na_sentinel=True)
+    tabla = np.array([funcion(v) for v in valores] + [funcion(None)], dtype=object)
+    return tabla[codigos]
+
+
+def _horario_minutos(hhmm: str) -> float:
+    try:
+        h, m = str(hhmm).split(':')[:2]
+        return int(h) * 60 + int(m)
+    except ValueError:
+        return np.nan
+
+
+def _horarios(dias: pd.DataFrame, horarios: Callable[[date], Mapping[int, HorarioEfectivo]]) -> pd.DataFrame:
+    """Entrada/salida programadas (minutos) y sin_horario de cada empleado-día presente."""
+    entrada = np.full(len(dias), np.nan)
+    salida = np.full(len(dias), np.nan)
+    sin_horario = np.zeros(len(dias), dtype=bool)
+    # Una tabla compilada por fecha; dentro de la fecha sólo búsquedas en el dict
+    for fecha_iso, posiciones in dias.groupby('fecha').indices.items():
+        tabla = horarios(date.fromisoformat(fecha_iso))
+        for pos, emp_id in zip(posiciones, dias['empleado_id'].to_numpy()[posiciones]):
+            h = tabla.get(int(emp_id))
+            if h is None:
+                continue
+            entrada[pos] = _horario_minutos(h.entrada)
+            salida[pos] = _horario_minutos(h.salida)
+            sin_horario[pos] = bool(h.sin_horario)
+    return pd.DataFrame({'entrada_prog': entrada, 'salida_prog': salida, 'sin_horario': sin_horario},
+                        index=dias.index)
+
+
+def calcular(registros: Iterable[tuple],
+             horarios: Callable[[date], Mapping[int, HorarioEfectivo]] | None = None) -> pd.DataFrame:
+    """Una fila por empleado-día con lecturas (columnas COLUMNAS; fecha 'YYYY-MM-DD', horas 'HH:MM').
+    registros: (empleado_id, fecha, hora_registro, tipo_movimiento, estado).
+    horarios: fecha -> {empleado_id: HorarioEfectivo}; sin él sólo se calculan minutos trabajados.
+    """
+    df = pd.DataFrame(list(registros), columns=['empleado_id', 'fecha', 'hora_registro',
+                                                'tipo_movimiento', 'estado'])
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS)
+    df['fecha'] = _por_valor(df['fecha'], lambda v: str(v)[:10] if v is not None else '')
+    df['tipo'] = _por_valor(df['tipo_movimiento'], lambda v: str(v or '').upper())
+    df['estado'] = _por_valor(df['estado'], lambda v: str(v or '').upper())
+    df['minuto'] = _minutos_registro(df['hora_registro'])
+    df = df[(df['estado'] != 'FALTA') & (df['fecha'] != '') & df['minuto'].notna()]
+    df = df.sort_values(CLAVE + ['minuto'], kind='stable').reset_index(drop=True)
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNAS)
+
+    # Emparejar cada ENTRADA con la lectura siguiente del mismo empleado-día
+    emp = df['empleado_id'].to_numpy()
+    fecha = df['fecha'].to_numpy()
+    tipo = df['tipo'].to_numpy()
+    minuto = df['minuto'].to_numpy()
+    mismo_dia_sig = np.append((emp[1:] == emp[:-1]) & (fecha[1:] == fecha[:-1]), False)
+    es_entrada = tipo == 'ENTRADA'
+    par = es_entrada & mismo_dia_sig & np.append(tipo[1:] == 'SALIDA', False)
+    df['trabajado'] = np.where(par, np.append(minuto[1:], np.nan) - minuto, 0.0)
+    df['par'] = par
+    df['abierta'] = es_entrada & ~par
+
+    grupos = df.groupby(CLAVE, sort=True)
+    dias = grupos.agg(intervalos=('par', 'sum'), sin_salida=('abierta', 'sum'),
+                      trabajado=('trabajado', 'sum'), ultimo_tipo=('tipo', 'last'))
+    entradas = df[es_entrada].groupby(CLAVE).agg(min_entrada=('minuto', 'first'), estado_entrada=('estado', 'first'))
+    salidas = df[tipo == 'SALIDA'].groupby(CLAVE).agg(min_salida=('minuto', 'last'), estado_salida=('estado', 'last'))
+    dias = dias.join(entradas).join(salidas).reset_index()
+
+    if horarios is not None:
+        dias = dias.join(_horarios(dias, horarios))
+    else:
+        dias['entrada_prog'] = np.nan
+        dias['salida_prog'] = np.nan
+        dias['sin_horario'] = True
+    con_horario = ~dias['sin_horario'].to_numpy() & dias['entrada_prog'].notna().to_numpy()
+    programados = (dias['salida_prog'] - dias['entrada_prog']).to_numpy()
+    programados = np.where(programados < 0, programados + 1440, programados)  # jornada que cruza medianoche
+    programados = np.where(con_horario, programados, 0)
+
+    retardo = np.where(con_horario & (dias['estado_entrada'] == 'RETARDO').to_numpy(),
+                       dias['min_entrada'] - dias['entrada_prog'], 0)
+    temprano = np.where(con_horario & (dias['ultimo_tipo'] == 'SALIDA').to_numpy()
+                        & (dias['estado_salida'] == 'TEMPRANO').to_numpy(),
+                        dias['salida_prog'] - dias['min_salida'], 0)
+    trabajado = dias['trabajado'].to_numpy()
+    extra = np.where(con_horario & (programados > 0), trabajado - programados, 0)
+
+    def _enteros(valores) -> np.ndarray:
+        return np.floor(np.clip(np.nan_to_num(np.asarray(valores, dtype=float)), 0, None)).astype(int)
+
+    def _hhmm(valores: pd.Series) -> np.ndarray:
+        v = valores.to_numpy(dtype=float)
+        return _HHMM[np.where(np.isnan(v), 1440, np.clip(np.nan_to_num(v), 0, 1439)).astype(int)]
+
+    return pd.DataFrame({
+        'empleado_id': dias['empleado_id'],
+        'fecha': dias['fecha'],
+        'primera_entrada': _hhmm(dias['min_entrada']),
+        'ultima_salida': _hhmm(dias['min_salida']),
+        'intervalos': dias['intervalos'].astype(int),
+        'sin_salida': dias['sin_salida'].astype(int),
+        'minutos_trabajados': _enteros(trabajado),
+        'minutos_programados': _enteros(programados),
+        'minutos_retardo': _enteros(retardo),
+        'minutos_salida_temprana': _enteros(temprano),
+        'minutos_extra': _enteros(extra),
+    }, columns=COLUMNAS)
+
+
+def totales_por_empleado(horas: pd.DataFrame) -> pd.DataFrame:
+    """Suma por empleado de los minutos, días con lecturas y días con entradas sin salida."""
+    if horas.empty:
+        return pd.DataFrame(columns=['dias', 'sin_salida'] + MINUTOS)
+    g = horas.groupby('empleado_id')
+    totales = g[MINUTOS].sum()
+    totales.insert(0, 'dias', g.size())
+    totales.insert(1, 'sin_salida', (horas['sin_salida'] > 0).groupby(horas['empleado_id']).sum())
+    return totales
+
+
+def por_dia(horas: pd.DataFrame) -> dict:
+    """{(empleado_id, 'YYYY-MM-DD'): fila} para unir con las filas de los reportes."""
+    return {(emp_id, fecha): fila for emp_id, fecha, fila in
+            zip(horas['empleado_id'], horas['fecha'], horas[COLUMNAS].itertuples(index=False))}
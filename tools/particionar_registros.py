@@ -0,0 +1,36 @@
+"""
+Convierte registros_asistencia en tabla particionada por mes cuando es demasiado grande para
+hacerlo al arrancar un kiosco (PARTICIONAR_MAX_FILAS). La copia bloquea las inserciones de todos
+los sitios mientras dura: ejecutar en una ventana de mantenimiento. Las lecturas de los kioscos
+quedan en su bitácora local y se envían al terminar.
+Uso:
+  python tools/particionar_registros.py
+"""
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'src'))
+
+
+def main():
+    # Sin límite de tamaño para esta ejecución
+    os.environ['PARTICIONAR_MAX_FILAS'] = '0'
+    from database_manager import db_manager
+    from pg_migrations import apply_pending_pg_migrations
+    try:
+        with db_manager.pg_session() as conn:
+            if not conn:
+                print("Sin conexión a PostgreSQL")
+                return 1
+            aplicadas = apply_pending_pg_migrations(conn)
+    except Exception as e:
+        print(f"Error particionando registros_asistencia: {e}")
+        return 1
+    print(f"Migraciones aplicadas: {', '.join(aplicadas)}" if aplicadas else "No había migraciones pendientes")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+"""
+Restaura (o sólo verifica) un backup creado por cloud_sync.backup_to_s3.
+Lee por flujo los archivos NDJSON comprimidos, verifica filas y sha256 contra el manifiesto
+e inserta en la base PostgreSQL configurada en .env, en una sola transacción.
+Uso:
+  python tools/restaurar_backup.py backup_20251102_230000                 # desde S3
+  python tools/restaurar_backup.py backup_20251102_230000 --dir D:\\backups # desde un directorio
+  python tools/restaurar_backup.py backup_20251102_230000 --verificar      # sin escribir en la base
+"""
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'src'))
+
+import backup_stream
+
+
+def _origen(args):
+    if args.dir:
+        return backup_stream.DestinoDirectorio(args.dir)
+    from cloud_sync import cloud_sync
+    if not cloud_sync.s3_client:
+        print("S3 no está configurado; use --dir para restaurar desde un directorio")
+        return None
+    return backup_stream.DestinoS3(cloud_sync.s3_client, cloud_sync.bucket_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restaurar un backup por flujo")
+    parser.add_argument('nombre', help="Nombre del backup (carpeta bajo backups/)")
+    parser.add_argument('--dir', help="Directorio raíz del backup local (en lugar de S3)")
+    parser.add_argument('--verificar', action='store_true', help="Sólo verificar conteos y sumas")
+    parser.add_argument('--tabla', action='append', help="Restaurar sólo esta tabla (se puede repetir)")
+    args = parser.parse_args()
+
+    origen = _origen(args)
+    if origen is None:
+        return 1
+    try:
+        if args.verificar:
+            resultado = backup_stream.verificar(origen, args.nombre)
+        else:
+            from database_manager import db_manager
+            with db_manager.pg_session() as conn:
+                if not conn:
+                    print("Sin conexión a PostgreSQL")
+                    return 1
+                resultado = backup_stream.restaurar(conn, origen, args.nombre, tablas=args.tabla)
+    except Exception as e:
+        print(f"Error restaurando {args.nombre}: {e}")
+        return 1
+    for tabla, filas in resultado.items():
+        print(f"{tabla}: {filas} filas")
+    print("Verificación correcta" if args.verificar else f"Backup {args.nombre} restaurado")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())